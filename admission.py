@@ -0,0 +1,254 @@
+import asyncio
+import bisect
+import itertools
+import math
+import os
+import time
+from contextlib import asynccontextmanager
+
+import metrics
+
+# Requests allowed to run at once, overall and per user
+ADMISSION_CONCURRENCY = int(os.environ.get("ADMISSION_CONCURRENCY", "32"))
+ADMISSION_USER_CONCURRENCY = int(os.environ.get("ADMISSION_USER_CONCURRENCY", "4"))
+# Waiting requests allowed before new ones are turned away, overall and per user
+ADMISSION_QUEUE = int(os.environ.get("ADMISSION_QUEUE", "64"))
+ADMISSION_USER_QUEUE = int(os.environ.get("ADMISSION_USER_QUEUE", "8"))
+# Longest a request waits for a slot before it is turned away
+ADMISSION_MAX_WAIT = float(os.environ.get("ADMISSION_MAX_WAIT", "30"))
+
+INTERACTIVE = 0
+BATCH = 1
+PRIORITY_NAMES = {INTERACTIVE: "interactive", BATCH: "batch"}
+
+QUEUE_WAIT = metrics.registry.register(metrics.Histogram(
+    "admission_queue_wait_seconds", "Time requests waited for an admission slot", ("priority",)
+))
+REJECTED = metrics.registry.register(metrics.Counter(
+    "admission_rejected_total", "Requests turned away by admission control", ("priority", "reason")
+))
+
+
+class Overloaded(Exception):
+    """The request was not admitted; the client should retry later"""
+
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(f"Server is busy ({reason}), retry in {retry_after:.0f}s")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class Ticket:
+    """An admitted request; call ``release`` once when it is finished"""
+
+    def __init__(self, controller: "AdmissionController", user_id: str):
+        self.controller = controller
+        self.user_id = user_id
+        self.started = time.monotonic()
+        self.held = False
+        self.released = False
+
+    def release(self):
+        if not self.released:
+            self.released = True
+            self.controller._release(self)
+
+    def hold(self, items):
+        """Wrap a streamed response body so the slot is kept until it has been sent.
+
+        A body that is never iterated never reaches the ``finally`` below,
+        so pass ``release`` as the response's background task as well;
+        whichever runs first frees the slot.
+        """
+        self.held = True
+
+        async def release_after():
+            try:
+                async for item in items:
+                    yield item
+            finally:
+                self.release()
+
+        return release_after()
+
+
+class AdmissionController:
+    """Bounds concurrent requests overall and per user, admitting by priority.
+
+    Waiting requests are kept in one queue ordered by priority, then
+    arrival. A freed slot goes to the first waiter whose user is under
+    its own limit, so one user's backlog cannot hold up everyone else.
+    Requests are rejected up front when the queue is already too deep.
+    """
+
+    def __init__(self, concurrency: int = ADMISSION_CONCURRENCY,
+                 user_concurrency: int = ADMISSION_USER_CONCURRENCY,
+                 max_queue: int = ADMISSION_QUEUE, max_user_queue: int = ADMISSION_USER_QUEUE,
+                 max_wait: float = ADMISSION_MAX_WAIT):
+        self.concurrency = concurrency
+        self.user_concurrency = user_concurrency
+        self.max_queue = max_queue
+        self.max_user_queue = max_user_queue
+        self.max_wait = max_wait
+        self.running = 0
+        self._running_by_user = {}
+        self._queued_by_user = {}
+        self._waiters = []
+        self._order = itertools.count()
+        # Moving average of how long an admitted request runs, for Retry-After
+        self._service_time = 1.0
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    def retry_after(self) -> float:
+        return max(1.0, math.ceil(self._service_time * (self.queued + 1) / self.concurrency))
+
+    def _can_run(self, user_id: str) -> bool:
+        return (self.running < self.concurrency
+                and self._running_by_user.get(user_id, 0) < self.user_concurrency)
+
+    def _start(self, user_id: str) -> Ticket:
+        self.running += 1
+        self._running_by_user[user_id] = self._running_by_user.get(user_id, 0) + 1
+        return Ticket(self, user_id)
+
+    def _reject(self, reason: str, priority: int):
+        REJECTED.inc(priority=PRIORITY_NAMES[priority], reason=reason)
+        raise Overloaded(reason, self.retry_after())
+
+    async def acquire(self, user_id: str, priority: int = INTERACTIVE,
+                      reject: bool = True) -> Ticket:
+        """Wait for a slot; with ``reject`` a deep queue raises Overloaded at once"""
+        start = time.perf_counter()
+        # Waiters left in the queue while slots are free are all held back by
+        # their own user's limit, so a user under its limit can go first
+        if self._can_run(user_id):
+            QUEUE_WAIT.observe(0.0, priority=PRIORITY_NAMES[priority])
+            return self._start(user_id)
+        if reject and self.queued >= self.max_queue:
+            self._reject("queue_full", priority)
+        if reject and self._queued_by_user.get(user_id, 0) >= self.max_user_queue:
+            self._reject("user_queue_full", priority)
+
+        future = asyncio.get_running_loop().create_future()
+        waiter = (priority, next(self._order), user_id, future)
+        bisect.insort(self._waiters, waiter)
+        self._queued_by_user[user_id] = self._queued_by_user.get(user_id, 0) + 1
+        try:
+            ticket = await asyncio.wait_for(asyncio.shield(future), self.max_wait if reject else None)
+        except asyncio.TimeoutError:
+            self._unqueue(waiter)
+            if future.done() and not future.cancelled():
+                future.result().release()
+            self._reject("timeout", priority)
+        except asyncio.CancelledError:
+            self._unqueue(waiter)
+            if future.done() and not future.cancelled():
+                future.result().release()
+            raise
+        QUEUE_WAIT.observe(time.perf_counter() - start, priority=PRIORITY_NAMES[priority])
+        return ticket
+
+    def _unqueue(self, waiter: tuple):
+        if waiter in self._waiters:
+            self._waiters.remove(waiter)
+            self._dequeued(waiter[2])
+
+    def _dequeued(self, user_id: str):
+        remaining = self._queued_by_user[user_id] - 1
+        if remaining:
+            self._queued_by_user[user_id] = remaining
+        else:
+            del self._queued_by_user[user_id]
+
+    def _release(self, ticket: Ticket):
+        self.running -= 1
+        remaining = self._running_by_user[ticket.user_id] - 1
+        if remaining:
+            self._running_by_user[ticket.user_id] = remaining
+        else:
+            del self._running_by_user[ticket.user_id]
+        self._service_time += 0.1 * (time.monotonic() - ticket.started - self._service_time)
+        self._dispatch()
+
+    def _dispatch(self):
+        index = 0
+        while index < len(self._waiters) and self.running < self.concurrency:
+            _, _, user_id, future = self._waiters[index]
+            if future.cancelled() or not self._can_run(user_id):
+                index += 1
+                continue
+            del self._waiters[index]
+            self._dequeued(user_id)
+            future.set_result(self._start(user_id))
+
+    @asynccontextmanager
+    async def admit(self, user_id: str, priority: int = INTERACTIVE, reject: bool = True):
+        ticket = await self.acquire(user_id, priority, reject)
+        try:
+            yield ticket
+        finally:
+            if not ticket.held:
+                ticket.release()
+
+    def stats(self) -> dict:
+        return {
+            "running": self.running,
+            "queued": self.queued,
+            "users_running": len(self._running_by_user),
+            "users_queued": len(self._queued_by_user),
+        }
+
+
+async def _simulate(controller: AdmissionController, bulk: int, interactive: int,
+                    bulk_time: float, interactive_time: float, priorities: bool) -> dict:
+    waits = {"interactive": [], "batch": []}
+
+    async def request(kind: str, user_id: str, priority: int, duration: float):
+        start = time.perf_counter()
+        try:
+            async with controller.admit(user_id, priority):
+                waits[kind].append(time.perf_counter() - start)
+                await asyncio.sleep(duration)
+        except Overloaded:
+            waits[kind].append(None)
+
+    tasks = [asyncio.ensure_future(request("batch", "bulk-user", BATCH, bulk_time))
+             for _ in range(bulk)]
+    # Interactive requests arrive just after the bulk upload has filled the queue
+    await asyncio.sleep(0.01)
+    tasks += [
+        asyncio.ensure_future(request("interactive", f"user-{i}",
+                                      INTERACTIVE if priorities else BATCH, interactive_time))
+        for i in range(interactive)
+    ]
+    await asyncio.gather(*tasks)
+    return waits
+
+
+def _summary(waits: list) -> str:
+    served = sorted(wait for wait in waits if wait is not None)
+    rejected = len(waits) - len(served)
+    if not served:
+        return f"rejected {rejected}"
+    p95 = served[min(len(served) - 1, int(len(served) * 0.95))]
+    return f"served {len(served):>3} p95 wait {p95 * 1000:7.1f} ms, rejected {rejected}"
+
+
+def benchmark():
+    """One user bulk-uploads while others ask for flashcards, with and without limits"""
+    cases = [
+        ("FIFO, global limit", AdmissionController(8, 8, 1000, 1000), False),
+        ("admission control", AdmissionController(8, 2, 64, 16), True),
+    ]
+    for name, controller, priorities in cases:
+        waits = asyncio.run(_simulate(controller, bulk=40, interactive=20, bulk_time=0.2,
+                                      interactive_time=0.02, priorities=priorities))
+        print(f"{name:<18} | interactive {_summary(waits['interactive'])}")
+        print(f"{'':<18} | batch       {_summary(waits['batch'])}")
+
+
+if __name__ == "__main__":
+    benchmark()
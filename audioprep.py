@@ -0,0 +1,163 @@
+import io
+import os
+import time
+import wave
+
+import numpy as np
+
+try:
+    import soundfile
+except ImportError:  # FLAC is optional; uploads fall back to WAV
+    soundfile = None
+
+# Sample rate Whisper works at; anything higher is resampled away on Groq's side
+TARGET_RATE = int(os.environ.get("VOICE_UPLOAD_RATE", "16000"))
+# "flac" (needs the soundfile package) or "wav"
+UPLOAD_FORMAT = os.environ.get("VOICE_UPLOAD_FORMAT", "flac")
+# Leading and trailing frames quieter than this, relative to the loudest frame, are cut
+TRIM_DB = float(os.environ.get("VOICE_TRIM_DB", "-40"))
+# Kept frames must also be this far above the noise floor (the quietest tenth of frames)
+TRIM_NOISE_DB = float(os.environ.get("VOICE_TRIM_NOISE_DB", "6"))
+# Silence kept around the speech so word onsets are not clipped
+TRIM_PAD_MS = 100
+FRAME_MS = 20
+
+
+def to_float(samples: np.ndarray) -> np.ndarray:
+    """Any PCM dtype as float32 in [-1, 1]"""
+    samples = np.asarray(samples)
+    if samples.dtype.kind == "f":
+        return np.clip(samples, -1.0, 1.0).astype(np.float32, copy=False)
+    if samples.dtype.kind == "u":
+        middle = (np.iinfo(samples.dtype).max + 1) / 2
+        return ((samples.astype(np.float32) - middle) / middle).astype(np.float32)
+    return samples.astype(np.float32) / (np.iinfo(samples.dtype).max + 1)
+
+
+def to_int16(samples: np.ndarray) -> np.ndarray:
+    if samples.dtype == np.int16:
+        return samples
+    return (to_float(samples) * 32767).astype(np.int16)
+
+
+def downmix(samples: np.ndarray) -> np.ndarray:
+    """Mono from (samples,), (channels, samples) or (samples, channels) arrays"""
+    if samples.ndim == 1:
+        return samples
+    # fastrtc sends (channels, samples); soundfile and wave readers give (samples, channels)
+    axis = 0 if samples.shape[0] <= samples.shape[1] else 1
+    if samples.shape[axis] == 1:
+        return samples.reshape(-1)
+    return samples.mean(axis=axis, dtype=np.float32)
+
+
+def _lowpass(cutoff: float, taps: int = 63) -> np.ndarray:
+    """Hann-windowed sinc FIR; ``cutoff`` is a fraction of the input Nyquist"""
+    n = np.arange(taps) - (taps - 1) / 2
+    kernel = cutoff * np.sinc(cutoff * n) * np.hanning(taps)
+    return (kernel / kernel.sum()).astype(np.float32)
+
+
+def resample(samples: np.ndarray, rate: int, target: int = TARGET_RATE) -> np.ndarray:
+    """Float samples at ``target`` Hz, low-pass filtered first when downsampling"""
+    if rate == target or not samples.size:
+        return samples
+    if target < rate:
+        samples = np.convolve(samples, _lowpass(0.9 * target / rate), mode="same")
+    if rate % target == 0:
+        return samples[::rate // target].astype(np.float32, copy=False)
+    length = int(round(len(samples) * target / rate))
+    positions = np.arange(length) * (rate / target)
+    return np.interp(positions, np.arange(len(samples)), samples).astype(np.float32)
+
+
+def trim_silence(samples: np.ndarray, rate: int, threshold_db: float = TRIM_DB,
+                 pad_ms: float = TRIM_PAD_MS, noise_db: float = TRIM_NOISE_DB) -> np.ndarray:
+    """Cut leading and trailing frames more than ``threshold_db`` below the loudest.
+
+    Frames must also be ``noise_db`` above the noise floor (the quietest
+    tenth of frames), so a noisy room is not mistaken for speech. Audio
+    with no frame above the floor is returned as it is, silence as empty.
+    """
+    frame = rate * FRAME_MS // 1000
+    count = len(samples) // frame
+    if count == 0:
+        return samples
+    energy = np.square(samples[:count * frame].reshape(count, frame)).mean(axis=1)
+    peak = energy.max()
+    if peak <= 0:
+        return samples[:0]
+    floor = np.percentile(energy, 10)
+    loud = np.flatnonzero(energy >= max(peak * 10 ** (threshold_db / 10), floor * 10 ** (noise_db / 10)))
+    if not loud.size:
+        # Steady tone or noise: nothing stands out from the floor, so there is nothing to cut
+        return samples
+    pad = int(rate * pad_ms / 1000)
+    start = max(0, loud[0] * frame - pad)
+    end = min(len(samples), (loud[-1] + 1) * frame + pad)
+    return samples[start:end]
+
+
+def prepare(audio_data: np.ndarray, sample_rate: int, target: int = TARGET_RATE,
+            trim: bool = True) -> np.ndarray:
+    """Mono int16 PCM at ``target`` Hz with the silence around the speech removed"""
+    samples = downmix(to_float(audio_data))
+    samples = resample(samples, sample_rate, target)
+    if trim:
+        samples = trim_silence(samples, target)
+    return to_int16(samples)
+
+
+def wav_bytes(samples: np.ndarray, sample_rate: int) -> bytes:
+    with io.BytesIO() as buffer:
+        with wave.open(buffer, "wb") as wf:
+            wf.setnchannels(1)
+            wf.setsampwidth(2)  # 16-bit audio
+            wf.setframerate(sample_rate)
+            wf.writeframes(to_int16(samples).tobytes())
+        return buffer.getvalue()
+
+
+def encode(samples: np.ndarray, sample_rate: int, fmt: str = UPLOAD_FORMAT) -> tuple[str, bytes]:
+    """File name and bytes of mono int16 audio for upload; FLAC when available"""
+    if fmt == "flac" and soundfile is not None:
+        with io.BytesIO() as buffer:
+            soundfile.write(buffer, to_int16(samples), sample_rate, format="FLAC")
+            return "input.flac", buffer.getvalue()
+    return "input.wav", wav_bytes(samples, sample_rate)
+
+
+def speech_like(seconds: float, rate: int = 48000, channels: int = 2, lead: float = 0.5) -> np.ndarray:
+    """Float32 (channels, samples) test signal: silence, voiced syllables, silence"""
+    rng = np.random.default_rng(0)
+    t = np.arange(int(seconds * rate)) / rate
+    pitch = 140 + 30 * np.sin(2 * np.pi * 0.7 * t)
+    voice = sum(np.sin(2 * np.pi * k * np.cumsum(pitch) / rate) / k for k in range(1, 6))
+    syllables = np.clip(np.sin(2 * np.pi * 4 * t), 0, None)
+    active = (t >= lead) & (t < seconds - lead)
+    signal = 0.2 * voice * syllables * active + rng.normal(0, 0.002, t.size)
+    return np.stack([signal] * channels).astype(np.float32)
+
+
+def benchmark(seconds: float = 10.0, rounds: int = 20):
+    """Upload bytes and prep time per second of audio for a 48 kHz stereo float recording"""
+    audio = speech_like(seconds)
+    # What voice.py used to upload: the raw float32 buffer behind a 16-bit mono header
+    old = len(audio.tobytes()) + 44
+    start = time.perf_counter()
+    for _ in range(rounds):
+        samples = prepare(audio, 48000)
+    prep_ms = (time.perf_counter() - start) / rounds / seconds * 1000
+    print(f"{seconds:.0f}s of 48 kHz stereo float32 -> {len(samples) / TARGET_RATE:.1f}s at {TARGET_RATE} Hz")
+    print(f"prep time:        {prep_ms:6.2f} ms per second of audio")
+    print(f"raw buffer (old): {old / seconds / 1024:7.1f} KiB per second of audio")
+    for fmt in ("wav", "flac"):
+        start = time.perf_counter()
+        name, data = encode(samples, TARGET_RATE, fmt)
+        encode_ms = (time.perf_counter() - start) / seconds * 1000
+        print(f"{name:<17} {len(data) / seconds / 1024:7.1f} KiB per second of audio, "
+              f"encode {encode_ms:.2f} ms per second")
+
+
+if __name__ == "__main__":
+    benchmark()
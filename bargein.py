@@ -0,0 +1,168 @@
+import os
+import threading
+import time
+
+import numpy as np
+
+import metrics
+import voice_pipeline
+
+# Microphone level above which a frame counts as speech, in dB below full scale
+BARGE_IN_DB = float(os.environ.get("VOICE_BARGE_IN_DB", "-35"))
+# Continuous speech needed before a reply is cut off, so coughs and clicks do not
+BARGE_IN_MS = float(os.environ.get("VOICE_BARGE_IN_MS", "200"))
+
+BARGE_INS = metrics.registry.register(metrics.Counter(
+    "voice_barge_ins_total", "Replies interrupted because the user started speaking"
+))
+
+
+def level_db(samples: np.ndarray) -> float:
+    """RMS level of int16 or float PCM in dBFS"""
+    samples = np.asarray(samples).reshape(-1)
+    if not samples.size:
+        return -120.0
+    if samples.dtype.kind in "iu":
+        samples = samples.astype(np.float32) / np.iinfo(samples.dtype).max
+    rms = float(np.sqrt(np.mean(np.square(samples, dtype=np.float64))))
+    return 20 * np.log10(max(rms, 1e-6))
+
+
+class EnergyVAD:
+    """Detects the start of speech from frame energy alone.
+
+    Cheap enough to run on every incoming frame while a reply is playing,
+    when the model-based pause detection only looks at whole utterances.
+    """
+
+    def __init__(self, threshold_db: float = BARGE_IN_DB, min_speech_ms: float = BARGE_IN_MS):
+        self.threshold_db = threshold_db
+        self.min_speech_ms = min_speech_ms
+        self.speech_ms = 0.0
+
+    def reset(self):
+        self.speech_ms = 0.0
+
+    def feed(self, sample_rate: int, samples: np.ndarray) -> bool:
+        """True once loud frames have lasted ``min_speech_ms`` without a break"""
+        if level_db(samples) >= self.threshold_db:
+            self.speech_ms += 1000 * np.asarray(samples).size / sample_rate
+        else:
+            self.speech_ms = 0.0
+        return self.speech_ms >= self.min_speech_ms
+
+
+class BargeIn:
+    """Cancels the running voice reply when the user starts speaking over it.
+
+    ``start_turn`` hands out the cancel event for a new reply, which is
+    passed to SpeechPipeline; ``hear`` is fed every microphone frame.
+    Audio the reply already produced may be queued for playback: ``flush``
+    is called to drop it, and ``admit`` filters out frames the cancelled
+    reply was still producing.
+    """
+
+    def __init__(self, vad: EnergyVAD | None = None, flush=None):
+        self.vad = vad or EnergyVAD()
+        self.flush = flush
+        self.turn = None
+
+    def start_turn(self) -> threading.Event:
+        self.vad.reset()
+        self.turn = threading.Event()
+        return self.turn
+
+    @property
+    def replying(self) -> bool:
+        return self.turn is not None and not self.turn.is_set()
+
+    def hear(self, sample_rate: int, samples: np.ndarray) -> bool:
+        """Feed microphone audio; True when it just cancelled the reply"""
+        if not self.replying:
+            return False
+        if not self.vad.feed(sample_rate, samples):
+            return False
+        self.turn.set()
+        if self.flush is not None:
+            self.flush()
+        BARGE_INS.inc()
+        return True
+
+    def admit(self, turn: threading.Event | None, output):
+        """``output`` of the reply ``turn``, or None when it was cancelled meanwhile"""
+        if turn is not None and turn is self.turn and turn.is_set():
+            return None
+        return output
+
+
+def _play(pipeline, played: list, realtime: bool):
+    """Consume audio at real-time speed, like the browser would"""
+    for chunk in pipeline:
+        played.append(len(chunk))
+        if realtime:
+            time.sleep(len(chunk) / 2 / 24000)
+
+
+def _turn(barge_in: BargeIn | None, microphone: np.ndarray, reply: str) -> dict:
+    from tests.fakes import frames, stub_deltas, stub_synthesize
+
+    synthesized = []
+    synthesize = stub_synthesize(latency=0.05)
+
+    def counting_synthesize(sentence, previous):
+        for chunk in synthesize(sentence, previous):
+            synthesized.append(len(chunk))
+            yield chunk
+
+    cancelled = barge_in.start_turn() if barge_in else None
+    timings = voice_pipeline.TurnTimings()
+    pipeline = voice_pipeline.SpeechPipeline(stub_deltas(reply, 0.005),
+                                             counting_synthesize, timings, cancelled=cancelled)
+    played = []
+    # Without barge-in the whole reply is heard anyway, so skip the waiting
+    player = threading.Thread(target=_play, args=(pipeline, played, barge_in is not None))
+    player.start()
+    onset = None
+    for frame in frames(microphone if barge_in else microphone[:0]):
+        time.sleep(len(frame) / 16000)
+        if onset is None and frame.size and level_db(frame) >= BARGE_IN_DB:
+            onset = time.perf_counter()
+        if barge_in and barge_in.hear(16000, frame):
+            break
+    stopped = time.perf_counter()
+    player.join()
+    return {
+        "played_s": sum(played) / 2 / 24000,
+        "synthesized_s": sum(synthesized) / 2 / 24000,
+        "reaction_ms": (stopped - onset) * 1000 if barge_in and onset else None,
+        "reply_chars": len(pipeline.text),
+        "timings": timings.report(),
+    }
+
+
+def simulate():
+    """Student interrupts a long reply 1.5s in and asks something else"""
+    from tests.fakes import REPLY, tone
+
+    reply = " ".join([REPLY] * 3)
+    microphone = np.concatenate([tone(1.5, -70), tone(1.0, -20)])
+    followup = "Sure, the short answer is NADH. It carries electrons to the chain."
+
+    for name, barge_in in (("no barge-in", None), ("barge-in", BargeIn())):
+        first = _turn(barge_in, microphone, reply)
+        line = (f"{name:<12} | synthesized {first['synthesized_s']:5.2f}s of audio, "
+                f"played {first['played_s']:5.2f}s, "
+                f"dropped {first['synthesized_s'] - first['played_s']:5.2f}s, "
+                f"LLM text {first['reply_chars']}/{len(reply)} chars")
+        if first["reaction_ms"] is not None:
+            line += f", cancelled {first['reaction_ms']:.0f} ms after speech onset"
+        print(line)
+        if barge_in:
+            # The interrupted turn is over; the next utterance starts a fresh reply
+            second = _turn(barge_in, tone(0.5, -70), followup)
+            print(f"{'':<12} | next turn: first audio {second['timings']['first_audio']:.3f}s, "
+                  f"complete reply of {second['reply_chars']} chars")
+
+
+if __name__ == "__main__":
+    simulate()
@@ -0,0 +1,72 @@
+import os
+import re
+import subprocess
+import sys
+import time
+
+_importtime_line = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+_load_server = (
+    "import importlib.util, os;"
+    "spec = importlib.util.spec_from_file_location('server', os.path.join({root!r}, 'py-server.py'));"
+    "server = importlib.util.module_from_spec(spec);"
+    "spec.loader.exec_module(server)"
+)
+
+_first_request = (
+    "import time; start = time.perf_counter();"
+    + _load_server
+    + ";from fastapi.testclient import TestClient;"
+    "TestClient(server.app).get('/');"
+    "print(time.perf_counter() - start)"
+)
+
+
+def measure_import_time(top: int = 10) -> dict:
+    """Import py-server.py under ``python -X importtime`` in a fresh interpreter.
+
+    Returns the total cumulative import time in microseconds and the
+    slowest top-level imports, so the numbers can be asserted on or logged.
+    """
+    root = os.path.dirname(os.path.abspath(__file__))
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", _load_server.format(root=root)],
+        capture_output=True,
+        text=True,
+        cwd=root,
+        check=True,
+    )
+    top_level = []
+    for line in result.stderr.splitlines():
+        match = _importtime_line.match(line)
+        if match and len(match.group(3)) == 1:
+            top_level.append((match.group(4), int(match.group(2))))
+    top_level.sort(key=lambda item: item[1], reverse=True)
+    return {
+        "total_us": sum(cumulative for _, cumulative in top_level),
+        "slowest": top_level[:top],
+    }
+
+
+def measure_first_request() -> float:
+    """Seconds from interpreter start-up to the first answered request"""
+    root = os.path.dirname(os.path.abspath(__file__))
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-c", _first_request.format(root=root)],
+        capture_output=True,
+        text=True,
+        cwd=root,
+        check=True,
+    )
+    in_process = float(result.stdout.strip().splitlines()[-1])
+    print(f"process start overhead: {time.perf_counter() - start - in_process:.3f}s")
+    return in_process
+
+
+if __name__ == "__main__":
+    imports = measure_import_time()
+    print(f"import py-server.py: {imports['total_us'] / 1000:.1f} ms")
+    for name, cumulative in imports["slowest"]:
+        print(f"  {name:<40} {cumulative / 1000:8.1f} ms")
+    print(f"time to first request: {measure_first_request():.3f}s")
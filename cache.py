@@ -0,0 +1,171 @@
+import asyncio
+import copy
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+CACHE_SIZE = int(os.environ.get("RESPONSE_CACHE_SIZE", "1024"))
+CACHE_TTL = float(os.environ.get("RESPONSE_CACHE_TTL", "86400"))
+# Path to a SQLite file for the persistent tier; unset keeps the cache in memory only
+CACHE_DB = os.environ.get("RESPONSE_CACHE_DB", "")
+
+_whitespace = re.compile(r"\s+")
+
+
+def normalize_content(content: str) -> str:
+    """Collapse whitespace so trivially different notes share a cache entry"""
+    return _whitespace.sub(" ", content).strip()
+
+
+def make_key(endpoint: str, template_version: str, content: str, **params) -> str:
+    """Hash of everything that determines a generation's output"""
+    material = json.dumps(
+        {
+            "endpoint": endpoint,
+            "template_version": template_version,
+            "content": normalize_content(content),
+            "params": params,
+        },
+        sort_keys=True,
+    )
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class MemoryTier:
+    """LRU dictionary whose entries expire after a TTL"""
+
+    def __init__(self, max_size: int = CACHE_SIZE, ttl: float = CACHE_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value, expires_at: float | None = None):
+        with self._lock:
+            self._entries[key] = (expires_at or time.time() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class SQLiteTier:
+    """Persistent tier that survives restarts"""
+
+    def __init__(self, path: str, ttl: float = CACHE_TTL):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS response_cache ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def get(self, key: str):
+        """Return ``(value, expires_at)`` or None"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM response_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if row[1] < time.time():
+                self._conn.execute("DELETE FROM response_cache WHERE key = ?", (key,))
+                self._conn.commit()
+                return None
+        return json.loads(row[0]), row[1]
+
+    def set(self, key: str, value, expires_at: float | None = None):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO response_cache (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, json.dumps(value), expires_at or time.time() + self.ttl),
+            )
+            self._conn.commit()
+
+    def purge_expired(self) -> int:
+        with self._lock:
+            cursor = self._conn.execute(
+                "DELETE FROM response_cache WHERE expires_at < ?", (time.time(),)
+            )
+            self._conn.commit()
+            return cursor.rowcount
+
+
+class ResponseCache:
+    """Two-tier cache for parsed model payloads.
+
+    Payloads are stored as they come out of the model, without per-request
+    IDs, and every ``get`` returns a private copy that callers may stamp.
+    Memory hits are answered on the event loop; the SQLite tier is only
+    reached through ``asyncio.to_thread``, since its queries block.
+    """
+
+    def __init__(self, memory: MemoryTier | None = None, disk: SQLiteTier | None = None):
+        self.memory = memory or MemoryTier()
+        self.disk = disk
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    async def get(self, key: str):
+        value = self.memory.get(key)
+        if value is None and self.disk is not None:
+            entry = await asyncio.to_thread(self.disk.get, key)
+            if entry is not None:
+                value, expires_at = entry
+                self.memory.set(key, value, expires_at)
+                self.disk_hits += 1
+        if value is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return copy.deepcopy(value)
+
+    async def contains(self, key: str) -> bool:
+        """Whether ``key`` is cached, without counting a lookup or copying the value"""
+        if self.memory.get(key) is not None:
+            return True
+        return self.disk is not None and await asyncio.to_thread(self.disk.get, key) is not None
+
+    async def set(self, key: str, value):
+        expires_at = time.time() + self.memory.ttl
+        self.memory.set(key, copy.deepcopy(value), expires_at)
+        if self.disk is not None:
+            await asyncio.to_thread(self.disk.set, key, value, expires_at)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "memory_entries": len(self.memory),
+        }
+
+
+def create_cache() -> ResponseCache:
+    """Build the cache described by the RESPONSE_CACHE_* environment variables"""
+    disk = SQLiteTier(CACHE_DB) if CACHE_DB else None
+    return ResponseCache(MemoryTier(), disk)
@@ -0,0 +1,150 @@
+import asyncio
+import os
+import re
+import time
+
+CHUNK_CHARS = int(os.environ.get("SUMMARY_CHUNK_CHARS", "24000"))
+CHUNK_CONCURRENCY = int(os.environ.get("SUMMARY_CONCURRENCY", "4"))
+# "concat" joins the chunk summaries as-is; "sectioned" starts each one with its heading
+MERGE_STRATEGY = os.environ.get("SUMMARY_MERGE", "concat")
+
+_heading = re.compile(r"^#{1,6}\s+(.*)$")
+
+
+def split_sections(text: str) -> list[str]:
+    """Split Markdown at page breaks and headings"""
+    sections = []
+    current = []
+    for page in text.split("\f"):
+        for line in page.splitlines(keepends=True):
+            if _heading.match(line) and any(part.strip() for part in current):
+                sections.append("".join(current))
+                current = []
+            current.append(line)
+        if any(part.strip() for part in current):
+            sections.append("".join(current))
+        current = []
+    return sections
+
+
+def _split_oversized(section: str, max_chars: int) -> list[str]:
+    pieces = []
+    current = ""
+    for paragraph in re.split(r"(?<=\n)\n+", section):
+        while len(paragraph) > max_chars:
+            if current:
+                pieces.append(current)
+                current = ""
+            pieces.append(paragraph[:max_chars])
+            paragraph = paragraph[max_chars:]
+        if current and len(current) + len(paragraph) > max_chars:
+            pieces.append(current)
+            current = ""
+        current += paragraph
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def split_document(text: str, max_chars: int = CHUNK_CHARS) -> list[str]:
+    """Pack headings and pages greedily into chunks of at most ``max_chars``"""
+    chunks = []
+    current = ""
+    for section in split_sections(text):
+        for piece in _split_oversized(section, max_chars) if len(section) > max_chars else [section]:
+            if current and len(current) + len(piece) > max_chars:
+                chunks.append(current)
+                current = ""
+            current += piece
+    if current.strip():
+        chunks.append(current)
+    return chunks
+
+
+def chunk_title(chunk: str) -> str | None:
+    for line in chunk.splitlines():
+        match = _heading.match(line)
+        if match:
+            return match.group(1).strip()
+    return None
+
+
+def merge_blocks(chunks: list[str], summaries: list[list], strategy: str = MERGE_STRATEGY) -> list:
+    """Merge per-chunk BlockNote arrays into one document"""
+    if strategy not in ("concat", "sectioned"):
+        raise ValueError(f"Unknown merge strategy: {strategy}")
+
+    merged = []
+    for chunk, blocks in zip(chunks, summaries):
+        if strategy == "sectioned":
+            title = chunk_title(chunk)
+            starts_with_heading = bool(blocks) and isinstance(blocks[0], dict) \
+                and blocks[0].get("type") == "heading"
+            if title and not starts_with_heading:
+                merged.append({"type": "heading", "content": title})
+        merged.extend(blocks)
+    return merged
+
+
+async def map_chunks(chunks: list[str], summarize, concurrency: int = CHUNK_CONCURRENCY):
+    """Yield ``summarize(chunk)`` results in document order, at most ``concurrency`` at once"""
+    limit = asyncio.Semaphore(concurrency)
+
+    async def run(chunk):
+        async with limit:
+            return await summarize(chunk)
+
+    tasks = [asyncio.ensure_future(run(chunk)) for chunk in chunks]
+    try:
+        for task in tasks:
+            yield await task
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+async def summarize_document(text: str, summarize, max_chars: int = CHUNK_CHARS,
+                             concurrency: int = CHUNK_CONCURRENCY,
+                             strategy: str = MERGE_STRATEGY) -> list:
+    """Map-reduce summarization: summarize each chunk concurrently, then merge"""
+    chunks = split_document(text, max_chars)
+    summaries = [summary async for summary in map_chunks(chunks, summarize, concurrency)]
+    return merge_blocks(chunks, summaries, strategy)
+
+
+def synthetic_document(pages: int = 200, sections_per_page: int = 3, words: int = 120) -> str:
+    sentence = "The quick brown fox studies cellular respiration and photosynthesis. "
+    body = (sentence * (words // 10 + 1))[: words * 7]
+    parts = []
+    for page in range(pages):
+        for section in range(sections_per_page):
+            parts.append(f"## Page {page + 1} section {section + 1}\n\n{body}\n\n")
+        parts.append("\f")
+    return "".join(parts)
+
+
+def benchmark(pages: int = 200, seconds_per_kchar: float = 0.002, levels=(1, 4, 8, 16)):
+    """Compare one-shot and chunked summarization against a stub model whose
+    latency grows with prompt size"""
+    text = synthetic_document(pages)
+
+    async def stub_summarize(chunk: str) -> list:
+        await asyncio.sleep(len(chunk) / 1000 * seconds_per_kchar)
+        return [{"type": "paragraph", "content": chunk[:40]}]
+
+    async def one_shot():
+        return await stub_summarize(text)
+
+    print(f"document: {len(text)} chars, {pages} pages")
+    start = time.perf_counter()
+    asyncio.run(one_shot())
+    print(f"one shot                 : {time.perf_counter() - start:.3f}s")
+    for concurrency in levels:
+        start = time.perf_counter()
+        blocks = asyncio.run(summarize_document(text, stub_summarize, concurrency=concurrency))
+        print(f"chunked, concurrency {concurrency:>3}: {time.perf_counter() - start:.3f}s"
+              f" ({len(blocks)} blocks)")
+
+
+if __name__ == "__main__":
+    benchmark()
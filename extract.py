@@ -0,0 +1,251 @@
+import contextvars
+import json
+import random
+import re
+import time
+from dataclasses import dataclass
+
+# How many opening brackets to try before giving up on a response
+MAX_CANDIDATES = 16
+
+_literals = {"True": "true", "False": "false", "None": "null"}
+_literal_pattern = re.compile(r"\b(True|False|None)\b")
+
+# Set once extract() salvages a response in the current context, so a caller
+# several layers up can tell a partial result from a complete one
+salvage_seen = contextvars.ContextVar("salvage_seen", default=False)
+
+
+@dataclass
+class Extraction:
+    """Result of pulling JSON out of a model response"""
+    value: object
+    repaired: bool = False
+    salvaged: bool = False
+
+
+def _scan(text: str, start: int):
+    """Walk the JSON value opening at ``text[start]``.
+
+    Returns the index just past its closing bracket (None if the text ends
+    first) and the spans of its top-level elements when it is an array.
+    """
+    depth = 0
+    in_string = False
+    escape = False
+    element_start = None
+    spans = []
+    for i in range(start, len(text)):
+        char = text[i]
+        if in_string:
+            if escape:
+                escape = False
+            elif char == "\\":
+                escape = True
+            elif char == '"':
+                in_string = False
+            continue
+
+        if depth == 1 and element_start is None and not char.isspace() and char not in ",]}":
+            element_start = i
+        if char == '"':
+            in_string = True
+        elif char in "[{":
+            depth += 1
+        elif char in "]}":
+            depth -= 1
+            if depth == 0:
+                if element_start is not None:
+                    spans.append((element_start, i))
+                return i + 1, spans
+        elif char == "," and depth == 1:
+            if element_start is not None:
+                spans.append((element_start, i))
+            element_start = None
+
+    if element_start is not None:
+        spans.append((element_start, len(text)))
+    return None, spans
+
+
+def repair(text: str) -> str:
+    """Fix trailing commas and Python literals outside of strings"""
+    out = []
+    in_string = False
+    escape = False
+    segment_start = 0
+    i = 0
+    length = len(text)
+    while i < length:
+        char = text[i]
+        if in_string:
+            if escape:
+                escape = False
+            elif char == "\\":
+                escape = True
+            elif char == '"':
+                in_string = False
+                out.append(text[segment_start:i + 1])
+                segment_start = i + 1
+        elif char == '"':
+            out.append(_literal_pattern.sub(lambda m: _literals[m.group(1)], text[segment_start:i]))
+            segment_start = i
+            in_string = True
+        elif char == ",":
+            j = i + 1
+            while j < length and text[j].isspace():
+                j += 1
+            if j < length and text[j] in "]}":
+                out.append(_literal_pattern.sub(lambda m: _literals[m.group(1)], text[segment_start:i]))
+                segment_start = i + 1
+        i += 1
+    tail = text[segment_start:]
+    out.append(tail if in_string else _literal_pattern.sub(lambda m: _literals[m.group(1)], tail))
+    return "".join(out)
+
+
+def _loads(text: str):
+    try:
+        return json.loads(text), False
+    except ValueError:
+        return json.loads(repair(text)), True
+
+
+def _salvage(text: str, spans: list) -> list:
+    items = []
+    for start, end in spans:
+        try:
+            items.append(_loads(text[start:end].strip())[0])
+        except ValueError:
+            continue
+    return items
+
+
+def extract(text: str) -> Extraction:
+    """Pull the first JSON array or object out of a model response.
+
+    Tries a plain parse first, then scans for the first balanced value
+    (skipping fences, preambles and trailing text) and repairs common
+    defects. If an array is truncated or has a broken element, the
+    elements that do parse are kept.
+    """
+    stripped = text.strip()
+    try:
+        return Extraction(json.loads(stripped))
+    except ValueError:
+        pass
+
+    candidates = 0
+    for match in re.finditer(r"[\[{]", text):
+        if candidates >= MAX_CANDIDATES:
+            break
+        candidates += 1
+        start = match.start()
+        end, spans = _scan(text, start)
+        if end is not None:
+            try:
+                value, _ = _loads(text[start:end])
+                return Extraction(value, repaired=True)
+            except ValueError:
+                pass
+        if text[start] == "[":
+            items = _salvage(text, spans)
+            if items:
+                salvage_seen.set(True)
+                return Extraction(items, repaired=True, salvaged=True)
+        if end is None:
+            break
+
+    raise json.JSONDecodeError("No JSON array or object found", text, 0)
+
+
+def extract_json(text: str):
+    """Parsed JSON value of a model response; raises json.JSONDecodeError"""
+    return extract(text).value
+
+
+# Shapes of broken output seen from the model in production
+MALFORMED_SAMPLES = [
+    '```json\n[{"question": "What is ATP?", "answer": "Energy currency"}]\n```',
+    'Here are your flashcards:\n```json\n[{"question": "Q1", "answer": "A1"}]\n```\nLet me know if you need more!',
+    '[{"question": "Q1", "answer": "A1"},{"question": "Q2", "answer": "A2"},]',
+    '[{"question_text": "Q1", "answers": [{"option_text": "a", "is_correct": True},'
+    ' {"option_text": "b", "is_correct": False}]}]',
+    '[{"question": "Q1", "answer": "A1"}, {"question": "Q2", "answer": "A',
+    '```json\n[\n  {"title": "Cells", "part": "Biology", "dueDate": "2025-01-02", "priority": "high",'
+    ' "count": 3, "estimatedTime": 60},\n  {"title": "DNA", "part": "Genetics", "dueDate": "2025-01-0',
+    '[{"question": "Q1" "answer": "A1"}, {"question": "Q2", "answer": "A2"}]',
+    'Sure! [{"type": "heading", "content": "Summary"}, {"type": "paragraph", "content": "Text [1]"}]',
+]
+
+
+def _baseline(text: str):
+    from convert import clean_json_string
+
+    return json.loads(clean_json_string(text))
+
+
+def _mutate(text: str, rng: random.Random) -> str:
+    mutation = rng.randrange(5)
+    if mutation == 0:
+        return text[: rng.randrange(1, len(text))]
+    if mutation == 1:
+        return "Here is the JSON you asked for:\n" + text + "\nHope this helps."
+    if mutation == 2:
+        return text[:-1] + ",]"
+    if mutation == 3:
+        return "```json\n" + text + "\n```"
+    return text.replace("true", "True").replace("false", "False")
+
+
+def fuzz_items(count: int = 10) -> list:
+    """Valid model output for fuzzing, with brackets and booleans inside the values"""
+    return [
+        {"question": f"Question {i}?", "answer": f"Answer, with [brackets] {{{i}}}", "ok": i % 2 == 0}
+        for i in range(count)
+    ]
+
+
+def fuzz(iterations: int = 5000, seed: int = 0):
+    """How many mutated responses the old parser and the extractor each recover"""
+    rng = random.Random(seed)
+    text = json.dumps(fuzz_items())
+    baseline_ok = extracted_ok = 0
+    for _ in range(iterations):
+        mutated = _mutate(text, rng)
+        try:
+            _baseline(mutated)
+            baseline_ok += 1
+        except ValueError:
+            pass
+        try:
+            extract_json(mutated)
+            extracted_ok += 1
+        except json.JSONDecodeError:
+            pass
+    print(f"fuzz: {iterations} mutated responses, baseline parsed {baseline_ok},"
+          f" extractor parsed {extracted_ok}")
+
+
+def benchmark(rounds: int = 2000):
+    for sample in MALFORMED_SAMPLES:
+        try:
+            _baseline(sample)
+            baseline = "ok"
+        except ValueError:
+            baseline = "fail"
+        start = time.perf_counter()
+        for _ in range(rounds):
+            try:
+                result = extract(sample)
+            except json.JSONDecodeError:
+                result = None
+        elapsed = (time.perf_counter() - start) / rounds * 1e6
+        outcome = "fail" if result is None else f"{len(result.value)} items" + (
+            " (salvaged)" if result.salvaged else "")
+        print(f"baseline {baseline:>4} | extractor {outcome:<20} | {elapsed:7.1f} us | {sample[:40]!r}")
+
+
+if __name__ == "__main__":
+    benchmark()
+    fuzz()
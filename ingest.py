@@ -0,0 +1,134 @@
+import asyncio
+import io
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+
+from fastapi import UploadFile
+
+MAX_UPLOAD_BYTES = int(os.environ.get("MAX_UPLOAD_BYTES", str(50 * 1024 * 1024)))
+# Worker processes used for MarkItDown conversion; 0 converts in a thread instead
+CONVERSION_WORKERS = int(os.environ.get("CONVERSION_WORKERS", str(min(4, os.cpu_count() or 1))))
+READ_CHUNK_BYTES = 1024 * 1024
+# Room for multipart boundaries and form fields on top of the file itself
+FORM_OVERHEAD_BYTES = 64 * 1024
+
+
+class UploadTooLarge(Exception):
+    def __init__(self, limit: int):
+        super().__init__(f"Upload exceeds the {limit} byte limit")
+        self.limit = limit
+
+
+class UploadLimit:
+    """ASGI middleware that turns away request bodies larger than ``max_bytes``.
+
+    Starlette spools a whole multipart body to disk before the endpoint
+    runs, so the cap in ``read_upload`` alone is only checked afterwards.
+    A declared Content-Length over the limit gets a 413 before anything is
+    read; a chunked body gets one as soon as it passes the limit.
+    """
+
+    def __init__(self, app, max_bytes: int = MAX_UPLOAD_BYTES + FORM_OVERHEAD_BYTES):
+        self.app = app
+        self.max_bytes = max_bytes
+
+    async def _reject(self, send):
+        body = json.dumps({"detail": str(UploadTooLarge(self.max_bytes))}).encode("utf-8")
+        await send({
+            "type": "http.response.start",
+            "status": 413,
+            "headers": [(b"content-type", b"application/json"),
+                        (b"content-length", str(len(body)).encode()),
+                        (b"connection", b"close")],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        length = dict(scope["headers"]).get(b"content-length", b"")
+        if length.isdigit() and int(length) > self.max_bytes:
+            return await self._reject(send)
+
+        received = 0
+        cut_off = False
+        started = False
+        replied = False
+
+        async def limited_receive():
+            nonlocal received, cut_off, replied
+            if cut_off:
+                return {"type": "http.disconnect"}
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    # The app sees a disconnect and stops reading; the client gets the 413
+                    cut_off = True
+                    if not started:
+                        replied = True
+                        await self._reject(send)
+                    return {"type": "http.disconnect"}
+            return message
+
+        async def guarded_send(message):
+            nonlocal started
+            if replied:
+                return
+            started = started or message["type"] == "http.response.start"
+            await send(message)
+
+        await self.app(scope, limited_receive, guarded_send)
+
+
+async def read_upload(file: UploadFile, max_bytes: int = MAX_UPLOAD_BYTES) -> bytes:
+    """Read an upload into memory, stopping as soon as it passes ``max_bytes``"""
+    buffer = bytearray()
+    while True:
+        chunk = await file.read(READ_CHUNK_BYTES)
+        if not chunk:
+            break
+        buffer += chunk
+        if len(buffer) > max_bytes:
+            raise UploadTooLarge(max_bytes)
+    return bytes(buffer)
+
+
+def convert_bytes(data: bytes, filename: str | None, content_type: str | None) -> str:
+    """Convert an in-memory document to Markdown without touching the disk"""
+    from markitdown import StreamInfo
+
+    import providers
+
+    extension = os.path.splitext(filename)[1].lower() if filename else None
+    stream_info = StreamInfo(
+        filename=filename,
+        extension=extension or None,
+        mimetype=content_type or None,
+    )
+    result = providers.get_markitdown().convert_stream(io.BytesIO(data), stream_info=stream_info)
+    return result.text_content
+
+
+@lru_cache(maxsize=None)
+def get_conversion_pool() -> ProcessPoolExecutor:
+    return ProcessPoolExecutor(max_workers=CONVERSION_WORKERS)
+
+
+async def convert_data(data: bytes, filename: str | None, content_type: str | None) -> str:
+    """Convert document bytes off the event loop"""
+    if CONVERSION_WORKERS <= 0:
+        return await asyncio.to_thread(convert_bytes, data, filename, content_type)
+
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        get_conversion_pool(), convert_bytes, data, filename, content_type
+    )
+
+
+async def convert_upload(file: UploadFile, max_bytes: int = MAX_UPLOAD_BYTES) -> str:
+    """Read an upload with a size cap and convert it off the event loop"""
+    data = await read_upload(file, max_bytes)
+    return await convert_data(data, file.filename, file.content_type)
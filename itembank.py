@@ -0,0 +1,187 @@
+import asyncio
+import hashlib
+import itertools
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+
+from cache import normalize_content
+
+# Path to the SQLite file that keeps generated questions across restarts
+ITEM_BANK_DB = os.environ.get("ITEM_BANK_DB", "itembank.db")
+# Items older than this many seconds are dropped, so stale questions do not live forever
+ITEM_BANK_TTL = float(os.environ.get("ITEM_BANK_TTL", str(30 * 86400)))
+# Most items kept across all notes; the oldest go first past it
+ITEM_BANK_MAX_ITEMS = int(os.environ.get("ITEM_BANK_MAX_ITEMS", "50000"))
+# Word overlap above which two questions count as the same question
+DUPLICATE_SIMILARITY = float(os.environ.get("ITEM_BANK_SIMILARITY", "0.8"))
+# Model calls per request to make up a shortfall that dedup left open
+TOP_UP_ATTEMPTS = int(os.environ.get("ITEM_BANK_ATTEMPTS", "2"))
+
+_non_word = re.compile(r"[^\w\s]")
+_whitespace = re.compile(r"\s+")
+
+
+def note_hash(content: str) -> str:
+    return hashlib.sha256(normalize_content(content).encode("utf-8")).hexdigest()
+
+
+def normalize_text(text: str) -> str:
+    """Lowercase text without punctuation, so rewordings by case or punctuation collide"""
+    return _whitespace.sub(" ", _non_word.sub(" ", text.lower())).strip()
+
+
+def similarity(a: str, b: str) -> float:
+    """Jaccard overlap of the words of two normalized texts"""
+    words_a, words_b = set(a.split()), set(b.split())
+    if not words_a or not words_b:
+        return 0.0
+    return len(words_a & words_b) / len(words_a | words_b)
+
+
+def question_text(kind: str, item: dict) -> str:
+    return item["question_text"] if kind == "quizzes" else item["question"]
+
+
+class ItemBank:
+    """Every quiz question and flashcard generated for a note, deduplicated.
+
+    Items are keyed by note hash and kept in the order they were generated,
+    so a repeat request is served from the bank and only the shortfall has
+    to be generated. Items expire after ``ttl`` seconds and the bank never
+    holds more than ``max_items``.
+    """
+
+    def __init__(self, path: str = ITEM_BANK_DB, duplicate_similarity: float = DUPLICATE_SIMILARITY,
+                 ttl: float = ITEM_BANK_TTL, max_items: int = ITEM_BANK_MAX_ITEMS):
+        self.duplicate_similarity = duplicate_similarity
+        self.ttl = ttl
+        self.max_items = max_items
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS items ("
+            "kind TEXT NOT NULL, note_hash TEXT NOT NULL, normalized TEXT NOT NULL, "
+            "item TEXT NOT NULL, created_at REAL NOT NULL, "
+            "PRIMARY KEY (kind, note_hash, normalized))"
+        )
+        self._conn.commit()
+        self.prune()
+
+    def items(self, kind: str, note: str) -> list:
+        """Banked items for a note, oldest first"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT item FROM items WHERE kind = ? AND note_hash = ? AND created_at >= ? "
+                "ORDER BY created_at, rowid",
+                (kind, note, time.time() - self.ttl),
+            ).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def is_duplicate(self, normalized: str, existing: list) -> bool:
+        return any(
+            normalized == other or similarity(normalized, other) >= self.duplicate_similarity
+            for other in existing
+        )
+
+    def add(self, kind: str, note: str, items: list) -> list:
+        """Store the items that are not duplicates of banked ones and return them"""
+        with self._lock:
+            self._prune()
+            existing = [row[0] for row in self._conn.execute(
+                "SELECT normalized FROM items WHERE kind = ? AND note_hash = ?", (kind, note)
+            )]
+            added = []
+            now = time.time()
+            for item in items:
+                normalized = normalize_text(question_text(kind, item))
+                if not normalized or self.is_duplicate(normalized, existing):
+                    continue
+                self._conn.execute(
+                    "INSERT INTO items VALUES (?, ?, ?, ?, ?)",
+                    (kind, note, normalized, json.dumps(item), now),
+                )
+                existing.append(normalized)
+                added.append(item)
+            self._conn.execute(
+                "DELETE FROM items WHERE rowid IN (SELECT rowid FROM items "
+                "ORDER BY created_at DESC, rowid DESC LIMIT -1 OFFSET ?)",
+                (self.max_items,),
+            )
+            self._conn.commit()
+        return added
+
+    def _prune(self) -> int:
+        cursor = self._conn.execute("DELETE FROM items WHERE created_at < ?", (time.time() - self.ttl,))
+        return cursor.rowcount
+
+    def prune(self) -> int:
+        """Drop expired items; returns how many were removed"""
+        with self._lock:
+            removed = self._prune()
+            self._conn.commit()
+        return removed
+
+    def stats(self) -> dict:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT kind, COUNT(*), COUNT(DISTINCT note_hash) FROM items GROUP BY kind"
+            ).fetchall()
+        return {kind: {"items": items, "notes": notes} for kind, items, notes in rows}
+
+
+async def top_up(bank: ItemBank, kind: str, content: str, count: int, generate_missing,
+                 attempts: int = TOP_UP_ATTEMPTS) -> tuple[list, int]:
+    """``count`` items for a note, taken from the bank before asking the model.
+
+    ``generate_missing(n, exclude)`` is awaited for the shortfall with the
+    question texts already banked, which the model is told not to repeat.
+    Returns the items and how many of them came from the bank.
+    """
+    note = note_hash(content)
+    # SQLite calls block, so they run on a worker thread rather than the event loop
+    items = await asyncio.to_thread(bank.items, kind, note)
+    from_bank = min(len(items), count)
+    for _ in range(attempts):
+        missing = count - len(items)
+        if missing <= 0:
+            break
+        generated = await generate_missing(missing, [question_text(kind, item) for item in items])
+        await asyncio.to_thread(bank.add, kind, note, generated)
+        # Re-read rather than append: a concurrent request may have banked items too
+        items = await asyncio.to_thread(bank.items, kind, note)
+    return items[:count], from_bank
+
+
+async def _simulate(requests: list, latency_per_item: float) -> tuple[int, float]:
+    bank = ItemBank(":memory:")
+    counter = itertools.count()
+    generated = 0
+
+    async def generate_missing(n: int, exclude: list) -> list:
+        nonlocal generated
+        generated += n
+        await asyncio.sleep(latency_per_item * n)
+        return [{"question": f"Question number {next(counter)} about cells?", "answer": "..."}
+                for _ in range(n)]
+
+    start = time.perf_counter()
+    for count in requests:
+        await top_up(bank, "flashcards", "# Cells\nNotes about cells.", count, generate_missing)
+    return generated, time.perf_counter() - start
+
+
+def benchmark():
+    """Model items generated for a user asking for more cards on one note"""
+    requests = [5, 10, 10, 15, 5]
+    generated, elapsed = asyncio.run(_simulate(requests, latency_per_item=0.01))
+    print(f"requests {requests}")
+    print(f"full regeneration: {sum(requests)} items generated")
+    print(f"item bank top-up:  {generated} items generated ({elapsed:.2f}s)")
+
+
+if __name__ == "__main__":
+    benchmark()
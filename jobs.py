@@ -0,0 +1,381 @@
+import asyncio
+import ipaddress
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import urllib.parse
+import urllib.request
+import uuid
+from abc import ABC, abstractmethod
+from dataclasses import asdict, dataclass, field
+
+import logs
+
+JOB_TTL = float(os.environ.get("JOB_TTL", "3600"))
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", "4"))
+# Jobs allowed to wait for a worker; further submissions are turned away
+JOB_QUEUE = int(os.environ.get("JOB_QUEUE", "64"))
+# "memory" keeps jobs in this process; "sqlite" persists them to JOB_DB
+JOB_BACKEND = os.environ.get("JOB_BACKEND", "memory")
+JOB_DB = os.environ.get("JOB_DB", "jobs.db")
+# Seconds an unfinished job survives without a heartbeat from the worker that owns it
+JOB_LEASE = float(os.environ.get("JOB_LEASE", "60"))
+WEBHOOK_ATTEMPTS = 3
+# Comma-separated hosts webhooks may be sent to; unset allows any public https host
+WEBHOOK_ALLOWED_HOSTS = {
+    host.strip().lower() for host in os.environ.get("WEBHOOK_ALLOWED_HOSTS", "").split(",") if host.strip()
+}
+
+INTERRUPTED = "interrupted: the worker running it stopped"
+
+log = logs.get_logger("jobs")
+
+
+@dataclass
+class Job:
+    """Represents a long-running generation and its outcome"""
+    job_id: str
+    kind: str
+    status: str = "queued"
+    result: dict | None = None
+    error: str | None = None
+    webhook_url: str | None = None
+    created_at: float = field(default_factory=time.time)
+    updated_at: float = field(default_factory=time.time)
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+class JobStore(ABC):
+    """Storage interface for jobs; subclasses provide the backend"""
+
+    @abstractmethod
+    def create(self, job: Job, owner: str | None = None):
+        ...
+
+    @abstractmethod
+    def get(self, job_id: str) -> Job | None:
+        ...
+
+    @abstractmethod
+    def update(self, job_id: str, **fields):
+        ...
+
+    @abstractmethod
+    def purge_expired(self, ttl: float) -> int:
+        """Delete finished jobs last touched more than ``ttl`` seconds ago"""
+
+    @abstractmethod
+    def heartbeat(self, owner: str):
+        """Renew the lease on every unfinished job ``owner`` holds"""
+
+    @abstractmethod
+    def fail_expired(self, lease: float) -> int:
+        """Mark failed the unfinished jobs whose owner has not renewed them for ``lease`` seconds"""
+
+
+class MemoryJobStore(JobStore):
+    def __init__(self):
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def create(self, job: Job, owner: str | None = None):
+        with self._lock:
+            self._jobs[job.job_id] = job
+
+    def get(self, job_id: str) -> Job | None:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return Job(**job.to_dict()) if job else None
+
+    def update(self, job_id: str, **fields):
+        with self._lock:
+            job = self._jobs[job_id]
+            for name, value in fields.items():
+                setattr(job, name, value)
+            job.updated_at = time.time()
+
+    def purge_expired(self, ttl: float) -> int:
+        cutoff = time.time() - ttl
+        with self._lock:
+            expired = [
+                job_id for job_id, job in self._jobs.items()
+                if job.status in ("succeeded", "failed") and job.updated_at < cutoff
+            ]
+            for job_id in expired:
+                del self._jobs[job_id]
+        return len(expired)
+
+    # Jobs live and die with the process running them, so no lease ever expires
+    def heartbeat(self, owner: str):
+        pass
+
+    def fail_expired(self, lease: float) -> int:
+        return 0
+
+
+class SQLiteJobStore(JobStore):
+    def __init__(self, path: str = JOB_DB):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "job_id TEXT PRIMARY KEY, kind TEXT NOT NULL, status TEXT NOT NULL, "
+            "result TEXT, error TEXT, webhook_url TEXT, "
+            "created_at REAL NOT NULL, updated_at REAL NOT NULL, owner TEXT, heartbeat_at REAL)"
+        )
+        # Databases created before leases lack the owner columns
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+        for column, kind in (("owner", "TEXT"), ("heartbeat_at", "REAL")):
+            if column not in columns:
+                self._conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} {kind}")
+        self._conn.commit()
+
+    def create(self, job: Job, owner: str | None = None):
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO jobs (job_id, kind, status, result, error, webhook_url, "
+                "created_at, updated_at, owner, heartbeat_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (job.job_id, job.kind, job.status, json.dumps(job.result), job.error,
+                 job.webhook_url, job.created_at, job.updated_at, owner, time.time()),
+            )
+            self._conn.commit()
+
+    def get(self, job_id: str) -> Job | None:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT job_id, kind, status, result, error, webhook_url, created_at, updated_at "
+                "FROM jobs WHERE job_id = ?",
+                (job_id,),
+            ).fetchone()
+        if row is None:
+            return None
+        return Job(row[0], row[1], row[2], json.loads(row[3]), row[4], row[5], row[6], row[7])
+
+    def update(self, job_id: str, **fields):
+        fields["updated_at"] = time.time()
+        if "result" in fields:
+            fields["result"] = json.dumps(fields["result"])
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        with self._lock:
+            self._conn.execute(
+                f"UPDATE jobs SET {assignments} WHERE job_id = ?",
+                (*fields.values(), job_id),
+            )
+            self._conn.commit()
+
+    def purge_expired(self, ttl: float) -> int:
+        with self._lock:
+            cursor = self._conn.execute(
+                "DELETE FROM jobs WHERE status IN ('succeeded', 'failed') AND updated_at < ?",
+                (time.time() - ttl,),
+            )
+            self._conn.commit()
+            return cursor.rowcount
+
+    def heartbeat(self, owner: str):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET heartbeat_at = ? WHERE owner = ? AND status IN ('queued', 'running')",
+                (time.time(), owner),
+            )
+            self._conn.commit()
+
+    def fail_expired(self, lease: float) -> int:
+        now = time.time()
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET status = 'failed', error = ?, updated_at = ? "
+                "WHERE status IN ('queued', 'running') AND COALESCE(heartbeat_at, updated_at) < ?",
+                (INTERRUPTED, now, now - lease),
+            )
+            self._conn.commit()
+            return cursor.rowcount
+
+
+def create_store() -> JobStore:
+    """Build the job store selected by JOB_BACKEND"""
+    if JOB_BACKEND == "sqlite":
+        return SQLiteJobStore(JOB_DB)
+    if JOB_BACKEND == "memory":
+        return MemoryJobStore()
+    raise ValueError(f"Unknown JOB_BACKEND: {JOB_BACKEND}")
+
+
+class QueueFull(Exception):
+    """Every queue slot is taken; the client should submit again later"""
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"Job queue is full, retry in {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+
+class InvalidWebhook(ValueError):
+    """Webhook URL is not https, or points at a host the server must not call"""
+
+
+def check_webhook_url(url: str):
+    """Raise InvalidWebhook unless ``url`` is https on an allowed, public host.
+
+    The host is resolved and every address it maps to is checked, so a
+    public name that points at a private address is refused too.
+    """
+    try:
+        parts = urllib.parse.urlsplit(url)
+        host, port = (parts.hostname or "").lower(), parts.port or 443
+    except ValueError:
+        raise InvalidWebhook("webhook_url is not a valid URL")
+    if parts.scheme != "https" or not host:
+        raise InvalidWebhook("webhook_url must be an https URL")
+    if WEBHOOK_ALLOWED_HOSTS:
+        if host not in WEBHOOK_ALLOWED_HOSTS:
+            raise InvalidWebhook(f"webhook host {host} is not allowed")
+        return
+    try:
+        addresses = {info[4][0] for info in socket.getaddrinfo(host, port, proto=socket.IPPROTO_TCP)}
+    except (socket.gaierror, UnicodeError):
+        raise InvalidWebhook(f"webhook host {host} does not resolve")
+    for address in addresses:
+        if not ipaddress.ip_address(address.split("%")[0]).is_global:
+            raise InvalidWebhook(f"webhook host {host} resolves to a non-public address")
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    """A redirect could send the payload to an address check_webhook_url refused"""
+
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        return None
+
+
+_webhook_opener = urllib.request.build_opener(_NoRedirect)
+
+
+def post_webhook(url: str, payload: dict):
+    # Checked again at delivery, since DNS may have changed since the job was submitted
+    check_webhook_url(url)
+    request = urllib.request.Request(
+        url,
+        data=json.dumps(payload).encode("utf-8"),
+        headers={"Content-Type": "application/json"},
+        method="POST",
+    )
+    with _webhook_opener.open(request, timeout=10) as response:
+        response.read()
+
+
+async def validate_webhook(url: str | None):
+    """check_webhook_url on a worker thread, since resolving the host blocks"""
+    if url:
+        await asyncio.to_thread(check_webhook_url, url)
+
+
+class JobRunner:
+    """Runs submitted coroutines on in-process worker tasks.
+
+    Workers and the maintenance loop start on the first submit or lookup,
+    so creating a runner has no side effects at import time. Every job is
+    leased to the runner that queued it; the maintenance loop renews this
+    runner's leases and fails jobs whose owner stopped renewing theirs,
+    which is safe with several processes sharing one store.
+
+    At most ``max_queue`` jobs wait for a worker; submit raises QueueFull
+    beyond that, so queued closures and the uploads they hold stay bounded.
+    Store calls run on worker threads, since SQLite blocks.
+    """
+
+    def __init__(self, store: JobStore, workers: int = JOB_WORKERS, ttl: float = JOB_TTL,
+                 lease: float = JOB_LEASE, max_queue: int = JOB_QUEUE):
+        self.store = store
+        self.workers = workers
+        self.ttl = ttl
+        self.lease = lease
+        self.max_queue = max_queue
+        self.owner = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._queue = None
+        self._tasks = []
+        # Submissions holding a queue slot, counted before their row is written
+        self._backlog = 0
+        # Moving average of how long a job runs, for Retry-After
+        self._job_seconds = 10.0
+
+    def _ensure_started(self):
+        if self._queue is not None:
+            return
+        self._queue = asyncio.Queue(self.max_queue)
+        self._tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._maintain()))
+
+    def check_capacity(self):
+        """Raise QueueFull if a job submitted now would be turned away"""
+        if self._backlog >= self.max_queue:
+            raise QueueFull(max(1.0, self._job_seconds * (self._backlog + 1) / self.workers))
+
+    async def submit(self, kind: str, run, webhook_url: str | None = None) -> Job:
+        """Queue ``run()``, a coroutine function returning a JSON-able dict"""
+        self._ensure_started()
+        self.check_capacity()
+        self._backlog += 1
+        job = Job(job_id=uuid.uuid4().hex, kind=kind, webhook_url=webhook_url)
+        try:
+            await asyncio.to_thread(self.store.create, job, self.owner)
+        except BaseException:
+            self._backlog -= 1
+            raise
+        self._queue.put_nowait((job.job_id, run))
+        return job
+
+    async def get(self, job_id: str) -> Job | None:
+        self._ensure_started()
+        return await asyncio.to_thread(self.store.get, job_id)
+
+    async def _work(self):
+        while True:
+            job_id, run = await self._queue.get()
+            self._backlog -= 1
+            started = time.monotonic()
+            try:
+                await asyncio.to_thread(self.store.update, job_id, status="running")
+                try:
+                    result = await run()
+                    await asyncio.to_thread(self.store.update, job_id, status="succeeded", result=result)
+                except Exception as e:
+                    log.error("job failed", job_id=job_id, error=str(e))
+                    await asyncio.to_thread(self.store.update, job_id, status="failed", error=str(e))
+                self._job_seconds += 0.1 * (time.monotonic() - started - self._job_seconds)
+
+                job = await asyncio.to_thread(self.store.get, job_id)
+                if job and job.webhook_url:
+                    await self._deliver(job)
+            finally:
+                self._queue.task_done()
+
+    async def _deliver(self, job: Job):
+        for attempt in range(WEBHOOK_ATTEMPTS):
+            try:
+                await asyncio.to_thread(post_webhook, job.webhook_url, job.to_dict())
+                return
+            except InvalidWebhook as e:
+                log.warning("webhook refused", job_id=job.job_id, error=str(e))
+                return
+            except Exception as e:
+                log.warning("webhook delivery failed", job_id=job.job_id,
+                            attempt=attempt + 1, error=str(e))
+                await asyncio.sleep(2 ** attempt)
+
+    async def _maintain(self):
+        purged_at = time.monotonic()
+        while True:
+            await asyncio.sleep(max(self.lease / 3, 1))
+            await asyncio.to_thread(self.store.heartbeat, self.owner)
+            failed = await asyncio.to_thread(self.store.fail_expired, self.lease)
+            if failed:
+                log.warning("failed jobs whose worker stopped", count=failed)
+            if time.monotonic() - purged_at >= self.ttl / 4:
+                purged_at = time.monotonic()
+                purged = await asyncio.to_thread(self.store.purge_expired, self.ttl)
+                if purged:
+                    log.info("purged expired jobs", count=purged)
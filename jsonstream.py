@@ -0,0 +1,80 @@
+import json
+
+
+class JSONArrayStream:
+    """Incremental parser that yields the elements of a streamed JSON array.
+
+    Text arrives in arbitrary chunks from the model. Anything before the
+    opening ``[`` (a markdown fence, a preamble sentence) is skipped, and
+    each top-level element is decoded as soon as its closing delimiter has
+    been seen.
+    """
+
+    def __init__(self):
+        self._buffer = ""
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._element_start = None
+        self.done = False
+
+    def feed(self, text: str) -> list:
+        """Consume a chunk of text and return the elements it completed"""
+        if self.done:
+            return []
+        self._buffer += text
+        items = []
+        buffer = self._buffer
+        pos = self._pos
+        while pos < len(buffer):
+            char = buffer[pos]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+            elif self._depth == 0:
+                if char == "[":
+                    self._depth = 1
+            elif char == '"':
+                self._in_string = True
+                if self._element_start is None:
+                    self._element_start = pos
+            elif char in "[{":
+                if self._depth == 1 and self._element_start is None:
+                    self._element_start = pos
+                self._depth += 1
+            elif char in "]}":
+                self._depth -= 1
+                if self._depth == 0:
+                    self._emit(buffer, pos, items)
+                    self.done = True
+                    pos += 1
+                    break
+            elif char == "," and self._depth == 1:
+                self._emit(buffer, pos, items)
+            elif self._depth == 1 and self._element_start is None and not char.isspace():
+                self._element_start = pos
+            pos += 1
+
+        # Drop text that belongs to elements already emitted
+        if self._element_start is not None:
+            self._buffer = buffer[self._element_start:]
+            pos -= self._element_start
+            self._element_start = 0
+        else:
+            self._buffer = ""
+            pos = 0
+        self._pos = pos
+        return items
+
+    def _emit(self, buffer: str, end: int, items: list):
+        if self._element_start is None:
+            return
+        element = buffer[self._element_start:end].strip()
+        self._element_start = None
+        if element:
+            items.append(json.loads(element))
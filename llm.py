@@ -0,0 +1,115 @@
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_MODEL = "gemini-2.5-flash"
+MAX_CONCURRENCY = int(os.environ.get("LLM_MAX_CONCURRENCY", "16"))
+
+
+class LLMGateway:
+    """Async entry point for every model call made by the server.
+
+    Uses the genai client's native async surface (``client.aio``) when it is
+    available and falls back to running the synchronous client in a bounded
+    thread pool, so a slow generation never blocks the event loop.
+    """
+
+    def __init__(self, client, max_concurrency: int = MAX_CONCURRENCY):
+        self.client = client
+        self.max_concurrency = max_concurrency
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._executor = None
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_concurrency, thread_name_prefix="llm"
+            )
+        return self._executor
+
+    async def generate_content(self, contents, model: str = DEFAULT_MODEL, config=None):
+        """Run one generation and return the raw provider response"""
+        async with self._semaphore:
+            aio = getattr(self.client, "aio", None)
+            if aio is not None:
+                return await aio.models.generate_content(
+                    model=model, contents=contents, config=config
+                )
+
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(
+                self._get_executor(),
+                lambda: self.client.models.generate_content(
+                    model=model, contents=contents, config=config
+                ),
+            )
+
+    async def generate(self, contents, model: str = DEFAULT_MODEL, config=None) -> str:
+        """Run one generation and return the response text"""
+        response = await self.generate_content(contents, model=model, config=config)
+        return response.text
+
+    async def stream(self, contents, model: str = DEFAULT_MODEL, config=None):
+        """Yield response text chunks as the model produces them"""
+        async with self._semaphore:
+            aio = getattr(self.client, "aio", None)
+            if aio is not None:
+                response = await aio.models.generate_content_stream(
+                    model=model, contents=contents, config=config
+                )
+                async for chunk in response:
+                    if chunk.text:
+                        yield chunk.text
+                return
+
+            loop = asyncio.get_running_loop()
+            executor = self._get_executor()
+            iterator = await loop.run_in_executor(
+                executor,
+                lambda: iter(
+                    self.client.models.generate_content_stream(
+                        model=model, contents=contents, config=config
+                    )
+                ),
+            )
+            while True:
+                chunk = await loop.run_in_executor(executor, next, iterator, None)
+                if chunk is None:
+                    break
+                if chunk.text:
+                    yield chunk.text
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+
+async def _run_load(gateway: LLMGateway, requests: int, in_flight: int) -> float:
+    limit = asyncio.Semaphore(in_flight)
+
+    async def one():
+        async with limit:
+            await gateway.generate("load test prompt")
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    return requests / (time.perf_counter() - start)
+
+
+def load_test(latency: float = 0.1, requests: int = 64, levels=(1, 2, 4, 8, 16)):
+    """Print gateway throughput against a stub model for each in-flight level"""
+    from tests.fakes import StubClient
+
+    for use_aio in (True, False):
+        surface = "aio" if use_aio else "thread pool"
+        for in_flight in levels:
+            gateway = LLMGateway(StubClient(latency, use_aio=use_aio), max(levels))
+            rps = asyncio.run(_run_load(gateway, requests, in_flight))
+            gateway.close()
+            print(f"{surface:>11} | in-flight {in_flight:>3} | {rps:8.1f} req/s")
+
+
+if __name__ == "__main__":
+    load_test()
@@ -0,0 +1,74 @@
+import json
+import logging
+import os
+import random
+import sys
+
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO").upper()
+# Fraction of high-volume payload events that are actually written
+LOG_SAMPLE_RATE = float(os.environ.get("LOG_SAMPLE_RATE", "0.05"))
+
+_configured = False
+
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per line with the event name and its fields"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname.lower(),
+            "logger": record.name,
+            "event": record.getMessage(),
+        }
+        entry.update(getattr(record, "fields", {}))
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+def _configure():
+    global _configured
+    if _configured:
+        return
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(JSONFormatter())
+    root = logging.getLogger("vibelearning")
+    root.addHandler(handler)
+    root.setLevel(LOG_LEVEL)
+    root.propagate = False
+    _configured = True
+
+
+class StructuredLogger:
+    """Thin wrapper that logs an event name plus keyword fields"""
+
+    def __init__(self, name: str, sample_rate: float = LOG_SAMPLE_RATE):
+        _configure()
+        self._logger = logging.getLogger(f"vibelearning.{name}")
+        self.sample_rate = sample_rate
+
+    def _log(self, level: int, event: str, fields: dict, exc_info=False):
+        if self._logger.isEnabledFor(level):
+            self._logger.log(level, event, extra={"fields": fields}, exc_info=exc_info)
+
+    def debug(self, event: str, **fields):
+        self._log(logging.DEBUG, event, fields)
+
+    def info(self, event: str, **fields):
+        self._log(logging.INFO, event, fields)
+
+    def warning(self, event: str, **fields):
+        self._log(logging.WARNING, event, fields)
+
+    def error(self, event: str, exc_info=False, **fields):
+        self._log(logging.ERROR, event, fields, exc_info)
+
+    def sampled(self, event: str, **fields):
+        """Debug event for high-volume payloads, written for a fraction of calls"""
+        if random.random() < self.sample_rate:
+            self._log(logging.DEBUG, event, {**fields, "sample_rate": self.sample_rate})
+
+
+def get_logger(name: str) -> StructuredLogger:
+    return StructuredLogger(name)
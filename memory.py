@@ -0,0 +1,240 @@
+import hashlib
+import math
+import os
+import re
+import threading
+from collections import Counter
+
+import chunking
+import metrics
+import prompts
+from tokens import count_tokens
+
+# Most recent exchanges (student question and teacher reply) kept word for word
+VOICE_MEMORY_TURNS = int(os.environ.get("VOICE_MEMORY_TURNS", "6"))
+# Note sections sent with each question once the note is too long to send whole
+VOICE_NOTE_SECTIONS = int(os.environ.get("VOICE_NOTE_SECTIONS", "3"))
+# Notes up to this many tokens are sent whole; retrieval only pays off above it
+VOICE_FULL_NOTE_TOKENS = int(os.environ.get("VOICE_FULL_NOTE_TOKENS", "1500"))
+# Longest running summary of the older turns, in tokens
+VOICE_SUMMARY_TOKENS = int(os.environ.get("VOICE_SUMMARY_TOKENS", "300"))
+SECTION_CHARS = 2000
+
+VOICE_PROMPT_TOKENS = metrics.registry.register(metrics.Histogram(
+    "voice_prompt_tokens", "Estimated prompt tokens sent to the LLM per voice turn", (),
+    metrics.SIZE_BUCKETS,
+))
+
+SUMMARY_INSTRUCTIONS = """
+        You keep notes on a tutoring conversation. Update the summary with the new exchanges:
+        which topics were covered, what the student got right or wrong, and open questions.
+        Reply with the updated summary only, in at most 150 words.
+"""
+
+_word = re.compile(r"\w+")
+_sentence_end = re.compile(r"(?<=[.!?])\s")
+
+
+def words(text: str) -> list[str]:
+    return [word for word in _word.findall(text.lower()) if len(word) > 2]
+
+
+class SectionIndex:
+    """BM25 over the sections of a note, to pick the ones a question is about"""
+
+    def __init__(self, sections: list[str], k1: float = 1.5, b: float = 0.75):
+        self.sections = sections
+        self.k1 = k1
+        self.b = b
+        self.counts = [Counter(words(section)) for section in sections]
+        self.lengths = [sum(counts.values()) for counts in self.counts]
+        self.average = sum(self.lengths) / len(sections) if sections else 0
+        frequency = Counter(word for counts in self.counts for word in counts)
+        self.idf = {
+            word: math.log(1 + (len(sections) - n + 0.5) / (n + 0.5))
+            for word, n in frequency.items()
+        }
+
+    def score(self, index: int, query: list[str]) -> float:
+        counts, length = self.counts[index], self.lengths[index]
+        total = 0.0
+        for word in query:
+            tf = counts.get(word)
+            if tf:
+                norm = self.k1 * (1 - self.b + self.b * length / (self.average or 1))
+                total += self.idf[word] * tf * (self.k1 + 1) / (tf + norm)
+        return total
+
+    def search(self, query: str, limit: int) -> list[int]:
+        """Indices of the best matching sections, in note order"""
+        terms = set(words(query))
+        scores = [(self.score(i, terms), i) for i in range(len(self.sections))]
+        best = sorted(scores, key=lambda pair: (-pair[0], pair[1]))[:limit]
+        return sorted(i for score, i in best if score > 0)
+
+
+def extract_summary(summary: str, turns: list[dict], max_tokens: int = VOICE_SUMMARY_TOKENS) -> str:
+    """Local summary: the first sentence of each turn, oldest lines dropped past ``max_tokens``"""
+    lines = summary.splitlines() if summary else []
+    for turn in turns:
+        first = _sentence_end.split(turn["content"].strip(), 1)[0]
+        speaker = "Student" if turn["role"] == "user" else "Teacher"
+        lines.append(f"{speaker}: {first}")
+    while len(lines) > 1 and count_tokens("\n".join(lines)) > max_tokens:
+        lines.pop(0)
+    return "\n".join(lines)
+
+
+def summary_request(summary: str, turns: list[dict]) -> str:
+    exchanges = "\n".join(
+        f"{'Student' if turn['role'] == 'user' else 'Teacher'}: {turn['content']}" for turn in turns
+    )
+    return f"Current summary:\n{summary or '(none)'}\n\nNew exchanges:\n{exchanges}"
+
+
+class SessionMemory:
+    """What the LLM sees of a voice session, bounded in size.
+
+    The last ``turns`` exchanges are kept verbatim; older ones are folded
+    into a running summary by ``summarize(summary, turns)``, or locally when
+    it is not given or fails. Long notes are cut into sections and only the
+    ones relevant to the current question are sent.
+    """
+
+    def __init__(self, summarize=None, turns: int = VOICE_MEMORY_TURNS,
+                 sections: int = VOICE_NOTE_SECTIONS, full_note_tokens: int = VOICE_FULL_NOTE_TOKENS):
+        self.summarize = summarize
+        self.max_turns = turns
+        self.max_sections = sections
+        self.full_note_tokens = full_note_tokens
+        self.summary = ""
+        self.turns = []
+        self.note = ""
+        self.index = None
+        self._note_digest = None
+        self._lock = threading.Lock()
+        self._fold_lock = threading.Lock()
+
+    def set_note(self, note_content: str):
+        """Index the note; a no-op when it has not changed since the last turn"""
+        digest = hashlib.sha256(note_content.encode("utf-8")).hexdigest()
+        if digest == self._note_digest:
+            return
+        self._note_digest = digest
+        self.note = prompts.compact_note(note_content)
+        if count_tokens(self.note) <= self.full_note_tokens:
+            self.index = None
+        else:
+            self.index = SectionIndex(chunking.split_document(self.note, SECTION_CHARS))
+
+    def material(self, question: str) -> str:
+        """The whole note when it is short, otherwise the sections ``question`` is about"""
+        if self.index is None:
+            return self.note
+        # The last reply is part of the query so follow-ups like "and the
+        # second one?" find the section the teacher was talking about
+        with self._lock:
+            previous = self.turns[-1]["content"] if self.turns else ""
+        hits = self.index.search(f"{question} {previous}", self.max_sections)
+        if not hits:
+            hits = range(min(self.max_sections, len(self.index.sections)))
+        return "\n\n".join(self.index.sections[i].strip() for i in hits)
+
+    def messages(self, system_prompt: str, question: str) -> list[dict]:
+        """Chat messages for the next LLM call, ending with ``question``"""
+        with self._lock:
+            summary, turns = self.summary, list(self.turns)
+        messages = [{"role": "system", "content": system_prompt}]
+        if summary:
+            messages.append({"role": "system", "content": f"Earlier in this conversation:\n{summary}"})
+        messages += turns
+        messages.append({"role": "user", "content": question})
+        return messages
+
+    def add(self, question: str, reply: str):
+        with self._lock:
+            self.turns += [{"role": "user", "content": question},
+                           {"role": "assistant", "content": reply}]
+
+    def fold(self):
+        """Move exchanges beyond the verbatim window into the summary"""
+        with self._fold_lock:
+            with self._lock:
+                overflow = len(self.turns) - 2 * self.max_turns
+                if overflow <= 0:
+                    return
+                older, summary = self.turns[:overflow], self.summary
+            try:
+                if self.summarize is None:
+                    raise LookupError("no summarizer")
+                folded = self.summarize(summary, older).strip()
+            except Exception:
+                folded = extract_summary(summary, older)
+            with self._lock:
+                self.summary = folded
+                del self.turns[:overflow]
+
+    def fold_later(self) -> threading.Thread:
+        """Fold in the background, so the summary call never delays a reply"""
+        thread = threading.Thread(target=self.fold, name="voice-memory", daemon=True)
+        thread.start()
+        return thread
+
+
+def prompt_tokens(messages: list[dict]) -> int:
+    tokens = sum(count_tokens(message["content"]) + 4 for message in messages)
+    VOICE_PROMPT_TOKENS.observe(tokens)
+    return tokens
+
+
+TOPICS = [
+    ("Mitochondria", "mitochondria produce atp through oxidative phosphorylation on the inner membrane"),
+    ("Photosynthesis", "chloroplasts capture light and fix carbon dioxide in the calvin cycle"),
+    ("DNA replication", "helicase unwinds the helix and polymerase copies each strand"),
+    ("Enzymes", "enzymes lower activation energy and bind substrates at the active site"),
+    ("Osmosis", "water crosses a semipermeable membrane toward the higher solute concentration"),
+    ("Meiosis", "meiosis halves the chromosome number and shuffles alleles by crossing over"),
+    ("Ecosystems", "energy flows from producers to consumers while nutrients cycle"),
+    ("Immunity", "antibodies from b cells tag antigens and t cells kill infected cells"),
+]
+
+
+def sample_session(sections_per_topic: int = 4):
+    """A long note of distinct topics and questions that each point at one of them"""
+    parts = []
+    for title, facts in TOPICS:
+        for part in range(sections_per_topic):
+            body = " ".join(f"{facts.capitalize()} (detail {part}.{line})." for line in range(12))
+            parts.append(f"# {title} {part + 1}\n{body}")
+    questions = [(title, f"Can you explain how {facts.split()[0]} relates to {facts.split()[-1]}?")
+                 for title, facts in TOPICS]
+    return "\n".join(parts), questions
+
+
+def benchmark(session_turns: int = 40):
+    """Prompt tokens per turn, full history and whole note against bounded memory"""
+    note, questions = sample_session()
+    system = "You are a helpful and patient teacher.\n--- MATERIAL TO REVIEW ---\n{}\n--- END ---"
+    reply = ("Good question. " + "Let me walk you through it step by step with an example. " * 4).strip()
+
+    memory = SessionMemory()
+    memory.set_note(note)
+    history = [{"role": "system", "content": system.format(note)}]
+    hits = 0
+    print(f"{'turn':>4} | {'full history':>12} | {'memory':>6}")
+    for turn in range(1, session_turns + 1):
+        title, question = questions[turn % len(questions)]
+        material = memory.material(question)
+        hits += title in material
+        full = prompt_tokens(history + [{"role": "user", "content": question}])
+        bounded = prompt_tokens(memory.messages(system.format(material), question))
+        if turn in (1, 5, 10, 20, 40) or turn == session_turns:
+            print(f"{turn:>4} | {full:>12} | {bounded:>6}")
+        history += [{"role": "user", "content": question}, {"role": "assistant", "content": reply}]
+        memory.add(question, reply)
+        memory.fold()
+    print(f"relevant section retrieved on {hits}/{session_turns} turns")
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,202 @@
+import bisect
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+
+from starlette.routing import Match
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+# Route template of the request being handled, used to label stage timings
+current_endpoint = contextvars.ContextVar("current_endpoint", default="none")
+
+
+def _format_labels(names, values, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def header(self) -> list[str]:
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}",
+        ]
+
+    def render(self) -> list[str]:
+        lines = self.header()
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {value}")
+        return lines
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class CallbackGauge(Metric):
+    """Gauge whose value is read from ``fn()`` at scrape time"""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, fn):
+        super().__init__(name, documentation)
+        self.fn = fn
+
+    def render(self) -> list[str]:
+        return self.header() + [f"{self.name} {self.fn()}"]
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][bisect.bisect_left(self.buckets, value)] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def render(self) -> list[str]:
+        lines = self.header()
+        with self._lock:
+            for key, (counts, total, count) in sorted(self._values.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets + ("+Inf",), counts):
+                    cumulative += bucket_count
+                    labels = _format_labels(self.labelnames, key, f'le="{bound}"')
+                    lines.append(f"{self.name}_bucket{labels} {cumulative}")
+                labels = _format_labels(self.labelnames, key)
+                lines.append(f"{self.name}_sum{labels} {total}")
+                lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric: Metric) -> Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        """Prometheus text exposition of every registered metric"""
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+REQUEST_LATENCY = registry.register(Histogram(
+    "http_request_duration_seconds", "Request latency by endpoint", ("endpoint", "method", "status")
+))
+REQUESTS_IN_FLIGHT = registry.register(Gauge(
+    "http_requests_in_flight", "Requests currently being handled", ("endpoint",)
+))
+REQUEST_ERRORS = registry.register(Counter(
+    "http_request_errors_total", "Requests that ended with a 4xx/5xx status", ("endpoint", "status")
+))
+STAGE_LATENCY = registry.register(Histogram(
+    "stage_duration_seconds", "Time spent in each processing stage", ("endpoint", "stage")
+))
+PROMPT_CHARS = registry.register(Histogram(
+    "llm_prompt_chars", "Size of prompts sent to the model", ("endpoint",), SIZE_BUCKETS
+))
+RESPONSE_CHARS = registry.register(Histogram(
+    "llm_response_chars", "Size of model responses", ("endpoint",), SIZE_BUCKETS
+))
+
+
+@contextmanager
+def stage(name: str):
+    """Time a block as one stage of the current endpoint"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_LATENCY.observe(
+            time.perf_counter() - start, endpoint=current_endpoint.get(), stage=name
+        )
+
+
+def route_template(request) -> str:
+    """Path template of the route a request will hit, e.g. ``/jobs/{job_id}``"""
+    for route in request.app.router.routes:
+        match, _ = route.matches(request.scope)
+        if match == Match.FULL:
+            return route.path
+    return "unmatched"
+
+
+async def metrics_middleware(request, call_next):
+    """Record latency, in-flight count and errors per route template"""
+    endpoint = route_template(request)
+    token = current_endpoint.set(endpoint)
+    REQUESTS_IN_FLIGHT.inc(endpoint=endpoint)
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        REQUESTS_IN_FLIGHT.dec(endpoint=endpoint)
+        REQUEST_LATENCY.observe(
+            time.perf_counter() - start,
+            endpoint=endpoint, method=request.method, status=status,
+        )
+        if status >= 400:
+            REQUEST_ERRORS.inc(endpoint=endpoint, status=status)
+        current_endpoint.reset(token)
@@ -0,0 +1,204 @@
+import hashlib
+import json
+import os
+import time
+from dataclasses import dataclass
+
+import prompts
+
+# Notes shorter than this (compacted) are processed whole; diffing only pays
+# off once a full regeneration is expensive
+NOTE_DIFF_MIN_CHARS = int(os.environ.get("NOTE_DIFF_MIN_CHARS", "4000"))
+# Average number of heading sections generated together in one model call
+NOTE_SECTION_GROUP = int(os.environ.get("NOTE_SECTION_GROUP", "3"))
+# Fewest items one group of headings should get; groups that would get fewer are merged
+NOTE_MIN_ITEMS = int(os.environ.get("NOTE_MIN_ITEMS", "5"))
+
+
+@dataclass
+class Section:
+    """Blocks under one heading, identified by the heading block's id"""
+    key: str
+    title: str
+    text: str
+    digest: str
+
+
+def _digest(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _section(key: str, title: str, blocks: list) -> Section:
+    text = prompts.compact_blocks(blocks)
+    return Section(key, title, text, _digest(text))
+
+
+def split_note(note_content: str) -> list[Section] | None:
+    """Sections of a BlockNote note, split at its top-level headings.
+
+    Blocks before the first heading form a section of their own. Returns
+    None when the note is not BlockNote JSON.
+    """
+    blocks = prompts.parse_blocks(note_content)
+    if blocks is None:
+        return None
+    sections = []
+    key, title, current = "", "", []
+    for block in blocks:
+        if block.get("type") == "heading":
+            if current:
+                sections.append(_section(key, title, current))
+            key = str(block.get("id") or len(sections))
+            title = prompts.inline_text(block.get("content")).strip()
+            current = []
+        current.append(block)
+    if current:
+        sections.append(_section(key, title, current))
+    return [section for section in sections if section.text.strip()]
+
+
+def _join(members: list[Section]) -> Section:
+    return Section(
+        members[0].key,
+        members[0].title,
+        "\n".join(member.text for member in members),
+        _digest("".join(member.digest for member in members)),
+    )
+
+
+def _runs(sections: list[Section], group: int) -> list[list[Section]]:
+    if group <= 1:
+        return [[section] for section in sections]
+    runs = []
+    current = []
+    for section in sections:
+        current.append(section)
+        if int(_digest(section.key)[:8], 16) % group == 0:
+            runs.append(current)
+            current = []
+    if current:
+        runs.append(current)
+    return runs
+
+
+def group_sections(sections: list[Section], group: int = NOTE_SECTION_GROUP) -> list[Section]:
+    """Merge runs of sections so each model call covers about ``group`` of them.
+
+    A run ends after a section whose heading id hashes to a multiple of
+    ``group``. Boundaries depend only on heading ids, not on content, so
+    editing a section never moves the boundaries of other groups.
+    """
+    return [_join(run) for run in _runs(sections, group)]
+
+
+def group_size(sections: int, count: int | None, min_items: int = NOTE_MIN_ITEMS) -> int:
+    """Sections per group for ``count`` items over a note of ``sections`` headings.
+
+    NOTE_SECTION_GROUP is doubled until a group averages ``min_items``
+    items. A multiple of the doubled size is a multiple of the smaller one
+    too, so adding a heading that crosses a doubling only drops boundaries.
+    """
+    group = max(NOTE_SECTION_GROUP, 1)
+    if count is not None:
+        while group < sections and count * group < sections * min_items:
+            group *= 2
+    return group
+
+
+def merge_small(runs: list[list[Section]], count: int, sections: int,
+                min_items: int = NOTE_MIN_ITEMS) -> list[list[Section]]:
+    """Merge each run whose share of ``count`` items is below ``min_items`` into the next.
+
+    A run's share is counted in headings, ``count * len(run) / sections``,
+    not in characters, so whether runs merge never depends on their text
+    and an edit inside a section cannot change which sections go together.
+    """
+    merged, current = [], []
+    for run in runs:
+        current = current + run
+        if count * len(current) >= min_items * sections:
+            merged.append(current)
+            current = []
+    if current:
+        if merged:
+            merged[-1] = merged[-1] + current
+        else:
+            merged.append(current)
+    return merged
+
+
+def note_sections(note_content: str, count: int | None = None,
+                  min_chars: int = NOTE_DIFF_MIN_CHARS) -> list[Section] | None:
+    """Independently generated parts of a note, or None to process it whole.
+
+    With ``count``, groups are sized and merged so each gets at least
+    NOTE_MIN_ITEMS of the items by heading count. Group boundaries depend
+    only on the note's heading ids, never on its text.
+    """
+    sections = split_note(note_content)
+    if not sections or sum(len(section.text) for section in sections) < min_chars:
+        return None
+    runs = _runs(sections, group_size(len(sections), count))
+    if count is not None:
+        runs = merge_small(runs, count, len(sections))
+    return [_join(run) for run in runs] if len(runs) > 1 else None
+
+
+def allocate(count: int, sections: list[Section]) -> list[int]:
+    """Split ``count`` items over sections in proportion to their length"""
+    total = sum(len(section.text) for section in sections) or 1
+    exact = [count * len(section.text) / total for section in sections]
+    shares = [int(share) for share in exact]
+    by_remainder = sorted(range(len(sections)), key=lambda i: (shares[i] - exact[i], i))
+    for index in by_remainder[:count - sum(shares)]:
+        shares[index] += 1
+    return shares
+
+
+def diff(old: list[Section], new: list[Section]) -> dict:
+    """Keys of sections added, removed, changed and unchanged between two versions"""
+    before = {section.key: section.digest for section in old}
+    after = {section.key: section.digest for section in new}
+    return {
+        "added": [key for key in after if key not in before],
+        "removed": [key for key in before if key not in after],
+        "changed": [key for key in after if key in before and before[key] != after[key]],
+        "unchanged": [key for key in after if before.get(key) == after[key]],
+    }
+
+
+def _edit(note_content: str, section: int) -> str:
+    blocks = json.loads(note_content)
+    headings = [i for i, block in enumerate(blocks) if block["type"] == "heading"]
+    paragraph = blocks[headings[section] + 1]
+    paragraph["content"][0]["text"] = "Edited: " + paragraph["content"][0]["text"]
+    return json.dumps(blocks)
+
+
+def benchmark(sections: int = 40, seconds_per_kchar: float = 0.01):
+    """Characters regenerated after a one-paragraph edit, whole note vs changed sections"""
+    note = prompts.sample_note(sections)
+    edited = _edit(note, sections // 2)
+    whole = len(prompts.compact_note(edited))
+    start = time.perf_counter()
+    for _ in range(100):
+        note_sections(edited, min_chars=0)
+    split_ms = (time.perf_counter() - start) * 10
+    print(f"whole note:      {whole:>6} chars, ~{whole / 1000 * seconds_per_kchar * 1000:.0f} ms model time")
+    print(f"split and hash:  {split_ms:.2f} ms")
+    for count in (None, 10, 20, 30):
+        before, after = note_sections(note, count, min_chars=0), note_sections(edited, count, min_chars=0)
+        if after is None:
+            print(f"{count} items{'':<21} | {sections} headings -> generated whole")
+            continue
+        changes = diff(before, after)
+        regenerated = sum(len(section.text) for section in after if section.key in changes["changed"])
+        shares = allocate(count or 0, after)
+        items = f"{count} items in calls of {min(shares)}-{max(shares)}" if count else "no item count"
+        print(f"{items:<30} | {sections} headings -> {len(after)} groups, "
+              f"{len(changes['changed'])} changed by the edit, {regenerated:>5} chars regenerated, "
+              f"~{regenerated / 1000 * seconds_per_kchar * 1000:.0f} ms model time")
+
+
+if __name__ == "__main__":
+    benchmark()
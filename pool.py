@@ -0,0 +1,350 @@
+import asyncio
+import json
+import os
+import random
+import time
+from dataclasses import dataclass
+
+import logs
+import metrics
+from llm import DEFAULT_MODEL, LLMGateway
+
+# Comma-separated providers to route to; "groq" is opt-in since it ignores
+# response schemas and tools
+POOL_PROVIDERS = [name.strip() for name in os.environ.get("POOL_PROVIDERS", "gemini").split(",")]
+# Requests per minute allowed per key, and how many may burst at once
+POOL_KEY_RPM = float(os.environ.get("POOL_KEY_RPM", "600"))
+POOL_BURST = int(os.environ.get("POOL_BURST", "10"))
+POOL_ATTEMPTS = int(os.environ.get("POOL_ATTEMPTS", "4"))
+POOL_BACKOFF = float(os.environ.get("POOL_BACKOFF", "0.25"))
+MAX_BACKOFF = 8.0
+# Longest a request waits for a rate-limited pool before answering 429
+POOL_MAX_WAIT = float(os.environ.get("POOL_MAX_WAIT", "10"))
+# Cool-down for a key that returned 429 without saying when to retry
+RATE_LIMIT_COOLDOWN = 5.0
+DEFAULT_TIER = "default"
+
+GEMINI_TIERS = {
+    "fast": os.environ.get("POOL_FAST_MODEL", "gemini-2.5-flash-lite"),
+    "default": DEFAULT_MODEL,
+    "strong": os.environ.get("POOL_STRONG_MODEL", "gemini-2.5-pro"),
+}
+GROQ_TIERS = {
+    "fast": "llama-3.1-8b-instant",
+    "default": "llama-3.3-70b-versatile",
+    "strong": "llama-3.3-70b-versatile",
+}
+
+log = logs.get_logger("pool")
+
+POOL_CALLS = metrics.registry.register(metrics.Counter(
+    "llm_pool_calls_total", "Provider calls by outcome", ("provider", "tier", "outcome")
+))
+POOL_WAIT = metrics.registry.register(metrics.Histogram(
+    "llm_pool_wait_seconds", "Time spent waiting for a rate-limit token", ("provider",)
+))
+
+
+class RateLimited(Exception):
+    """Every provider for a request is rate limited"""
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"All providers are rate limited, retry in {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+
+def error_status(error: Exception) -> int | None:
+    """HTTP status of a provider error (google-genai uses ``code``, groq ``status_code``)"""
+    for name in ("code", "status_code"):
+        status = getattr(error, name, None)
+        if isinstance(status, int):
+            return status
+    return None
+
+
+def retry_after(error: Exception) -> float | None:
+    value = getattr(error, "retry_after", None)
+    response = getattr(error, "response", None)
+    if value is None and response is not None:
+        value = getattr(response, "headers", {}).get("retry-after")
+    try:
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def retryable(status: int | None) -> bool:
+    return status == 429 or (status is not None and status >= 500)
+
+
+class TokenBucket:
+    """Allows ``rate`` calls per second with bursts of up to ``capacity``"""
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self) -> float:
+        """Seconds until a token is available"""
+        self._refill()
+        return max(0.0, (1 - self.tokens) / self.rate)
+
+    async def acquire(self):
+        while True:
+            self._refill()
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+@dataclass
+class Provider:
+    """One key on one backend, with the model it serves for each tier"""
+    name: str
+    gateway: object
+    models: dict
+    bucket: TokenBucket
+    cooldown_until: float = 0.0
+    queued: int = 0
+    in_flight: int = 0
+
+    def ready_in(self) -> float:
+        """Seconds until a new call could start, counting calls already queued here"""
+        return (max(self.cooldown_until - time.monotonic(), 0.0) + self.bucket.delay()
+                + self.queued / self.bucket.rate)
+
+
+@dataclass
+class _Call:
+    tier: str
+    attempt: int = 0
+    last_error: Exception | None = None
+
+
+class ProviderPool:
+    """Spreads model calls over several keys and providers.
+
+    Each provider has its own token bucket; a call goes to the provider
+    that can take it soonest. 429s put that key on cool-down and 5xxs are
+    retried with jittered exponential backoff, on another key where one is
+    free. Same interface as ``LLMGateway`` plus a ``tier``.
+    """
+
+    def __init__(self, providers: list, attempts: int = POOL_ATTEMPTS,
+                 backoff: float = POOL_BACKOFF, max_wait: float = POOL_MAX_WAIT):
+        self.providers = providers
+        self.attempts = attempts
+        self.backoff = backoff
+        self.max_wait = max_wait
+
+    def candidates(self, tier: str) -> list:
+        providers = [provider for provider in self.providers if tier in provider.models]
+        if not providers:
+            raise ValueError(f"No provider serves tier {tier!r}")
+        return providers
+
+    async def _take(self, call: _Call, providers: list) -> Provider:
+        provider = min(providers, key=lambda p: (p.ready_in(), p.in_flight))
+        wait = max(provider.cooldown_until - time.monotonic(), 0.0)
+        if wait > self.max_wait:
+            raise RateLimited(wait) from call.last_error
+        start = time.perf_counter()
+        provider.queued += 1
+        try:
+            await asyncio.sleep(wait)
+            await provider.bucket.acquire()
+        finally:
+            provider.queued -= 1
+        POOL_WAIT.observe(time.perf_counter() - start, provider=provider.name)
+        provider.in_flight += 1
+        return provider
+
+    async def _failed(self, call: _Call, provider: Provider, error: Exception):
+        """Record a failed attempt; re-raise unless it is worth retrying"""
+        status = error_status(error)
+        POOL_CALLS.inc(provider=provider.name, tier=call.tier, outcome=str(status or "error"))
+        if not retryable(status):
+            raise error
+        if status == 429:
+            provider.cooldown_until = time.monotonic() + (retry_after(error) or RATE_LIMIT_COOLDOWN)
+        call.last_error = error
+        call.attempt += 1
+        log.warning("provider call failed", provider=provider.name, tier=call.tier,
+                    status=status, attempt=call.attempt)
+        if call.attempt >= self.attempts:
+            if status == 429:
+                raise RateLimited(retry_after(error) or RATE_LIMIT_COOLDOWN) from error
+            raise error
+        await asyncio.sleep(random.uniform(0, min(MAX_BACKOFF, self.backoff * 2 ** call.attempt)))
+
+    def _succeeded(self, call: _Call, provider: Provider):
+        POOL_CALLS.inc(provider=provider.name, tier=call.tier, outcome="ok")
+
+    async def generate_content(self, contents, model: str | None = None, config=None,
+                               tier: str = DEFAULT_TIER):
+        """Run one generation on the best available provider and return its response"""
+        providers = self.candidates(tier)
+        call = _Call(tier)
+        while True:
+            provider = await self._take(call, providers)
+            try:
+                response = await provider.gateway.generate_content(
+                    contents, model=model or provider.models[tier], config=config
+                )
+            except Exception as e:
+                error = e
+            else:
+                self._succeeded(call, provider)
+                return response
+            finally:
+                # Also on cancellation, which is not an Exception
+                provider.in_flight -= 1
+            await self._failed(call, provider, error)
+
+    async def generate(self, contents, model: str | None = None, config=None,
+                       tier: str = DEFAULT_TIER) -> str:
+        response = await self.generate_content(contents, model=model, config=config, tier=tier)
+        return response.text
+
+    async def stream(self, contents, model: str | None = None, config=None,
+                     tier: str = DEFAULT_TIER):
+        """Yield response text chunks; failures are only retried before the first chunk"""
+        providers = self.candidates(tier)
+        call = _Call(tier)
+        while True:
+            provider = await self._take(call, providers)
+            started = False
+            error = None
+            try:
+                async for chunk in provider.gateway.stream(
+                    contents, model=model or provider.models[tier], config=config
+                ):
+                    started = True
+                    yield chunk
+            except Exception as e:
+                if started:
+                    raise
+                error = e
+            finally:
+                # Also when the consumer cancels or closes the stream mid-way
+                provider.in_flight -= 1
+            if error is None:
+                self._succeeded(call, provider)
+                return
+            await self._failed(call, provider, error)
+
+    def close(self):
+        for provider in self.providers:
+            close = getattr(provider.gateway, "close", None)
+            if close is not None:
+                close()
+
+
+class TextResponse:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class GroqGateway:
+    """Gives the Groq chat client the gateway interface used by the pool"""
+
+    def __init__(self, client):
+        self.client = client
+
+    @staticmethod
+    def _messages(contents, config) -> list:
+        messages = []
+        schema = getattr(config, "response_schema", None)
+        if schema is not None:
+            import schemas
+
+            messages.append({
+                "role": "system",
+                "content": "Answer with JSON only, matching this JSON schema: "
+                + json.dumps(schemas.adapter(schema).json_schema()),
+            })
+        messages.append({"role": "user", "content": contents if isinstance(contents, str) else str(contents)})
+        return messages
+
+    async def generate_content(self, contents, model: str, config=None) -> TextResponse:
+        completion = await asyncio.to_thread(
+            self.client.chat.completions.create,
+            model=model, messages=self._messages(contents, config),
+        )
+        return TextResponse(completion.choices[0].message.content or "")
+
+    async def stream(self, contents, model: str, config=None):
+        chunks = await asyncio.to_thread(
+            lambda: iter(self.client.chat.completions.create(
+                model=model, messages=self._messages(contents, config), stream=True,
+            ))
+        )
+        while True:
+            chunk = await asyncio.to_thread(next, chunks, None)
+            if chunk is None:
+                break
+            delta = chunk.choices[0].delta.content
+            if delta:
+                yield delta
+
+
+def create_pool(gemini_clients: list, groq_client=None) -> ProviderPool:
+    """Pool with one provider per Gemini key, plus Groq when a client is given"""
+    rate = POOL_KEY_RPM / 60
+    providers = []
+    if "gemini" in POOL_PROVIDERS:
+        for index, client in enumerate(gemini_clients):
+            providers.append(Provider(
+                f"gemini-{index}", LLMGateway(client), GEMINI_TIERS,
+                TokenBucket(rate, POOL_BURST),
+            ))
+    if groq_client is not None and "groq" in POOL_PROVIDERS:
+        providers.append(Provider("groq", GroqGateway(groq_client), GROQ_TIERS,
+                                  TokenBucket(rate, POOL_BURST)))
+    return ProviderPool(providers)
+
+
+async def _simulate(pool: ProviderPool, requests: int, tier: str) -> tuple:
+    from tests.fakes import FakeProviderError
+
+    outcomes = {"ok": 0, "rate_limited": 0, "failed": 0}
+
+    async def one():
+        try:
+            await pool.generate("prompt", tier=tier)
+            outcomes["ok"] += 1
+        except RateLimited:
+            outcomes["rate_limited"] += 1
+        except FakeProviderError:
+            outcomes["failed"] += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    return outcomes, time.perf_counter() - start
+
+
+def benchmark(requests: int = 200):
+    """Compare one key against a pool of keys under injected 429s and 503s"""
+    from tests.fakes import fake_pool
+
+    for keys in (1, 2, 4):
+        pool = fake_pool(keys, rpm=1200, rate_limit_rate=0.15, error_rate=0.05)
+        outcomes, elapsed = asyncio.run(_simulate(pool, requests, "fast"))
+        calls = sum(provider.gateway.calls for provider in pool.providers)
+        print(f"keys {keys} | {outcomes} | {calls} provider calls | {elapsed:5.2f}s")
+
+
+if __name__ == "__main__":
+    # The fakes build on the importable pool module, so run its copy of the
+    # benchmark; RateLimited from __main__ would be a different class
+    import pool
+
+    pool.benchmark()
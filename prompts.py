@@ -0,0 +1,146 @@
+import json
+from functools import lru_cache
+
+import functions
+from tokens import count_tokens
+
+LIST_MARKERS = {
+    "bulletListItem": "- ",
+    "numberedListItem": "1. ",
+    "checkListItem": "- [ ] ",
+    "toggleListItem": "- ",
+    "quote": "> ",
+}
+
+
+def inline_text(content) -> str:
+    """Plain text of a block's inline content, dropping styles, links and ids"""
+    if content is None:
+        return ""
+    if isinstance(content, str):
+        return content
+    if isinstance(content, dict):
+        if content.get("type") == "tableContent":
+            return "\n".join(
+                " | ".join(inline_text(cell) for cell in row.get("cells", []))
+                for row in content.get("rows", [])
+            )
+        if "text" in content:
+            return content["text"]
+        return inline_text(content.get("content"))
+    if isinstance(content, list):
+        return "".join(inline_text(part) for part in content)
+    return ""
+
+
+def _block_lines(block: dict, depth: int, lines: list):
+    block_type = block.get("type", "paragraph")
+    text = inline_text(block.get("content")).strip()
+    indent = "  " * depth
+    if block_type == "heading":
+        level = (block.get("props") or {}).get("level", 1)
+        lines.append(f"{'#' * int(level)} {text}")
+    elif text:
+        lines.append(indent + LIST_MARKERS.get(block_type, "") + text)
+    for child in block.get("children") or []:
+        if isinstance(child, dict):
+            _block_lines(child, depth + 1, lines)
+
+
+def parse_blocks(note_content: str) -> list | None:
+    """BlockNote blocks of a note, or None if the note is not BlockNote JSON"""
+    try:
+        blocks = json.loads(note_content)
+    except ValueError:
+        return None
+    if not isinstance(blocks, list) or not all(isinstance(block, dict) for block in blocks):
+        return None
+    return blocks
+
+
+def compact_blocks(blocks: list) -> str:
+    lines = []
+    for block in blocks:
+        _block_lines(block, 0, lines)
+    return "\n".join(lines)
+
+
+def compact_note(note_content: str) -> str:
+    """Reduce a BlockNote note to headings (with level) and text.
+
+    Ids, props, styles and empty blocks are dropped; headings become
+    Markdown ``#`` lines so their level survives. Notes that are not
+    BlockNote JSON are returned unchanged.
+    """
+    blocks = parse_blocks(note_content)
+    if blocks is None:
+        return note_content
+    return compact_blocks(blocks)
+
+
+def token_savings(original: str, compacted: str) -> int:
+    return count_tokens(original) - count_tokens(compacted)
+
+
+@lru_cache(maxsize=None)
+def schema_savings() -> int:
+    """Tokens saved per summary by the compact BlockNote schema description"""
+    return token_savings(functions.blocknote_schema_example, functions.blocknote_schema_description)
+
+
+def sample_note(sections: int = 8) -> str:
+    blocks = []
+    for section in range(sections):
+        blocks.append({
+            "id": f"heading-{section}",
+            "type": "heading",
+            "props": {"textColor": "default", "backgroundColor": "default",
+                      "textAlignment": "left", "level": 2, "isToggleable": False},
+            "content": [{"type": "text", "text": f"Topic {section + 1}", "styles": {}}],
+            "children": [],
+        })
+        for paragraph in range(3):
+            blocks.append({
+                "id": f"p-{section}-{paragraph}",
+                "type": "paragraph",
+                "props": {"textColor": "default", "backgroundColor": "default",
+                          "textAlignment": "left"},
+                "content": [
+                    {"type": "text", "text": "Mitochondria produce ATP through ", "styles": {}},
+                    {"type": "text", "text": "oxidative phosphorylation", "styles": {"bold": True}},
+                    {"type": "text", "text": ".", "styles": {}},
+                ],
+                "children": [],
+            })
+        blocks.append({"id": f"empty-{section}", "type": "paragraph", "props": {},
+                       "content": [], "children": []})
+    return json.dumps(blocks)
+
+
+def report():
+    """Input tokens per endpoint before and after prompt compaction"""
+    note = sample_note()
+    compact = compact_note(note)
+    document = "# Chapter\n\n" + "Cells are the basic unit of life. " * 60
+    cases = [
+        ("documents",
+         functions.create_document_summarize_prompt(document, functions.blocknote_schema_example),
+         functions.create_document_summarize_prompt(document)),
+        ("study-sets",
+         functions.create_study_schedules_on_notes_prompt(note, "Biology", "2025-01-01", "2025-01-31"),
+         functions.create_study_schedules_on_notes_prompt(compact, "Biology", "2025-01-01", "2025-01-31")),
+        ("quizzes",
+         functions.create_quizzes_on_notes_prompt(note, question_count=5),
+         functions.create_quizzes_on_notes_prompt(compact, question_count=5)),
+        ("flashcards",
+         functions.create_flashcards_on_notes_prompt(note, 10),
+         functions.create_flashcards_on_notes_prompt(compact, 10)),
+    ]
+    print(f"{'endpoint':<12} {'before':>7} {'after':>7} {'saved':>7}")
+    for name, before, after in cases:
+        old, new = count_tokens(before), count_tokens(after)
+        print(f"{name:<12} {old:>7} {new:>7} {1 - new / old:>7.0%}")
+
+
+if __name__ == "__main__":
+    report()
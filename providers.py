@@ -0,0 +1,67 @@
+import os
+from functools import lru_cache
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+@lru_cache(maxsize=None)
+def get_gemini_client():
+    """Build the Gemini client on first use"""
+    from google import genai
+
+    gemini_api_key = os.environ.get("GEMINI_API_KEY", "empty")
+    if not gemini_api_key or gemini_api_key == "empty":
+        raise ValueError("GEMINI_API_KEY environment variable is not set or is empty.")
+    return genai.Client(api_key=gemini_api_key)
+
+
+@lru_cache(maxsize=None)
+def get_gemini_clients() -> list:
+    """Clients for GEMINI_API_KEY plus any extra keys listed in GEMINI_API_KEYS"""
+    from google import genai
+
+    clients = [get_gemini_client()]
+    primary = os.environ.get("GEMINI_API_KEY")
+    for key in os.environ.get("GEMINI_API_KEYS", "").split(","):
+        key = key.strip()
+        if key and key != primary:
+            clients.append(genai.Client(api_key=key))
+    return clients
+
+
+@lru_cache(maxsize=None)
+def get_groq_client():
+    """Groq client for the provider pool, or None when GROQ_API_KEY is unset"""
+    groq_api_key = os.environ.get("GROQ_API_KEY", "empty")
+    if not groq_api_key or groq_api_key == "empty":
+        return None
+    from groq import Groq
+
+    return Groq(api_key=groq_api_key)
+
+
+@lru_cache(maxsize=None)
+def get_gateway():
+    """Return the shared provider pool, creating the clients behind it on first use"""
+    from pool import POOL_PROVIDERS, create_pool
+
+    groq_client = get_groq_client() if "groq" in POOL_PROVIDERS else None
+    return create_pool(get_gemini_clients(), groq_client)
+
+
+@lru_cache(maxsize=None)
+def get_item_bank():
+    """Open the quiz and flashcard item bank on first use"""
+    from itembank import ItemBank
+
+    return ItemBank()
+
+
+@lru_cache(maxsize=None)
+def get_markitdown():
+    """Build the MarkItDown converter on first use"""
+    from markitdown import MarkItDown
+
+    return MarkItDown()
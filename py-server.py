@@ -1,32 +1,84 @@
 import json
-from typing import List
-from fastapi import FastAPI, HTTPException, File, UploadFile
-from fastapi.responses import StreamingResponse
+import asyncio
+import copy
+import os
+from typing import Annotated, List, Literal, Union
+from fastapi import FastAPI, HTTPException, File, Request, UploadFile
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-from google import genai
-from google.genai import types
+from starlette.background import BackgroundTask
 from asyncio import sleep
 import uuid
-import shutil
-import os
-from markitdown import MarkItDown
-from dotenv import load_dotenv
 from convert import clean_json_string
 from functions import create_prompt
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 import functions
 from datetime import datetime
 from dataclasses import dataclass
+import admission
+import cache
+import chunking
+import extract
+import ingest
+import itembank
+import jobs
+import logs
+import metrics
+import notediff
+import pool
+import prompts
+import providers
+import scheduler
+import schemas
+from jsonstream import JSONArrayStream
+from singleflight import SingleFlight
 
 app = FastAPI()
-md = MarkItDown()
-
-load_dotenv()
-gemini_api_key = os.environ.get("GEMINI_API_KEY", "empty")
-if not gemini_api_key or gemini_api_key == "empty":
-    raise ValueError("GOOGLE_API_KEY environment variable is not set or is empty.")
-
-client = genai.Client(api_key=gemini_api_key)
+log = logs.get_logger("server")
+response_cache = cache.create_cache()
+job_runner = jobs.JobRunner(jobs.create_store())
+generations = SingleFlight()
+admission_controller = admission.AdmissionController()
+
+metrics.registry.register(metrics.CallbackGauge(
+    "response_cache_hits", "Response cache hits", lambda: response_cache.hits
+))
+metrics.registry.register(metrics.CallbackGauge(
+    "response_cache_misses", "Response cache misses", lambda: response_cache.misses
+))
+EXTRACTIONS = metrics.registry.register(metrics.Counter(
+    "json_extractions_total", "Model responses by how their JSON was recovered", ("endpoint", "outcome")
+))
+ITEM_BANK_ITEMS = metrics.registry.register(metrics.Counter(
+    "item_bank_items_total", "Quiz questions and flashcards served, by where they came from",
+    ("kind", "source")
+))
+NOTE_SECTIONS = metrics.registry.register(metrics.Counter(
+    "note_sections_total", "Note sections processed separately, by whether they were regenerated",
+    ("endpoint", "outcome")
+))
+PROMPT_TOKENS_SAVED = metrics.registry.register(metrics.Counter(
+    "prompt_tokens_saved_total", "Input tokens removed by prompt compaction", ("endpoint",)
+))
+# Extra model calls allowed when nothing usable can be extracted from a response
+EXTRACTION_RETRIES = int(os.environ.get("EXTRACTION_RETRIES", "1"))
+
+metrics.registry.register(metrics.CallbackGauge(
+    "admission_queued", "Requests waiting for an admission slot",
+    lambda: admission_controller.queued
+))
+metrics.registry.register(metrics.CallbackGauge(
+    "admission_running", "Requests holding an admission slot",
+    lambda: admission_controller.running
+))
+metrics.registry.register(metrics.CallbackGauge(
+    "generations_coalesced", "Generations served by another in-flight call",
+    lambda: generations.coalesced
+))
+
+app.middleware("http")(metrics.metrics_middleware)
+# Inside CORS, so a 413 for an oversized upload still reaches the browser
+app.add_middleware(ingest.UploadLimit)
 
 app.add_middleware(
     CORSMiddleware,
@@ -37,49 +89,318 @@ app.add_middleware(
 )
 
 
+@app.exception_handler(pool.RateLimited)
+@app.exception_handler(admission.Overloaded)
+async def overloaded_handler(request, exc):
+    """Provider quota exhaustion or a full queue is the client's cue to back off, not a server error"""
+    return JSONResponse(
+        status_code=429,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(max(1, round(exc.retry_after)))},
+    )
+
+
+@app.exception_handler(jobs.QueueFull)
+async def queue_full_handler(request, exc):
+    """Every job slot is taken; the submission can be retried once workers catch up"""
+    return JSONResponse(
+        status_code=503,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(max(1, round(exc.retry_after)))},
+    )
+
+
+def user_key(http_request: Request, user_id: str | None = None) -> str:
+    """Who a request counts against: its user_id, the X-User-Id header or the client address"""
+    if user_id:
+        return user_id
+    header = http_request.headers.get("x-user-id")
+    if header:
+        return header
+    return http_request.client.host if http_request.client else "anonymous"
+
+
+def admit(http_request: Request, priority: int, user_id: str | None = None):
+    """Wait for an admission slot; raises admission.Overloaded when the queue is too deep"""
+    return admission_controller.admit(user_key(http_request, user_id), priority)
+
+
 @app.get("/")
 def root():
     return {"message": "Welcome to the FastAPI application!"}
 
 
-@app.post("/documents")
-async def generate_note_from_documents(file: UploadFile = File(...)):
-    unique_id = uuid.uuid4()
-    temp_dir = f"./temp/{unique_id}"
+@app.get("/cache/stats")
+def cache_stats():
+    return {
+        **response_cache.stats(),
+        "coalescing": generations.stats(),
+        "item_bank": providers.get_item_bank().stats(),
+    }
+
+
+@app.get("/metrics")
+def get_metrics():
+    return PlainTextResponse(metrics.registry.render(), media_type="text/plain; version=0.0.4")
+
+
+def compact_note(note_content: str) -> tuple[str, int]:
+    """Strip BlockNote JSON down to headings and text before it goes into a prompt.
+
+    Also returns the prompt tokens this saves; callers hand them to
+    ``generate_cached`` or ``stream_cached``, which count them in
+    PROMPT_TOKENS_SAVED only when the prompt is actually sent.
+    """
+    compacted = prompts.compact_note(note_content)
+    if compacted is note_content:
+        return compacted, 0
+    return compacted, prompts.token_savings(note_content, compacted)
+
+
+def summarize_prompt(document: str) -> str:
+    return functions.create_document_summarize_prompt(document)
+
+
+def json_response(payload) -> Response:
+    """Serialize inside a timed stage so it shows up in the per-stage histograms"""
+    with metrics.stage("serialize"):
+        body = json.dumps(payload)
+    return Response(content=body, media_type="application/json")
+
+
+def parse_json_response(text: str):
+    """Extract JSON from a model response, repairing and salvaging where possible"""
+    result = extract.extract(text)
+    outcome = "salvaged" if result.salvaged else "repaired" if result.repaired else "clean"
+    EXTRACTIONS.inc(endpoint=metrics.current_endpoint.get(), outcome=outcome)
+    return result.value
+
+
+def parse_document_summary(text: str) -> str:
+    """BlockNote JSON string of a summary, or the cleaned raw text if no JSON is found"""
     try:
-        # Create temp directory
-        os.makedirs(temp_dir, exist_ok=True)
-
-        # Save uploaded file
-        file_path = f"{temp_dir}/{file.filename}"
-        with open(file_path, "wb") as f:
-            shutil.copyfileobj(file.file, f)
-
-        # Convert file to Markdown (assuming MarkItDown handles the file path)
-        result = md.convert(file_path)
-        content = result.text_content
-
-        # Summarize with Gemini API
-        response = client.models.generate_content(
-            model="gemini-2.5-flash",
-            contents=functions.create_document_summarize_prompt(content),
-            config=functions.config,
-        )
-        summary = response.text  # Adjust based on actual response structure
+        return json.dumps(parse_json_response(text))
+    except json.JSONDecodeError:
+        return clean_json_string(text)
+
+
+def cache_key(endpoint: str, content: str, **params) -> str:
+    """Response cache key of a generation; buffered and streamed generations share it"""
+    return cache.make_key(endpoint, functions.PROMPT_VERSION, content, **params)
+
+
+async def generate_cached(endpoint: str, content: str, prompt: str, parse=parse_json_response,
+                          config=None, schema=None, tier=pool.DEFAULT_TIER, saved_tokens: int = 0,
+                          **params):
+    """Generate and parse a model response, reusing earlier results for the same content.
+
+    With a ``schema`` the model answers in JSON mode and the response is
+    validated against it instead of going through ``parse``; ``tier``
+    picks the model class and ``saved_tokens`` is what compaction took off
+    the prompt, counted only if the prompt is sent. Identical requests that arrive while a
+    generation is in flight wait for it instead of starting their own;
+    each caller gets a private copy.
+    """
+    key = cache_key(endpoint, content, **params)
+    payload = await response_cache.get(key)
+    if payload is not None:
+        return payload
+
+    async def generate():
+        metrics.PROMPT_CHARS.observe(len(prompt), endpoint=endpoint)
+        if saved_tokens:
+            PROMPT_TOKENS_SAVED.inc(saved_tokens, endpoint=endpoint)
+        generation_config = functions.json_config(schema) if schema is not None else config
+        extract.salvage_seen.set(False)
+        for attempt in range(EXTRACTION_RETRIES + 1):
+            with metrics.stage("model"):
+                response = await providers.get_gateway().generate_content(
+                    prompt, config=generation_config, tier=tier
+                )
+            response_text = response.text or ""
+            metrics.RESPONSE_CHARS.observe(len(response_text), endpoint=endpoint)
+            log.sampled("model response", endpoint=endpoint, response=response_text)
+            try:
+                with metrics.stage("parse"):
+                    if schema is not None:
+                        payload = schemas.dump(schemas.parse_response(schema, response))
+                    else:
+                        payload = parse(response_text)
+                break
+            except ValueError as e:
+                EXTRACTIONS.inc(endpoint=metrics.current_endpoint.get(), outcome="failed")
+                log.warning("no JSON in model response", endpoint=endpoint,
+                            attempt=attempt + 1, error=str(e))
+                if attempt == EXTRACTION_RETRIES:
+                    raise
+        if extract.salvage_seen.get():
+            # A salvaged payload lacks whatever the model was cut off before; the next request retries
+            log.info("salvaged response not cached", endpoint=endpoint)
+        else:
+            await response_cache.set(key, payload)
+        return payload
+
+    return copy.deepcopy(await generations.do(key, generate))
+
+
+async def stream_cached(endpoint: str, content: str, prompt: str, to_payload=list,
+                        config=None, schema=None, tier=pool.DEFAULT_TIER, saved_tokens: int = 0,
+                        **params):
+    """Yield the elements of a generated JSON array as soon as each one is complete.
+
+    Shares cache entries with ``generate_cached``; the full array is stored
+    once the stream has closed it. With a ``schema`` each element is
+    validated and elements that do not match are dropped.
+    """
+    key = cache_key(endpoint, content, **params)
+    payload = await response_cache.get(key)
+    if payload is not None:
+        for item in parse_json_response(payload) if isinstance(payload, str) else payload:
+            yield item
+        return
+
+    metrics.PROMPT_CHARS.observe(len(prompt), endpoint=endpoint)
+    if saved_tokens:
+        PROMPT_TOKENS_SAVED.inc(saved_tokens, endpoint=endpoint)
+    if schema is not None:
+        config = functions.json_config(schema)
+        item_schema = schema.__args__[0]
+    parser = JSONArrayStream()
+    items = []
+    response_chars = 0
+    with metrics.stage("model_stream"):
+        async for chunk in providers.get_gateway().stream(prompt, config=config, tier=tier):
+            response_chars += len(chunk)
+            for item in parser.feed(chunk):
+                if schema is not None:
+                    try:
+                        item = item_schema.model_validate(item).model_dump()
+                    except ValueError as e:
+                        log.warning("dropped streamed item", endpoint=endpoint, error=str(e))
+                        continue
+                items.append(item)
+                yield item
+    metrics.RESPONSE_CHARS.observe(response_chars, endpoint=endpoint)
+    if parser.done:
+        await response_cache.set(key, to_payload(items))
+
+
+def sse_event(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def sse_response(items, stamp: dict | None = None, ticket=None) -> StreamingResponse:
+    """Send each streamed item as an SSE ``item`` event, followed by ``done`` or ``error``.
+
+    An admission ``ticket`` is held until the last event has been sent.
+    """
+    if ticket is not None:
+        items = ticket.hold(items)
+
+    async def events():
+        count = 0
+        try:
+            async for item in items:
+                if stamp and isinstance(item, dict):
+                    item = {**item, **stamp}
+                count += 1
+                yield sse_event("item", item)
+        except Exception as e:
+            log.error("stream failed", error=str(e))
+            yield sse_event("error", {"detail": str(e)})
+            return
+        yield sse_event("done", {"count": count})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        # Also runs when the body never started, e.g. the client left first
+        background=BackgroundTask(ticket.release) if ticket is not None else None,
+    )
 
-        print(f"Generated summary: {summary}")
-        print(f"Generated content: {content}")
 
-        # Clean up temp directory
-        shutil.rmtree(temp_dir)
+async def summarize_chunk(chunk: str) -> list:
+    return await generate_cached(
+        "documents",
+        chunk,
+        summarize_prompt(chunk),
+        config=functions.get_config(),
+        tier="strong",
+        saved_tokens=prompts.schema_savings(),
+        chunked=True,
+    )
 
-        return {"summary": clean_json_string(summary)}
 
-    except Exception as e:
-        # Clean up on error
-        if os.path.exists(temp_dir):
-            shutil.rmtree(temp_dir)
-        raise HTTPException(status_code=500, detail=f"Error processing file: {str(e)}")
+async def stream_chunk_summaries(chunks: list[str]):
+    async for blocks in chunking.map_chunks(chunks, summarize_chunk):
+        for block in blocks:
+            yield block
+
+
+async def summarize_content(content: str) -> str:
+    """Summarize converted document text into a BlockNote JSON string"""
+    # Large documents are summarized chunk by chunk and merged
+    chunks = chunking.split_document(content)
+    if len(chunks) > 1:
+        log.info("summarizing in chunks", chunks=len(chunks), chars=len(content))
+        summaries = [blocks async for blocks in chunking.map_chunks(chunks, summarize_chunk)]
+        return json.dumps(chunking.merge_blocks(chunks, summaries))
+
+    # Summarize with Gemini API
+    return await generate_cached(
+        "documents",
+        content,
+        summarize_prompt(content),
+        parse=parse_document_summary,
+        config=functions.get_config(),
+        tier="strong",
+        saved_tokens=prompts.schema_savings(),
+    )
+
+
+@app.post("/documents")
+async def generate_note_from_documents(http_request: Request, file: UploadFile = File(...),
+                                       stream: bool = False):
+    async with admit(http_request, admission.BATCH) as ticket:
+        try:
+            with metrics.stage("read_upload"):
+                data = await ingest.read_upload(file)
+            # Convert the upload to Markdown in memory, off the event loop
+            with metrics.stage("convert"):
+                content = await ingest.convert_data(data, file.filename, file.content_type)
+            log.info("document converted", filename=file.filename, bytes=len(data), chars=len(content))
+
+            if stream:
+                # Large documents stream their chunk summaries in document order
+                chunks = chunking.split_document(content)
+                if len(chunks) > 1:
+                    log.info("streaming chunk summaries", chunks=len(chunks))
+                    return sse_response(stream_chunk_summaries(chunks), ticket=ticket)
+
+                # Emit each BlockNote block as soon as the model has finished it
+                return sse_response(stream_cached(
+                    "documents",
+                    content,
+                    summarize_prompt(content),
+                    to_payload=json.dumps,
+                    config=functions.get_config(),
+                    tier="strong",
+                    saved_tokens=prompts.schema_savings(),
+                ), ticket=ticket)
+
+            summary = await summarize_content(content)
+            log.sampled("document summary", filename=file.filename, summary=summary)
+
+            return json_response({"summary": summary})
+
+        except ingest.UploadTooLarge as e:
+            raise HTTPException(status_code=413, detail=str(e))
+        except pool.RateLimited:
+            raise
+        except Exception as e:
+            log.error("document processing failed", filename=file.filename, error=str(e))
+            raise HTTPException(status_code=500, detail=f"Error processing file: {str(e)}")
 
 
 class CreateQuizzesRequest(BaseModel):
@@ -149,6 +470,66 @@ class Quiz:
     questions: List[QuizQuestion]
 
 
+async def banked_items(kind: str, notes: str, count: int, generate, saved_tokens: int = 0) -> list:
+    """Serve quiz questions or flashcards from the item bank, generating only the shortfall"""
+    items, from_bank = await itembank.top_up(
+        providers.get_item_bank(), kind, notes, count,
+        lambda missing, exclude: generate(notes, missing, exclude, saved_tokens),
+    )
+    ITEM_BANK_ITEMS.inc(from_bank, kind=kind, source="bank")
+    ITEM_BANK_ITEMS.inc(len(items) - from_bank, kind=kind, source="model")
+    return items
+
+
+async def note_items(kind: str, note_content: str, count: int, generate) -> list:
+    """Items for a note; large BlockNote notes are generated section by section.
+
+    Each section has its own item bank entry, so after an edit only the
+    sections whose text changed go back to the model. Sections are grouped
+    by heading id so each group gets about NOTE_MIN_ITEMS items or more.
+    """
+    notes, saved = compact_note(note_content)
+    sections = notediff.note_sections(note_content, count)
+    if sections is None:
+        return await banked_items(kind, notes, count, generate, saved)
+
+    shares = notediff.allocate(count, sections)
+    bank = providers.get_item_bank()
+    banked = await asyncio.to_thread(
+        lambda: [len(bank.items(kind, itembank.note_hash(section.text))) for section in sections]
+    )
+    for share, available in zip(shares, banked):
+        if share:
+            NOTE_SECTIONS.inc(endpoint=kind, outcome="reused" if available >= share else "generated")
+    # Sections are compacted with the note, so each saves its share by length
+    savings = notediff.allocate(saved, sections)
+    results = await asyncio.gather(*(
+        banked_items(kind, section.text, share, generate, section_saved)
+        for section, share, section_saved in zip(sections, shares, savings) if share
+    ))
+    return [item for items in results for item in items]
+
+
+def quiz_generation(notes: str, count: int, exclude: list | None = None) -> dict:
+    """Prompt, schema and cache key parameters of a quiz generation.
+
+    The streamed path uses it too, so a streamed quiz and the item bank's
+    first fill for the same notes share one cache entry.
+    """
+    exclude = exclude or []
+    return {
+        "prompt": functions.create_quizzes_on_notes_prompt(notes, question_count=count, exclude=exclude),
+        "schema": schemas.QUIZ_SCHEMA,
+        "question_count": count,
+        "exclude": exclude,
+    }
+
+
+async def generate_quiz_items(notes: str, count: int, exclude: list, saved_tokens: int = 0) -> list:
+    return await generate_cached("quizzes", notes, saved_tokens=saved_tokens,
+                                 **quiz_generation(notes, count, exclude))
+
+
 def generate_quiz_id() -> str:
     """Generate a unique quiz ID"""
     timestamp = int(datetime.now().timestamp() * 1000)
@@ -156,37 +537,29 @@ def generate_quiz_id() -> str:
     return f"quiz_{timestamp}_{random_suffix}"
 
 
-def create_quiz_from_content(title: str, subject: str, user_id: str, note_id: str,
-                           note_content: str, question_count: int = 5) -> Quiz:
+async def create_quiz_from_content(title: str, subject: str, user_id: str, note_id: str,
+                                 note_content: str, question_count: int = 5) -> Quiz:
     """Create a complete quiz from note content"""
     # Generate unique quiz ID
     quiz_id = generate_quiz_id()
     
     # Use the existing quiz generation logic
-    response = client.models.generate_content(
-        model="gemini-2.5-flash",
-        contents=functions.create_quizzes_on_notes_prompt(
-            note_content, functions.quiz_response_format, question_count
-        ),
-    )
-    
-    quizzes_str = clean_json_string(response.text)
-    quizzes = json.loads(quizzes_str)
+    quizzes = await note_items("quizzes", note_content, question_count, generate_quiz_items)
     
-    # Parse backend response
+    # Parse backend response into typed questions
     questions = []
-    for idx, q_data in enumerate(quizzes):
+    for idx, q_data in enumerate(schemas.adapter(schemas.QUIZ_SCHEMA).validate_python(quizzes)):
         answers = []
-        for ans_idx, answer_data in enumerate(q_data.get("answers", [])):
+        for ans_idx, answer_data in enumerate(q_data.answers):
             answers.append(QuizAnswer(
-                option_text=answer_data["option_text"],
-                is_correct=answer_data["is_correct"],
+                option_text=answer_data.option_text,
+                is_correct=answer_data.is_correct,
                 answer_order=ans_idx + 1
             ))
         
         questions.append(QuizQuestion(
-            question_text=q_data["question_text"],
-            question_type=q_data.get("question_type", "multiple_choice"),
+            question_text=q_data.question_text,
+            question_type=q_data.question_type,
             question_order=idx + 1,
             answers=answers
         ))
@@ -201,28 +574,34 @@ def create_quiz_from_content(title: str, subject: str, user_id: str, note_id: st
     )
 
 
-@app.post("/quizzes")
-async def generate_quizzes_on_notes(request: CreateQuizzesRequest):
-    print(request.note_content, functions.quiz_response_format)
-
-    response = client.models.generate_content(
-        model="gemini-2.5-flash",
-        contents=functions.create_quizzes_on_notes_prompt(
-            request.note_content, functions.quiz_response_format, request.question_count
-        ),
-    )
+async def generate_quizzes(request: CreateQuizzesRequest) -> list:
+    quizzes = await note_items("quizzes", request.note_content, request.question_count,
+                               generate_quiz_items)
+    for quiz in quizzes:
+        quiz["quiz_id"] = request.quiz_id
+    return quizzes
 
-    quizzes_str = clean_json_string(response.text)
-    print(quizzes_str)
 
-    quizzes = json.loads(quizzes_str)
+@app.post("/quizzes")
+async def generate_quizzes_on_notes(request: CreateQuizzesRequest, http_request: Request,
+                                    stream: bool = False):
+    async with admit(http_request, admission.INTERACTIVE) as ticket:
+        log.info("generating quizzes", quiz_id=request.quiz_id,
+                 question_count=request.question_count, note_chars=len(request.note_content))
+
+        if stream:
+            notes, saved = compact_note(request.note_content)
+            return sse_response(
+                stream_cached("quizzes", notes, saved_tokens=saved,
+                              **quiz_generation(notes, request.question_count)),
+                stamp={"quiz_id": request.quiz_id},
+                ticket=ticket,
+            )
 
-    for quiz in quizzes:
-        quiz["quiz_id"] = request.quiz_id
-        print(f"{quiz}\n")
-        print("---------------------------------------------------------------------\n")
+        quizzes = await generate_quizzes(request)
+        log.sampled("quizzes generated", quiz_id=request.quiz_id, quizzes=quizzes)
 
-    return {"quizzes": quizzes}
+        return json_response({"quizzes": quizzes})
 
 
 class CreateStudySchedulesRequest(BaseModel):
@@ -232,115 +611,339 @@ class CreateStudySchedulesRequest(BaseModel):
     endDate: str
 
 
-@app.post("/study-sets")
-async def generate_study_schedules_on_notes(request: CreateStudySchedulesRequest):
-    response = client.models.generate_content(
-        model="gemini-2.5-flash",
-        contents=functions.create_study_schedules_on_notes_prompt(
-            request.note_content,
+def study_schedule_params(request: CreateStudySchedulesRequest) -> dict:
+    """Cache key parameters of a study schedule generation"""
+    return {"note_title": request.note_title, "start_date": request.startDate, "end_date": request.endDate}
+
+
+async def generate_section_schedules(request: CreateStudySchedulesRequest, notes: str,
+                                     saved_tokens: int = 0) -> list:
+    return await generate_cached(
+        "study-sets",
+        notes,
+        functions.create_study_schedules_on_notes_prompt(
+            notes,
             request.note_title,
             request.startDate,
             request.endDate,
         ),
+        schema=schemas.STUDY_SCHEDULE_SCHEMA,
+        saved_tokens=saved_tokens,
+        **study_schedule_params(request),
     )
 
-    schedules_str = clean_json_string(response.text)
-    print(schedules_str)
 
-    schedules = json.loads(schedules_str)
+async def label_priorities(request: CreateStudySchedulesRequest) -> dict | None:
+    """Model priority for every topic of a note from one batched call, or None on failure"""
+    topics = scheduler.extract_topics(request.note_content, request.note_title)
+    outline = "\n".join(f"    - {topic.part}: {' '.join(topic.text.split()[:40])}" for topic in topics)
+    try:
+        labels = await generate_cached(
+            "study-set-priorities",
+            outline,
+            functions.create_priority_labels_prompt(outline),
+            schema=schemas.PRIORITY_LABEL_SCHEMA,
+            tier="fast",
+        )
+    except pool.RateLimited:
+        raise
+    except Exception as e:
+        # The size heuristic is a fine fallback for labels
+        log.warning("priority labeling failed", error=str(e))
+        return None
+    return {label["part"]: label["priority"] for label in labels}
+
+
+async def generate_study_schedules(request: CreateStudySchedulesRequest) -> list:
+    """Build study schedules locally, or with the model when STUDY_SCHEDULER=model"""
+    if scheduler.STUDY_SCHEDULER == "local":
+        priorities = await label_priorities(request) if scheduler.STUDY_PRIORITY_LABELS else None
+        with metrics.stage("schedule"):
+            return scheduler.build_schedule(
+                request.note_content, request.note_title, request.startDate, request.endDate,
+                priorities,
+            )
 
-    return {"study_sets": schedules}
+    notes, saved = compact_note(request.note_content)
+    sections = notediff.note_sections(request.note_content)
+    if sections is None:
+        return await generate_section_schedules(request, notes, saved)
 
+    # Unchanged sections are answered from the response cache
+    for section in sections:
+        key = cache_key("study-sets", section.text, **study_schedule_params(request))
+        NOTE_SECTIONS.inc(endpoint="study-sets",
+                          outcome="reused" if await response_cache.contains(key) else "generated")
+    results = await asyncio.gather(*(
+        generate_section_schedules(request, section.text, section_saved)
+        for section, section_saved in zip(sections, notediff.allocate(saved, sections))
+    ))
+    schedules = [schedule for section_schedules in results for schedule in section_schedules]
+    return sorted(schedules, key=lambda schedule: schedule.get("dueDate") or "")
 
-@app.post("/flashcards")
-async def generate_flashcards_on_notes(request: CreateFlashcardsRequest):
-    try:
-        print(f"Generating flashcards for set: {request.flashcard_set_id}")
-        print(f"Note content: {request.note_content[:200]}...")  # Print first 200 chars
 
-        response = client.models.generate_content(
-            model="gemini-2.5-flash",
-            contents=functions.create_flashcards_on_notes_prompt(request.note_content, request.card_count),
-        )
+@app.post("/study-sets")
+async def generate_study_schedules_on_notes(request: CreateStudySchedulesRequest,
+                                            http_request: Request):
+    async with admit(http_request, admission.INTERACTIVE):
+        try:
+            schedules = await generate_study_schedules(request)
+        except scheduler.InvalidDateRange as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        log.sampled("study sets generated", note_title=request.note_title, study_sets=schedules)
+
+        return json_response({"study_sets": schedules})
 
-        flashcards_str = clean_json_string(response.text)
-        print(f"Generated flashcards response: {flashcards_str}")
 
-        flashcards = json.loads(flashcards_str)
+def flashcard_generation(notes: str, count: int, exclude: list | None = None) -> dict:
+    """Prompt, schema, tier and cache key parameters of a flashcard generation, streamed or not"""
+    exclude = exclude or []
+    return {
+        "prompt": functions.create_flashcards_on_notes_prompt(notes, count, exclude=exclude),
+        "schema": schemas.FLASHCARD_SCHEMA,
+        "tier": "fast",
+        "card_count": count,
+        "exclude": exclude,
+    }
 
-        # Update each flashcard with the provided flashcard_set_id
-        for flashcard in flashcards:
-            flashcard["flashcard_set_id"] = request.flashcard_set_id
-            print(f"Flashcard: {flashcard}")
-            print(
-                "---------------------------------------------------------------------"
+
+async def generate_flashcard_items(notes: str, count: int, exclude: list, saved_tokens: int = 0) -> list:
+    return await generate_cached("flashcards", notes, saved_tokens=saved_tokens,
+                                 **flashcard_generation(notes, count, exclude))
+
+
+async def generate_flashcards(request: CreateFlashcardsRequest) -> list:
+    flashcards = await note_items("flashcards", request.note_content, request.card_count,
+                                  generate_flashcard_items)
+    # Update each flashcard with the provided flashcard_set_id
+    for flashcard in flashcards:
+        flashcard["flashcard_set_id"] = request.flashcard_set_id
+    return flashcards
+
+
+@app.post("/flashcards")
+async def generate_flashcards_on_notes(request: CreateFlashcardsRequest, http_request: Request,
+                                       stream: bool = False):
+    async with admit(http_request, admission.INTERACTIVE) as ticket:
+        try:
+            log.info("generating flashcards", flashcard_set_id=request.flashcard_set_id,
+                     card_count=request.card_count, note_chars=len(request.note_content))
+
+            if stream:
+                notes, saved = compact_note(request.note_content)
+                return sse_response(
+                    stream_cached("flashcards", notes, saved_tokens=saved,
+                                  **flashcard_generation(notes, request.card_count)),
+                    stamp={"flashcard_set_id": request.flashcard_set_id},
+                    ticket=ticket,
+                )
+
+            flashcards = await generate_flashcards(request)
+            log.sampled("flashcards generated", flashcard_set_id=request.flashcard_set_id,
+                        flashcards=flashcards)
+
+            return json_response({"flashcards": flashcards})
+
+        except json.JSONDecodeError as e:
+            log.error("flashcard response was not valid JSON", error=str(e))
+            raise HTTPException(status_code=500, detail="Failed to parse AI response")
+        except pool.RateLimited:
+            raise
+        except Exception as e:
+            log.error("flashcard generation failed", error=str(e))
+            raise HTTPException(
+                status_code=500, detail=f"Error generating flashcards: {str(e)}"
             )
 
-        return {"flashcards": flashcards}
 
-    except json.JSONDecodeError as e:
-        print(f"JSON decode error: {e}")
-        print(f"Raw response: {flashcards_str}")
-        raise HTTPException(status_code=500, detail="Failed to parse AI response")
-    except Exception as e:
-        print(f"Error generating flashcards: {str(e)}")
-        raise HTTPException(
-            status_code=500, detail=f"Error generating flashcards: {str(e)}"
-        )
+def quiz_to_dict(quiz: Quiz) -> dict:
+    return {
+        "success": True,
+        "quiz": {
+            "quiz_id": quiz.quiz_id,
+            "title": quiz.title,
+            "subject": quiz.subject,
+            "user_id": quiz.user_id,
+            "note_id": quiz.note_id,
+            "question_count": len(quiz.questions),
+            "questions": [
+                {
+                    "question_text": q.question_text,
+                    "question_type": q.question_type,
+                    "question_order": q.question_order,
+                    "answers": [
+                        {
+                            "option_text": a.option_text,
+                            "is_correct": a.is_correct,
+                            "answer_order": a.answer_order
+                        } for a in q.answers
+                    ]
+                } for q in quiz.questions
+            ]
+        }
+    }
 
 
 @app.post("/quizzes/create")
-async def create_quiz(request: CreateQuizRequest):
+async def create_quiz(request: CreateQuizRequest, http_request: Request):
     """Create a quiz from note content and return it as JSON for frontend to handle"""
-    try:
-        print(f"Creating quiz: {request.title}")
-        print(f"User ID: {request.user_id}")
-        print(f"Subject: {request.subject}")
-        print(f"Question count: {request.question_count}")
+    async with admit(http_request, admission.INTERACTIVE, request.user_id):
+        try:
+            log.info("creating quiz", title=request.title, user_id=request.user_id,
+                     subject=request.subject, question_count=request.question_count)
         
-        # Create quiz from content
-        quiz = create_quiz_from_content(
-            title=request.title,
-            subject=request.subject,
-            user_id=request.user_id,
-            note_id=request.note_id,
-            note_content=request.note_content,
-            question_count=request.question_count
-        )
+            # Create quiz from content
+            quiz = await create_quiz_from_content(
+                title=request.title,
+                subject=request.subject,
+                user_id=request.user_id,
+                note_id=request.note_id,
+                note_content=request.note_content,
+                question_count=request.question_count
+            )
         
-        # Return quiz data for frontend to handle database operations
-        return {
-            "success": True,
-            "quiz": {
-                "quiz_id": quiz.quiz_id,
-                "title": quiz.title,
-                "subject": quiz.subject,
-                "user_id": quiz.user_id,
-                "note_id": quiz.note_id,
-                "question_count": len(quiz.questions),
-                "questions": [
-                    {
-                        "question_text": q.question_text,
-                        "question_type": q.question_type,
-                        "question_order": q.question_order,
-                        "answers": [
-                            {
-                                "option_text": a.option_text,
-                                "is_correct": a.is_correct,
-                                "answer_order": a.answer_order
-                            } for a in q.answers
-                        ]
-                    } for q in quiz.questions
-                ]
-            }
-        }
+            # Return quiz data for frontend to handle database operations
+            return json_response(quiz_to_dict(quiz))
         
-    except Exception as e:
-        print(f"Error creating quiz: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Error creating quiz: {str(e)}")
+        except pool.RateLimited:
+            raise
+        except Exception as e:
+            log.error("quiz creation failed", user_id=request.user_id, error=str(e))
+            raise HTTPException(status_code=500, detail=f"Error creating quiz: {str(e)}")
+
+
+BATCH_MAX_CONCURRENCY = int(os.environ.get("BATCH_MAX_CONCURRENCY", "8"))
+# Most jobs one batch request may carry
+BATCH_MAX_JOBS = int(os.environ.get("BATCH_MAX_JOBS", "50"))
+batch_semaphore = asyncio.Semaphore(BATCH_MAX_CONCURRENCY)
+
+
+class QuizzesJob(BaseModel):
+    type: Literal["quizzes"]
+    request: CreateQuizzesRequest
+
+
+class FlashcardsJob(BaseModel):
+    type: Literal["flashcards"]
+    request: CreateFlashcardsRequest
+
+
+class StudySchedulesJob(BaseModel):
+    type: Literal["study-sets"]
+    request: CreateStudySchedulesRequest
+
+
+BatchJob = Annotated[Union[QuizzesJob, FlashcardsJob, StudySchedulesJob], Field(discriminator="type")]
+
+
+class BatchRequest(BaseModel):
+    jobs: List[BatchJob] = Field(max_length=BATCH_MAX_JOBS)
+
+
+async def run_batch_job(index: int, job) -> dict:
+    """Run one batch job, reporting failure in the result instead of raising"""
+    async with batch_semaphore:
+        try:
+            if job.type == "quizzes":
+                result = {"quizzes": await generate_quizzes(job.request)}
+            elif job.type == "flashcards":
+                result = {"flashcards": await generate_flashcards(job.request)}
+            else:
+                result = {"study_sets": await generate_study_schedules(job.request)}
+            return {"index": index, "type": job.type, "success": True, "result": result}
+        except Exception as e:
+            log.error("batch job failed", index=index, type=job.type, error=str(e))
+            return {"index": index, "type": job.type, "success": False, "error": str(e)}
+
+
+@app.post("/batch")
+async def run_batch(request: BatchRequest, http_request: Request, stream: bool = False):
+    """Run many quiz, flashcard and study-set jobs concurrently.
+
+    With ``stream=true`` each result is sent as an NDJSON line as soon as it
+    finishes; otherwise all results are returned in job order. A batch takes
+    one low-priority admission slot for its whole run.
+    """
+    async with admit(http_request, admission.BATCH) as ticket:
+        if stream:
+            async def lines():
+                tasks = [asyncio.create_task(run_batch_job(index, job))
+                         for index, job in enumerate(request.jobs)]
+                try:
+                    for next_result in asyncio.as_completed(tasks):
+                        yield json.dumps(await next_result) + "\n"
+                finally:
+                    # A client that disconnected will never read the jobs still running
+                    for task in tasks:
+                        task.cancel()
+
+            return StreamingResponse(ticket.hold(lines()), media_type="application/x-ndjson",
+                                     background=BackgroundTask(ticket.release))
+
+        tasks = [run_batch_job(index, job) for index, job in enumerate(request.jobs)]
+        return json_response({"results": await asyncio.gather(*tasks)})
+
+
+@app.post("/jobs/documents")
+async def submit_document_job(http_request: Request, file: UploadFile = File(...),
+                              webhook_url: str | None = None):
+    """Queue a document summary and return its job ID straight away"""
+    try:
+        await jobs.validate_webhook(webhook_url)
+    except jobs.InvalidWebhook as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    # Turn the job away before its upload is read into memory
+    job_runner.check_capacity()
+    try:
+        data = await ingest.read_upload(file)
+    except ingest.UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    filename, content_type = file.filename, file.content_type
+    user = user_key(http_request)
+
+    async def run():
+        metrics.current_endpoint.set("job:documents")
+        # Accepted jobs wait for a batch slot instead of being rejected
+        async with admission_controller.admit(user, admission.BATCH, reject=False):
+            with metrics.stage("convert"):
+                content = await ingest.convert_data(data, filename, content_type)
+            return {"summary": await summarize_content(content)}
+
+    job = await job_runner.submit("documents", run, webhook_url)
+    return {"job_id": job.job_id, "status": job.status}
+
+
+@app.post("/jobs/quizzes/create")
+async def submit_quiz_job(request: CreateQuizRequest, webhook_url: str | None = None):
+    """Queue quiz creation and return its job ID straight away"""
+    try:
+        await jobs.validate_webhook(webhook_url)
+    except jobs.InvalidWebhook as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    async def run():
+        metrics.current_endpoint.set("job:quizzes/create")
+        async with admission_controller.admit(request.user_id, admission.BATCH, reject=False):
+            quiz = await create_quiz_from_content(
+                title=request.title,
+                subject=request.subject,
+                user_id=request.user_id,
+                note_id=request.note_id,
+                note_content=request.note_content,
+                question_count=request.question_count
+            )
+        return quiz_to_dict(quiz)
 
+    job = await job_runner.submit("quizzes/create", run, webhook_url)
+    return {"job_id": job.job_id, "status": job.status}
 
 
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    job = await job_runner.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found or expired")
+    return job.to_dict()
 
 
 if __name__ == "__main__":
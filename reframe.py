@@ -0,0 +1,145 @@
+import os
+import statistics
+import time
+import tracemalloc
+
+import numpy as np
+
+# Duration of every audio frame handed to fastrtc
+FRAME_MS = int(os.environ.get("VOICE_FRAME_MS", "20"))
+# Frames the ring holds before the oldest unread bytes are overwritten
+RING_FRAMES = int(os.environ.get("VOICE_RING_FRAMES", "50"))
+
+
+class Reframer:
+    """Cuts a stream of int16 PCM byte chunks into fixed-duration frames.
+
+    Bytes are copied once into a preallocated ring whose size is a whole
+    number of frames, so a frame never wraps around its end, and copied
+    out again as an int16 ndarray when it is yielded: a caller that queues
+    frames, as fastrtc does, can fall any number of frames behind without
+    the ring overwriting them. A sample split across two chunks is joined
+    in place.
+    """
+
+    def __init__(self, sample_rate: int = 24000, frame_ms: int = FRAME_MS,
+                 ring_frames: int = RING_FRAMES):
+        self.sample_rate = sample_rate
+        self.frame_bytes = 2 * sample_rate * frame_ms // 1000
+        self.capacity = self.frame_bytes * ring_frames
+        self._ring = np.zeros(self.capacity, dtype=np.uint8)
+        # Total bytes written and read; positions in the ring are taken modulo capacity
+        self._written = 0
+        self._read = 0
+
+    @property
+    def pending(self) -> int:
+        return self._written - self._read
+
+    def _write(self, data: np.ndarray):
+        start = self._written % self.capacity
+        first = min(len(data), self.capacity - start)
+        self._ring[start:start + first] = data[:first]
+        self._ring[:len(data) - first] = data[first:]
+        self._written += len(data)
+
+    def _frame(self) -> np.ndarray:
+        start = self._read % self.capacity
+        self._read += self.frame_bytes
+        return self._ring[start:start + self.frame_bytes].view(np.int16).copy()
+
+    def feed(self, chunk: bytes):
+        """Yield every frame completed by ``chunk``"""
+        data = np.frombuffer(chunk, dtype=np.uint8)
+        offset = 0
+        while offset < len(data):
+            room = self.capacity - self.pending
+            take = min(room, len(data) - offset)
+            self._write(data[offset:offset + take])
+            offset += take
+            while self.pending >= self.frame_bytes:
+                yield self._frame()
+
+    def flush(self):
+        """Yield the last partial frame padded with silence, if there is one"""
+        if self.pending:
+            start = self._written % self.capacity
+            padding = self.frame_bytes - self.pending
+            self._ring[start:start + padding] = 0
+            self._written += padding
+            yield self._frame()
+        self._read = self._written = 0
+
+
+def frames(chunks, sample_rate: int = 24000, frame_ms: int = FRAME_MS):
+    """Fixed-duration frames of a whole stream of PCM byte chunks"""
+    reframer = Reframer(sample_rate, frame_ms)
+    for chunk in chunks:
+        yield from reframer.feed(chunk)
+    yield from reframer.flush()
+
+
+def tts_chunks(seconds: float = 30.0, sample_rate: int = 24000, seed: int = 0) -> list[bytes]:
+    """Byte chunks sized like an HTTP stream delivers them, odd lengths included"""
+    rng = np.random.default_rng(seed)
+    audio = (rng.normal(0, 3000, int(seconds * sample_rate))).astype(np.int16).tobytes()
+    chunks, offset = [], 0
+    while offset < len(audio):
+        size = int(rng.integers(1, 16384))
+        chunks.append(audio[offset:offset + size])
+        offset += size
+    return chunks
+
+
+def _concatenating(chunks, frame_bytes: int, copies: dict):
+    """Straightforward reframing: grow a bytes buffer and slice frames off it"""
+    pending = b""
+    for chunk in chunks:
+        pending += chunk
+        copies["buffers"] += 1
+        copies["bytes"] += len(pending)
+        while len(pending) >= frame_bytes:
+            frame, pending = pending[:frame_bytes], pending[frame_bytes:]
+            copies["buffers"] += 2
+            copies["bytes"] += len(frame) + len(pending)
+            yield np.frombuffer(frame, dtype=np.int16)
+
+
+def _measure(name: str, frames_, copies: dict, audio_bytes: int, sample_rate: int = 24000):
+    durations, gaps = [], []
+    tracemalloc.start()
+    start = last = time.perf_counter()
+    for frame in frames_:
+        now = time.perf_counter()
+        gaps.append(now - last)
+        durations.append(len(frame) / sample_rate * 1000)
+        last = now
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{name:<16} | {len(durations):>5} frames of {min(durations):6.2f}-{max(durations):6.2f} ms "
+          f"| {copies['buffers']:>5} buffers, {copies['bytes'] / audio_bytes:5.2f} bytes copied per byte "
+          f"| peak {peak / 1024:6.1f} KiB | {elapsed / len(durations) * 1e6:5.1f} us per frame, "
+          f"sd {statistics.pstdev(gaps) * 1e6:5.1f} us")
+
+
+def benchmark():
+    """Frame sizes, buffer copies and per-frame time for 30s of TTS audio in random-size chunks"""
+    chunks = tts_chunks()
+    audio = b"".join(chunks)
+    frame_bytes = 2 * 24000 * FRAME_MS // 1000
+    odd = sum(len(chunk) % 2 for chunk in chunks)
+    print(f"{len(chunks)} chunks, {odd} of odd length (np.frombuffer raises on those)")
+    # The old loop, with odd chunks trimmed so it runs at all: one frame per network chunk
+    _measure("frombuffer/chunk", (np.frombuffer(chunk, dtype=np.int16, count=len(chunk) // 2)
+                                  for chunk in chunks if len(chunk) > 1),
+             {"buffers": 0, "bytes": 0}, len(audio))
+    copies = {"buffers": 0, "bytes": 0}
+    _measure("concatenating", _concatenating(chunks, frame_bytes, copies), copies, len(audio))
+    # One preallocated ring; every byte is copied into it once and out of it once
+    count = -(-len(audio) // frame_bytes)
+    _measure("ring reframer", frames(chunks), {"buffers": 1 + count, "bytes": 2 * len(audio)}, len(audio))
+
+
+if __name__ == "__main__":
+    benchmark()
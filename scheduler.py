@@ -0,0 +1,133 @@
+import os
+import re
+import time
+from dataclasses import dataclass
+from datetime import date, timedelta
+
+import prompts
+
+# "local" builds schedules with this module; "model" asks the LLM as before
+STUDY_SCHEDULER = os.environ.get("STUDY_SCHEDULER", "local")
+# Ask the model to relabel priorities in one batched call (local scheduler only)
+STUDY_PRIORITY_LABELS = os.environ.get("STUDY_PRIORITY_LABELS", "0") == "1"
+
+MIN_MINUTES = 15
+MAX_MINUTES = 120
+# Study pace: words covered per minute, including re-reading and note taking
+STUDY_WORDS_PER_MINUTE = 60
+WORDS_PER_SESSION = 150
+MAX_SESSIONS = 5
+PRIORITIES = ("high", "medium", "low")
+
+_heading = re.compile(r"^(#{1,6})\s+(.*)$")
+
+
+class InvalidDateRange(ValueError):
+    """Start or end date is unreadable, or the range runs backwards"""
+
+
+@dataclass
+class Topic:
+    """A heading of the note and the text under it"""
+    part: str
+    text: str
+
+    @property
+    def words(self) -> int:
+        return len(self.text.split())
+
+
+def extract_topics(note_content: str, note_title: str) -> list[Topic]:
+    """Topics of a note, one per heading; a note without headings is one topic"""
+    topics = []
+    part, lines = None, []
+    for line in prompts.compact_note(note_content).splitlines():
+        match = _heading.match(line)
+        if match:
+            if part is not None or any(text.strip() for text in lines):
+                topics.append(Topic(part or note_title, "\n".join(lines)))
+            part, lines = match.group(2).strip(), []
+        else:
+            lines.append(line)
+    if part is not None or any(text.strip() for text in lines):
+        topics.append(Topic(part or note_title, "\n".join(lines)))
+    return topics
+
+
+def estimate_time(words: int) -> int:
+    """Minutes for one pass over ``words`` words, rounded to 5 and kept in 15-120"""
+    minutes = MIN_MINUTES + words / STUDY_WORDS_PER_MINUTE
+    return int(min(MAX_MINUTES, max(MIN_MINUTES, 5 * round(minutes / 5))))
+
+
+def session_count(words: int) -> int:
+    return min(MAX_SESSIONS, 1 + words // WORDS_PER_SESSION)
+
+
+def size_priorities(topics: list[Topic]) -> list[str]:
+    """Largest third of topics is high priority, the smallest third low"""
+    ranked = sorted(range(len(topics)), key=lambda i: (-topics[i].words, i))
+    priorities = [""] * len(topics)
+    for rank, index in enumerate(ranked):
+        priorities[index] = PRIORITIES[min(2, rank * 3 // len(topics))]
+    return priorities
+
+
+def parse_date(value: str) -> date:
+    """Date part of an ISO date or datetime string"""
+    try:
+        return date.fromisoformat(value.strip()[:10])
+    except ValueError:
+        raise InvalidDateRange(f"Not an ISO date: {value!r}")
+
+
+def build_schedule(note_content: str, note_title: str, start_date: str, end_date: str,
+                   priorities: dict | None = None) -> list[dict]:
+    """Study sessions for every topic of a note, in the /study-sets response shape.
+
+    Due dates follow the cumulative study time, so each topic gets a share
+    of the range proportional to its workload and the last one is due on
+    ``end_date``. ``priorities`` maps topic names to model-assigned labels
+    and overrides the size heuristic. Raises InvalidDateRange for bad dates.
+    """
+    start, end = parse_date(start_date), parse_date(end_date)
+    if end < start:
+        raise InvalidDateRange(f"endDate {end_date} is before startDate {start_date}")
+    topics = extract_topics(note_content, note_title)
+    if not topics:
+        return []
+
+    heuristic = size_priorities(topics)
+    workloads = [estimate_time(topic.words) * session_count(topic.words) for topic in topics]
+    total = sum(workloads)
+    span = (end - start).days
+    schedules = []
+    done = 0
+    for topic, workload, priority in zip(topics, workloads, heuristic):
+        done += workload
+        due = start + timedelta(days=round(span * done / total))
+        label = (priorities or {}).get(topic.part)
+        schedules.append({
+            "title": note_title,
+            "part": topic.part,
+            "dueDate": due.isoformat(),
+            "priority": label if label in PRIORITIES else priority,
+            "count": session_count(topic.words),
+            "estimatedTime": estimate_time(topic.words),
+        })
+    return schedules
+
+
+def benchmark(rounds: int = 1000, model_seconds: float = 4.0):
+    """Local scheduling time against a typical /study-sets model round trip"""
+    note = prompts.sample_note(24)
+    start = time.perf_counter()
+    for _ in range(rounds):
+        build_schedule(note, "Biology", "2025-01-01", "2025-03-01")
+    elapsed = (time.perf_counter() - start) / rounds
+    print(f"local scheduler: {elapsed * 1e6:8.1f} us per 24-topic note")
+    print(f"model call:      {model_seconds * 1e6:8.0f} us (typical latency)")
+
+
+if __name__ == "__main__":
+    benchmark()
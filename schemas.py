@@ -0,0 +1,108 @@
+import json
+from functools import lru_cache
+from typing import List, Literal
+
+from pydantic import BaseModel, TypeAdapter
+
+import functions
+from tokens import count_tokens
+
+
+class QuizAnswerSchema(BaseModel):
+    """Mirrors QuizAnswer; answer_order is assigned locally"""
+    option_text: str
+    is_correct: bool
+
+
+class QuizQuestionSchema(BaseModel):
+    """Mirrors QuizQuestion; question_order is assigned locally"""
+    question_text: str
+    question_type: str = "multiple_choice"
+    answers: List[QuizAnswerSchema]
+
+
+class FlashcardSchema(BaseModel):
+    """Mirrors FlashcardResponse; flashcard_set_id is stamped per request"""
+    question: str
+    answer: str
+
+
+class StudyScheduleSchema(BaseModel):
+    title: str
+    part: str
+    dueDate: str
+    priority: str
+    count: int
+    estimatedTime: int
+
+
+class PriorityLabelSchema(BaseModel):
+    """Model-assigned priority for one study schedule topic"""
+    part: str
+    priority: Literal["high", "medium", "low"]
+
+
+QUIZ_SCHEMA = List[QuizQuestionSchema]
+FLASHCARD_SCHEMA = List[FlashcardSchema]
+STUDY_SCHEDULE_SCHEMA = List[StudyScheduleSchema]
+PRIORITY_LABEL_SCHEMA = List[PriorityLabelSchema]
+
+
+@lru_cache(maxsize=None)
+def adapter(schema) -> TypeAdapter:
+    return TypeAdapter(schema)
+
+
+def parse_response(schema, response) -> list:
+    """Validate a structured response into typed objects.
+
+    Uses the SDK's ``parsed`` objects when present and validates the raw
+    text otherwise. Raises ``ValueError`` if the output does not match.
+    """
+    parsed = getattr(response, "parsed", None)
+    if parsed is not None:
+        return adapter(schema).validate_python(parsed, from_attributes=True)
+
+    import extract
+
+    return adapter(schema).validate_python(extract.extract_json(response.text))
+
+
+def dump(items: list) -> list:
+    return [item.model_dump() for item in items]
+
+
+def token_report():
+    """Compare input tokens of the example-JSON prompts with schema mode"""
+    note = "Photosynthesis converts light energy into chemical energy. " * 40
+    cases = [
+        (
+            "quizzes",
+            functions.create_quizzes_on_notes_prompt(note, functions.quiz_response_format, 5),
+            functions.create_quizzes_on_notes_prompt(note, question_count=5),
+            QUIZ_SCHEMA,
+        ),
+        (
+            "flashcards",
+            functions.create_flashcards_on_notes_prompt(note, 10, functions.flashcard_response_format),
+            functions.create_flashcards_on_notes_prompt(note, 10),
+            FLASHCARD_SCHEMA,
+        ),
+        (
+            "study-sets",
+            functions.create_study_schedules_on_notes_prompt(
+                note, "Biology", "2025-01-01", "2025-01-31", functions.study_schedule_response_format
+            ),
+            functions.create_study_schedules_on_notes_prompt(note, "Biology", "2025-01-01", "2025-01-31"),
+            STUDY_SCHEDULE_SCHEMA,
+        ),
+    ]
+    print(f"{'endpoint':<12} {'example':>8} {'schema':>8} {'+schema json':>13} {'saved':>7}")
+    for name, before, after, schema in cases:
+        schema_tokens = count_tokens(json.dumps(adapter(schema).json_schema()))
+        old, new = count_tokens(before), count_tokens(after)
+        print(f"{name:<12} {old:>8} {new:>8} {new + schema_tokens:>13} {old - new:>7}")
+
+
+if __name__ == "__main__":
+    token_report()
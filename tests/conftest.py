@@ -0,0 +1,15 @@
+import importlib.util
+import pathlib
+
+import pytest
+
+ROOT = pathlib.Path(__file__).resolve().parent.parent
+
+
+@pytest.fixture(scope="session")
+def server():
+    """The py-server module; its hyphenated name cannot be imported directly"""
+    spec = importlib.util.spec_from_file_location("py_server", ROOT / "py-server.py")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
@@ -0,0 +1,214 @@
+"""Local stand-ins for the model, speech and transcription services.
+
+Shared by the tests and by the modules' ``benchmark`` functions, so both
+exercise the same fakes.
+"""
+import asyncio
+import random
+import re
+import threading
+import time
+
+import numpy as np
+
+import audioprep
+import pool
+
+
+# Gemini client
+
+class StubResponse:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class StubModels:
+    """Stand-in for ``client.models`` that sleeps instead of calling Gemini"""
+
+    def __init__(self, latency: float, text: str, chunk_size: int = 64):
+        self.latency = latency
+        self.text = text
+        self.chunk_size = chunk_size
+
+    def _chunks(self) -> list:
+        return [
+            self.text[i:i + self.chunk_size]
+            for i in range(0, len(self.text), self.chunk_size)
+        ]
+
+    def generate_content(self, model: str, contents, config=None) -> StubResponse:
+        time.sleep(self.latency)
+        return StubResponse(self.text)
+
+    def generate_content_stream(self, model: str, contents, config=None):
+        chunks = self._chunks()
+        for chunk in chunks:
+            time.sleep(self.latency / max(len(chunks), 1))
+            yield StubResponse(chunk)
+
+
+class StubAsyncModels(StubModels):
+    async def generate_content(self, model: str, contents, config=None) -> StubResponse:
+        await asyncio.sleep(self.latency)
+        return StubResponse(self.text)
+
+    async def generate_content_stream(self, model: str, contents, config=None):
+        chunks = self._chunks()
+
+        async def iterate():
+            for chunk in chunks:
+                await asyncio.sleep(self.latency / max(len(chunks), 1))
+                yield StubResponse(chunk)
+
+        return iterate()
+
+
+class StubAio:
+    def __init__(self, latency: float, text: str):
+        self.models = StubAsyncModels(latency, text)
+
+
+class StubClient:
+    """Local model with a fixed latency, used for load tests and benchmarks"""
+
+    def __init__(self, latency: float = 0.2, text: str = "[]", use_aio: bool = True):
+        self.models = StubModels(latency, text)
+        if use_aio:
+            self.aio = StubAio(latency, text)
+
+
+# Provider pool
+
+class FakeProviderError(Exception):
+    def __init__(self, code: int, retry_after: float | None = None):
+        super().__init__(f"fake provider error {code}")
+        self.code = code
+        self.retry_after = retry_after
+
+
+class FakeGateway:
+    """Local provider that injects latency, rate limits and server errors"""
+
+    def __init__(self, latency: float = 0.05, rate_limit_rate: float = 0.0,
+                 error_rate: float = 0.0, text: str = "[]", seed: int | None = None):
+        self.latency = latency
+        self.rate_limit_rate = rate_limit_rate
+        self.error_rate = error_rate
+        self.text = text
+        self.calls = 0
+        self._rng = random.Random(seed)
+
+    async def _maybe_fail(self):
+        self.calls += 1
+        await asyncio.sleep(self.latency * self._rng.uniform(0.5, 1.5))
+        roll = self._rng.random()
+        if roll < self.rate_limit_rate:
+            raise FakeProviderError(429, retry_after=0.5)
+        if roll < self.rate_limit_rate + self.error_rate:
+            raise FakeProviderError(503)
+
+    async def generate_content(self, contents, model: str, config=None) -> pool.TextResponse:
+        await self._maybe_fail()
+        return pool.TextResponse(self.text)
+
+    async def stream(self, contents, model: str, config=None):
+        await self._maybe_fail()
+        yield self.text
+
+
+def fake_pool(keys: int, rpm: float, rate_limit_rate: float, error_rate: float,
+              seed: int = 0) -> pool.ProviderPool:
+    providers = [
+        pool.Provider(f"fake-{index}",
+                 FakeGateway(rate_limit_rate=rate_limit_rate, error_rate=error_rate, seed=seed + index),
+                 {"fast": "fake-fast", "default": "fake", "strong": "fake-strong"},
+                 pool.TokenBucket(rpm / 60, pool.POOL_BURST))
+        for index in range(keys)
+    ]
+    return pool.ProviderPool(providers, backoff=0.05, max_wait=2.0)
+
+
+# Voice reply: LLM token stream and TTS
+
+REPLY = (
+    "Great question! Mitochondria are the powerhouse of the cell. They turn glucose into ATP "
+    "through cellular respiration. Most of that ATP comes from oxidative phosphorylation, "
+    "which happens on the inner membrane. Can you tell me which molecule carries the electrons?"
+)
+
+
+def stub_deltas(text: str = REPLY, token_delay: float = 0.01):
+    """Token stream of a local stand-in LLM"""
+    for token in re.findall(r"\S+\s*", text):
+        time.sleep(token_delay)
+        yield token
+
+
+def stub_synthesize(latency: float = 0.15, seconds_per_char: float = 0.002,
+                    sample_rate: int = 24000):
+    """Local stand-in TTS: silence of a plausible length after a fixed latency"""
+    def synthesize(sentence: str, previous: str | None):
+        time.sleep(latency + seconds_per_char * len(sentence))
+        samples = int(len(sentence) * 0.06 * sample_rate)
+        for offset in range(0, samples, 4800):
+            yield bytes(2 * min(4800, samples - offset))
+    return synthesize
+
+
+# Speech to text
+
+class _StubSegment:
+    def __init__(self, start: float, end: float, text: str):
+        self.start, self.end, self.text = start, end, text
+
+
+class StubWhisper:
+    """Local stand-in for a faster-whisper model: one segment per two seconds,
+    computed in ``rtf`` times the audio duration plus a fixed overhead"""
+
+    def __init__(self, rtf: float = 0.25, overhead: float = 0.05):
+        self.rtf = rtf
+        self.overhead = overhead
+        self._lock = threading.Lock()
+
+    def transcribe(self, samples: np.ndarray, **options):
+        duration = len(samples) / audioprep.TARGET_RATE
+        # One CPU model instance runs one pass at a time
+        with self._lock:
+            time.sleep(self.overhead + self.rtf * duration)
+        bounds = list(np.arange(0, duration, 2.0)) + [duration]
+        segments = [_StubSegment(start, end, f" words {start:.0f}-{end:.0f}s.")
+                    for start, end in zip(bounds, bounds[1:]) if end - start > 0.1]
+        return iter(segments), None
+
+
+class StubGroq:
+    """Local stand-in for the Groq client: round trip, upload at ``uplink`` bytes/s, server time"""
+
+    def __init__(self, round_trip: float = 0.25, uplink: float = 250_000, server: float = 0.15):
+        self.round_trip = round_trip
+        self.uplink = uplink
+        self.server = server
+        self.audio = self
+        self.translations = self
+
+    def create(self, file, model):
+        time.sleep(self.round_trip + len(file[1]) / self.uplink + self.server)
+        return type("Transcription", (), {"text": "..."})()
+
+
+# Synthetic microphone PCM
+
+def tone(seconds: float, db: float, sample_rate: int = 16000, hz: float = 220.0) -> np.ndarray:
+    """Synthetic int16 voice: a tone at ``db`` dBFS with a little noise"""
+    t = np.arange(int(seconds * sample_rate)) / sample_rate
+    amplitude = 10 ** (db / 20) * np.sqrt(2)
+    rng = np.random.default_rng(0)
+    wave = amplitude * np.sin(2 * np.pi * hz * t) + rng.normal(0, 10 ** (-60 / 20), t.size)
+    return (np.clip(wave, -1, 1) * 32767).astype(np.int16)
+
+
+def frames(audio: np.ndarray, sample_rate: int = 16000, ms: int = 20):
+    step = sample_rate * ms // 1000
+    for offset in range(0, len(audio), step):
+        yield audio[offset:offset + step]
@@ -0,0 +1,35 @@
+import numpy as np
+import pytest
+
+import audioprep
+
+RATE = 16000
+
+
+def test_trims_silence_around_speech():
+    samples = audioprep.downmix(audioprep.speech_like(3.0, rate=RATE, channels=1))
+    trimmed = audioprep.trim_silence(samples, RATE)
+    assert 0 < len(trimmed) < len(samples)
+
+
+@pytest.mark.parametrize("samples", [
+    0.3 * np.sin(2 * np.pi * 440 * np.arange(RATE) / RATE),
+    np.random.default_rng(0).normal(0, 0.1, RATE),
+], ids=["constant tone", "white noise"])
+def test_steady_audio_is_kept_whole(samples):
+    samples = samples.astype(np.float32)
+    assert len(audioprep.trim_silence(samples, RATE)) == len(samples)
+    assert len(audioprep.prepare(samples, RATE)) == len(samples)
+
+
+def test_all_zero_audio_is_empty():
+    assert not audioprep.trim_silence(np.zeros(RATE, dtype=np.float32), RATE).size
+    assert not audioprep.prepare(np.zeros(RATE, dtype=np.int16), RATE).size
+
+
+@pytest.mark.parametrize("channels", [1, 2])
+def test_prepare_gives_mono_int16_at_the_target_rate(channels):
+    audio = audioprep.speech_like(2.0, rate=48000, channels=channels, lead=0.0)
+    samples = audioprep.prepare(audio, 48000, trim=False)
+    assert samples.dtype == np.int16 and samples.ndim == 1
+    assert abs(len(samples) - 2 * audioprep.TARGET_RATE) <= 1
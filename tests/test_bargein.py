@@ -0,0 +1,140 @@
+import queue
+import threading
+import time
+
+import numpy as np
+import pytest
+
+import bargein
+import reframe
+import voice_pipeline
+from tests.fakes import REPLY, frames, stub_deltas, stub_synthesize, tone
+
+
+def test_vad_ignores_silence():
+    vad = bargein.EnergyVAD()
+    assert not any(vad.feed(16000, frame) for frame in frames(tone(1.0, -70)))
+
+
+def test_vad_ignores_a_short_click():
+    vad = bargein.EnergyVAD()
+    audio = np.concatenate([tone(0.1, -20), tone(0.2, -70)])
+    assert not any(vad.feed(16000, frame) for frame in frames(audio))
+
+
+@pytest.mark.parametrize("as_float", [False, True])
+def test_vad_hears_sustained_speech(as_float):
+    vad = bargein.EnergyVAD()
+    audio = tone(0.3, -20)
+    if as_float:
+        audio = audio.astype(np.float32) / 32768
+    assert any(vad.feed(16000, frame) for frame in frames(audio))
+
+
+def test_admit_drops_only_the_cancelled_turn():
+    barge_in = bargein.BargeIn()
+    old = barge_in.start_turn()
+    old.set()
+    assert barge_in.admit(old, "frame") is None
+    assert barge_in.admit(None, "frame") == "frame"
+    new = barge_in.start_turn()
+    # Frames from the new reply pass, even if emit began before it started
+    assert barge_in.admit(old, "frame") == "frame"
+    assert barge_in.admit(new, "frame") == "frame"
+
+
+def produce(barge_in: bargein.BargeIn, pipeline, output: queue.Queue):
+    """Push reply frames as fast as they come, like fastrtc's emit loop does"""
+    turn = barge_in.turn
+    for frame in reframe.frames(pipeline, 24000):
+        frame = barge_in.admit(turn, frame)
+        if frame is not None:
+            output.put((turn, frame))
+
+
+def consume(output: queue.Queue, played: list, done: threading.Event):
+    """Play queued frames in real time; records (turn, seconds, time played)"""
+    while not (done.is_set() and output.empty()):
+        try:
+            turn, frame = output.get(timeout=0.01)
+        except queue.Empty:
+            continue
+        played.append((turn, len(frame) / 24000, time.perf_counter()))
+        time.sleep(len(frame) / 24000)
+
+
+def drain(output: queue.Queue):
+    while True:
+        try:
+            output.get_nowait()
+        except queue.Empty:
+            return
+
+
+def cancel_turn(flush: bool) -> dict:
+    """One reply interrupted by synthetic speech, played through an unbounded output queue"""
+    output = queue.Queue()
+    barge_in = bargein.BargeIn(flush=(lambda: drain(output)) if flush else None)
+    played, done = [], threading.Event()
+    consumer = threading.Thread(target=consume, args=(output, played, done))
+    consumer.start()
+
+    synthesized = []
+    synthesize = stub_synthesize(latency=0.02)
+
+    def reply(text: str, turn: threading.Event):
+        def counting_synthesize(sentence, previous):
+            for chunk in synthesize(sentence, previous):
+                synthesized.append((turn, len(chunk) / 2 / 24000))
+                yield chunk
+        return voice_pipeline.SpeechPipeline(stub_deltas(text, 0.002), counting_synthesize,
+                                             voice_pipeline.TurnTimings(), cancelled=turn)
+
+    turn = barge_in.start_turn()
+    producer = threading.Thread(target=produce, args=(barge_in, reply(" ".join([REPLY] * 3), turn), output))
+    producer.start()
+    cancelled_at = None
+    for frame in frames(np.concatenate([tone(1.0, -70), tone(1.0, -20)])):
+        time.sleep(len(frame) / 16000)
+        if barge_in.hear(16000, frame):
+            cancelled_at = time.perf_counter()
+            break
+    producer.join()
+    # Audio of the cancelled reply still waiting to be played; skipped here
+    # rather than sat through
+    with output.mutex:
+        queued = sum(len(frame) / 24000 for t, frame in output.queue if t is turn)
+    drain(output)
+
+    # The next utterance gets a reply of its own, which must be played whole
+    second = barge_in.start_turn()
+    produce(barge_in, reply("Sure, the short answer is NADH. It carries electrons to the chain.", second), output)
+    done.set()
+    consumer.join()
+    return {
+        "cancelled": cancelled_at is not None and turn.is_set(),
+        "after_s": queued + sum(seconds for t, seconds, at in played if t is turn and at > cancelled_at),
+        "next_s": sum(seconds for t, seconds, _ in played if t is second),
+        "next_expected_s": sum(seconds for t, seconds in synthesized if t is second),
+    }
+
+
+@pytest.mark.parametrize("flush", [False, True])
+def test_barge_in_stops_queued_playback(flush):
+    result = cancel_turn(flush)
+    assert result["cancelled"], result
+    # The follow-up is played in full, the last frame padded to 20 ms
+    assert 0 <= result["next_s"] - result["next_expected_s"] < 0.02, result
+    if flush:
+        # At most the frame being produced when the queue was flushed
+        assert result["after_s"] <= 0.04, result
+    else:
+        assert result["after_s"] > 0.5, result
+
+
+def test_interrupted_turn_is_cancelled_and_the_next_one_finishes():
+    barge_in = bargein.BargeIn()
+    first = bargein._turn(barge_in, np.concatenate([tone(1.5, -70), tone(1.0, -20)]), " ".join([REPLY] * 3))
+    assert "cancelled" in first["timings"], first["timings"]
+    second = bargein._turn(barge_in, tone(0.5, -70), "Sure, the short answer is NADH.")
+    assert "finished" in second["timings"], second["timings"]
@@ -0,0 +1,57 @@
+import asyncio
+import json
+
+from fastapi.testclient import TestClient
+
+
+def flashcards_job(card_count: int) -> dict:
+    return {"type": "flashcards",
+            "request": {"flashcard_set_id": "set", "note_content": "notes", "card_count": card_count}}
+
+
+def test_batches_over_the_job_limit_are_rejected(server):
+    jobs = [flashcards_job(1)] * (server.BATCH_MAX_JOBS + 1)
+    response = TestClient(server.app).post("/batch", json={"jobs": jobs})
+    assert response.status_code == 422
+
+
+def test_disconnecting_from_a_streamed_batch_cancels_its_jobs(server, monkeypatch):
+    cancelled = []
+
+    async def generate_flashcards(request):
+        try:
+            await asyncio.sleep(0.01 if request.card_count == 1 else 30)
+            return []
+        except asyncio.CancelledError:
+            cancelled.append(request.card_count)
+            raise
+
+    monkeypatch.setattr(server, "generate_flashcards", generate_flashcards)
+    body = json.dumps({"jobs": [flashcards_job(count) for count in (1, 2, 2, 2)]}).encode()
+
+    async def scenario():
+        first_line = asyncio.Event()
+        messages = [{"type": "http.request", "body": body, "more_body": False}]
+
+        async def receive():
+            if messages:
+                return messages.pop()
+            await first_line.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            if message["type"] == "http.response.body" and message.get("body"):
+                first_line.set()
+
+        scope = {
+            "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "POST",
+            "scheme": "http", "path": "/batch", "raw_path": b"/batch", "root_path": "",
+            "query_string": b"stream=true", "client": ("127.0.0.1", 1), "server": ("test", 80),
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+        }
+        await asyncio.wait_for(server.app(scope, receive, send), 5)
+        await asyncio.sleep(0)
+
+    asyncio.run(scenario())
+    assert cancelled == [2, 2, 2]
+    assert server.admission_controller.running == 0
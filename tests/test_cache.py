@@ -0,0 +1,44 @@
+import asyncio
+
+import cache
+
+
+def test_disk_tier_survives_a_new_memory_tier(tmp_path):
+    path = str(tmp_path / "cache.db")
+
+    async def scenario():
+        first = cache.ResponseCache(cache.MemoryTier(), cache.SQLiteTier(path))
+        await first.set("key", {"items": [1, 2]})
+        second = cache.ResponseCache(cache.MemoryTier(), cache.SQLiteTier(path))
+        assert await second.contains("key")
+        assert await second.get("key") == {"items": [1, 2]}
+        assert await second.get("missing") is None
+        return second.stats()
+
+    stats = asyncio.run(scenario())
+    assert (stats["hits"], stats["disk_hits"], stats["misses"]) == (1, 1, 1)
+
+
+def test_memory_hits_stay_on_the_event_loop(tmp_path, monkeypatch):
+    async def scenario():
+        response_cache = cache.ResponseCache(cache.MemoryTier(), cache.SQLiteTier(str(tmp_path / "cache.db")))
+        await response_cache.set("key", ["value"])
+
+        def blocked(*args, **kwargs):
+            raise AssertionError("memory hit went to a worker thread")
+
+        monkeypatch.setattr(cache.asyncio, "to_thread", blocked)
+        assert await response_cache.contains("key")
+        return await response_cache.get("key")
+
+    assert asyncio.run(scenario()) == ["value"]
+
+
+def test_get_returns_a_private_copy():
+    async def scenario():
+        response_cache = cache.ResponseCache()
+        await response_cache.set("key", [{"id": None}])
+        (await response_cache.get("key"))[0]["id"] = "stamped"
+        return await response_cache.get("key")
+
+    assert asyncio.run(scenario()) == [{"id": None}]
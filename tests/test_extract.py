@@ -0,0 +1,45 @@
+import json
+import random
+
+import pytest
+
+import extract
+
+
+def test_fuzzed_output_yields_a_prefix_of_the_items_or_raises():
+    rng = random.Random(0)
+    original = extract.fuzz_items()
+    text = json.dumps(original)
+    for _ in range(5000):
+        mutated = extract._mutate(text, rng)
+        try:
+            items = extract.extract_json(mutated)
+        except json.JSONDecodeError:
+            continue
+        assert items == original[:len(items)], mutated
+
+
+@pytest.mark.parametrize("sample", extract.MALFORMED_SAMPLES)
+def test_malformed_samples_yield_json(sample):
+    assert extract.extract(sample).value
+
+
+def test_clean_output_is_not_marked_repaired():
+    result = extract.extract('[{"question": "Q1", "answer": "A1"}]')
+    assert not result.repaired and not result.salvaged
+
+
+def test_truncated_array_keeps_its_complete_items():
+    result = extract.extract('[{"question": "Q1", "answer": "A1"}, {"question": "Q2", "answer": "A')
+    assert result.value == [{"question": "Q1", "answer": "A1"}]
+    assert result.repaired and result.salvaged
+
+
+def test_python_literals_are_repaired():
+    value = extract.extract_json('[{"option_text": "a", "is_correct": True, "note": None}]')
+    assert value == [{"option_text": "a", "is_correct": True, "note": None}]
+
+
+def test_no_json_raises():
+    with pytest.raises(json.JSONDecodeError):
+        extract.extract_json("Sorry, I cannot help with that.")
@@ -0,0 +1,78 @@
+import asyncio
+import types
+
+import pytest
+
+import cache
+
+
+class Gateway:
+    def __init__(self, text: str):
+        self.text = text
+        self.calls = 0
+
+    async def generate_content(self, prompt, config=None, tier=None):
+        self.calls += 1
+        return types.SimpleNamespace(text=self.text, parsed=None)
+
+
+@pytest.mark.parametrize("text, calls", [
+    ('[{"question": "Q1", "answer": "A1"}, {"question": "Q2", "answer": "A2"}]', 1),
+    ('[{"question": "Q1", "answer": "A1"}, {"question": "Q2", "answer": "A', 2),
+], ids=["complete", "salvaged"])
+def test_salvaged_responses_are_not_cached(server, monkeypatch, text, calls):
+    gateway = Gateway(text)
+    monkeypatch.setattr(server.providers, "get_gateway", lambda: gateway)
+    monkeypatch.setattr(server, "response_cache", cache.ResponseCache())
+
+    async def twice():
+        return [await server.generate_cached("flashcards", "notes", "prompt") for _ in range(2)]
+
+    first, second = asyncio.run(twice())
+    assert first == second and first[0] == {"question": "Q1", "answer": "A1"}
+    assert gateway.calls == calls
+
+
+def test_prompt_savings_are_counted_only_when_the_prompt_is_sent(server, monkeypatch):
+    gateway = Gateway('[{"question": "Q1", "answer": "A1"}]')
+    monkeypatch.setattr(server.providers, "get_gateway", lambda: gateway)
+    monkeypatch.setattr(server, "response_cache", cache.ResponseCache())
+    saved = server.PROMPT_TOKENS_SAVED._values
+
+    async def twice():
+        for _ in range(2):
+            await server.generate_cached("savings", "notes", "prompt", saved_tokens=7)
+
+    asyncio.run(twice())
+    assert gateway.calls == 1
+    assert saved[("savings",)] == 7
+
+    note = server.prompts.sample_note(2)
+    before = dict(saved)
+    notes, tokens = server.compact_note(note)
+    assert tokens > 0 and notes != note
+    assert saved == before
+
+
+@pytest.mark.parametrize("endpoint, generation, generate, text", [
+    ("quizzes", "quiz_generation", "generate_quiz_items",
+     '[{"question_text": "Q1", "question_type": "multiple_choice",'
+     ' "answers": [{"option_text": "A1", "is_correct": true}]}]'),
+    ("flashcards", "flashcard_generation", "generate_flashcard_items",
+     '[{"question": "Q1", "answer": "A1"}]'),
+])
+def test_streams_reuse_the_buffered_cache_entry(server, monkeypatch, endpoint, generation, generate, text):
+    gateway = Gateway(text)
+    monkeypatch.setattr(server.providers, "get_gateway", lambda: gateway)
+    monkeypatch.setattr(server, "response_cache", cache.ResponseCache())
+
+    async def buffered_then_streamed():
+        # The item bank's first fill excludes nothing
+        items = await getattr(server, generate)("notes", 1, [])
+        streamed = [item async for item in server.stream_cached(
+            endpoint, "notes", **getattr(server, generation)("notes", 1))]
+        return items, streamed
+
+    items, streamed = asyncio.run(buffered_then_streamed())
+    assert streamed == items
+    assert gateway.calls == 1
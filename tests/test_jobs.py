@@ -0,0 +1,72 @@
+import asyncio
+import sqlite3
+import time
+
+import pytest
+
+import jobs
+
+
+def test_new_store_leaves_other_workers_jobs_alone(tmp_path):
+    path = str(tmp_path / "jobs.db")
+    first = jobs.SQLiteJobStore(path)
+    first.create(jobs.Job("a", "documents", status="running"), "worker-1")
+    second = jobs.SQLiteJobStore(path)
+    assert second.fail_expired(60) == 0
+    assert second.get("a").status == "running"
+
+
+def test_jobs_without_a_heartbeat_fail_after_the_lease(tmp_path, monkeypatch):
+    store = jobs.SQLiteJobStore(str(tmp_path / "jobs.db"))
+    store.create(jobs.Job("live", "documents"), "worker-1")
+    store.create(jobs.Job("dead", "documents"), "worker-2")
+    store.create(jobs.Job("done", "documents", status="succeeded"), "worker-2")
+    now = time.time()
+    monkeypatch.setattr(jobs.time, "time", lambda: now + 45)
+    store.heartbeat("worker-1")
+    monkeypatch.setattr(jobs.time, "time", lambda: now + 90)
+    assert store.fail_expired(60) == 1
+    assert store.get("live").status == "queued"
+    assert (store.get("dead").status, store.get("dead").error) == ("failed", jobs.INTERRUPTED)
+    assert store.get("done").status == "succeeded"
+
+
+def test_databases_without_lease_columns_are_upgraded(tmp_path):
+    path = str(tmp_path / "jobs.db")
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "CREATE TABLE jobs (job_id TEXT PRIMARY KEY, kind TEXT NOT NULL, status TEXT NOT NULL, "
+        "result TEXT, error TEXT, webhook_url TEXT, created_at REAL NOT NULL, updated_at REAL NOT NULL)"
+    )
+    conn.execute("INSERT INTO jobs VALUES ('old', 'documents', 'running', 'null', NULL, NULL, 0, 0)")
+    conn.commit()
+    store = jobs.SQLiteJobStore(path)
+    assert store.get("old").status == "running"
+    assert store.fail_expired(60) == 1
+    store.create(jobs.Job("new", "documents"), "worker-1")
+    assert store.get("new").status == "queued"
+
+
+def test_submissions_beyond_the_queue_are_turned_away():
+    async def scenario():
+        release = asyncio.Event()
+
+        async def run():
+            await release.wait()
+            return {"ok": True}
+
+        runner = jobs.JobRunner(jobs.MemoryJobStore(), workers=1, max_queue=2)
+        first = await runner.submit("documents", run)
+        await asyncio.sleep(0)  # The worker takes the first job off the queue
+        queued = [await runner.submit("documents", run) for _ in range(2)]
+        with pytest.raises(jobs.QueueFull):
+            await runner.submit("documents", run)
+        release.set()
+        await runner._queue.join()
+        statuses = [(await runner.get(job.job_id)).status for job in [first, *queued]]
+        await runner.submit("documents", run)
+        for task in runner._tasks:
+            task.cancel()
+        return statuses
+
+    assert asyncio.run(scenario()) == ["succeeded"] * 3
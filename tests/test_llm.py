@@ -0,0 +1,37 @@
+import asyncio
+
+import pytest
+
+from llm import LLMGateway
+from tests.fakes import StubClient
+
+TEXT = '[{"question": "What is ATP?", "answer": "The energy currency of the cell"}]' * 3
+
+
+@pytest.mark.parametrize("use_aio", [True, False], ids=["aio", "thread pool"])
+def test_generate_and_stream_return_the_model_text(use_aio):
+    gateway = LLMGateway(StubClient(latency=0.01, text=TEXT, use_aio=use_aio))
+
+    async def both():
+        text = await gateway.generate("prompt")
+        chunks = [chunk async for chunk in gateway.stream("prompt")]
+        return text, chunks
+
+    try:
+        text, chunks = asyncio.run(both())
+    finally:
+        gateway.close()
+    assert text == TEXT
+    assert len(chunks) > 1 and "".join(chunks) == TEXT
+
+
+def test_concurrency_is_bounded():
+    gateway = LLMGateway(StubClient(latency=0.05), max_concurrency=2)
+
+    async def many():
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        await asyncio.gather(*(gateway.generate("prompt") for _ in range(4)))
+        return loop.time() - start
+
+    assert asyncio.run(many()) >= 0.1
@@ -0,0 +1,54 @@
+import json
+
+import pytest
+
+import notediff
+import prompts
+
+
+def edit(note_content: str, section: int, text: str) -> str:
+    blocks = json.loads(note_content)
+    headings = [i for i, block in enumerate(blocks) if block["type"] == "heading"]
+    paragraph = blocks[headings[section] + 1]
+    paragraph["content"][0]["text"] = text + paragraph["content"][0]["text"]
+    return json.dumps(blocks)
+
+
+def changed(before: list, after: list) -> list:
+    changes = notediff.diff(before, after)
+    assert not changes["added"] and not changes["removed"]
+    return changes["changed"]
+
+
+@pytest.mark.parametrize("count", [None, 10, 20, 30, 50])
+@pytest.mark.parametrize("text", ["Edited: ", "x" * 440])
+def test_one_section_edit_regenerates_one_group(count, text):
+    note = prompts.sample_note(40)
+    before = notediff.note_sections(note, count, min_chars=0)
+    for section in range(40):
+        after = notediff.note_sections(edit(note, section, text), count, min_chars=0)
+        if before is None:
+            assert after is None
+        else:
+            assert [group.key for group in after] == [group.key for group in before]
+            assert len(changed(before, after)) == 1
+
+
+@pytest.mark.parametrize("headings", [10, 20, 40, 100])
+@pytest.mark.parametrize("count", [10, 20, 30, 50])
+def test_groups_get_min_items_by_heading_count(headings, count):
+    sections = notediff.split_note(prompts.sample_note(headings))
+    grouped = notediff.note_sections(prompts.sample_note(headings), count, min_chars=0)
+    if grouped is None:
+        return
+    runs = notediff.merge_small(
+        notediff._runs(sections, notediff.group_size(len(sections), count)), count, len(sections)
+    )
+    assert [run[0].key for run in runs] == [group.key for group in grouped]
+    assert all(count * len(run) >= notediff.NOTE_MIN_ITEMS * len(sections) for run in runs)
+    assert sum(notediff.allocate(count, grouped)) == count
+
+
+def test_short_notes_are_processed_whole():
+    assert notediff.note_sections(prompts.sample_note(2)) is None
+    assert notediff.note_sections("plain text notes", min_chars=0) is None
@@ -0,0 +1,41 @@
+import asyncio
+
+import pool
+from tests.fakes import FakeProviderError, fake_pool
+
+
+def test_in_flight_returns_to_zero_under_injected_errors():
+    providers = fake_pool(2, rpm=1200, rate_limit_rate=0.15, error_rate=0.05)
+    outcomes = {"ok": 0, "rate_limited": 0, "failed": 0}
+
+    async def one():
+        try:
+            await providers.generate("prompt", tier="fast")
+            outcomes["ok"] += 1
+        except pool.RateLimited:
+            outcomes["rate_limited"] += 1
+        except FakeProviderError:
+            outcomes["failed"] += 1
+
+    async def run():
+        await asyncio.gather(*(one() for _ in range(60)))
+
+    asyncio.run(run())
+    assert sum(outcomes.values()) == 60 and outcomes["ok"]
+    assert all(provider.in_flight == 0 for provider in providers.providers)
+
+
+def test_cancelled_calls_and_closed_streams_return_their_slot():
+    providers = fake_pool(1, rpm=1200, rate_limit_rate=0.0, error_rate=0.0)
+
+    async def abandon():
+        task = asyncio.create_task(providers.generate("prompt"))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        stream = providers.stream("prompt")
+        await anext(stream)
+        await stream.aclose()
+
+    asyncio.run(abandon())
+    assert providers.providers[0].in_flight == 0
@@ -0,0 +1,28 @@
+import numpy as np
+
+import reframe
+
+
+def test_frames_rejoin_to_the_input():
+    chunks = reframe.tts_chunks(seconds=2.0)
+    audio = b"".join(chunks)
+    joined = b"".join(frame.tobytes() for frame in reframe.frames(chunks))
+    assert joined[:len(audio)] == audio
+    assert not any(joined[len(audio):])
+
+
+def test_frames_survive_a_consumer_lagging_past_the_ring():
+    # Collect every frame before reading any, as fastrtc's queue does when playback lags
+    chunks = reframe.tts_chunks(seconds=3.0)
+    audio = b"".join(chunks)
+    collected = list(reframe.frames(chunks))
+    assert len(collected) > reframe.RING_FRAMES
+    joined = b"".join(frame.tobytes() for frame in collected)
+    assert joined[:len(audio)] == audio
+
+
+def test_frames_have_a_fixed_duration():
+    chunks = reframe.tts_chunks(seconds=1.0)
+    sizes = {len(frame) for frame in reframe.frames(chunks)}
+    assert sizes == {24000 * reframe.FRAME_MS // 1000}
+    assert all(frame.dtype == np.int16 for frame in reframe.frames(chunks))
@@ -0,0 +1,59 @@
+import pytest
+
+import prompts
+import scheduler
+from schemas import STUDY_SCHEDULE_SCHEMA, adapter
+
+GOLDEN_NOTE = """# Cells
+Cells are the basic unit of life. """ + "Membranes, organelles and the cytoskeleton. " * 40 + """
+# DNA
+DNA stores genetic information in a double helix.
+# Enzymes
+""" + "Enzymes lower activation energy. " * 12
+
+GOLDEN_SCHEDULE = [
+    {"title": "Biology", "part": "Cells", "dueDate": "2025-01-18", "priority": "high",
+     "count": 2, "estimatedTime": 20},
+    {"title": "Biology", "part": "DNA", "dueDate": "2025-01-25", "priority": "low",
+     "count": 1, "estimatedTime": 15},
+    {"title": "Biology", "part": "Enzymes", "dueDate": "2025-01-31", "priority": "medium",
+     "count": 1, "estimatedTime": 15},
+]
+
+
+def check_shape(schedules: list, start_date: str, end_date: str):
+    """``schedules`` matches what /study-sets has always returned"""
+    adapter(STUDY_SCHEDULE_SCHEMA).validate_python(schedules)
+    start, end = scheduler.parse_date(start_date), scheduler.parse_date(end_date)
+    for schedule in schedules:
+        assert set(schedule) == {"title", "part", "dueDate", "priority", "count", "estimatedTime"}
+        assert start <= scheduler.parse_date(schedule["dueDate"]) <= end
+        assert schedule["priority"] in scheduler.PRIORITIES
+        assert 1 <= schedule["count"] <= scheduler.MAX_SESSIONS
+        assert scheduler.MIN_MINUTES <= schedule["estimatedTime"] <= scheduler.MAX_MINUTES
+    dates = [schedule["dueDate"] for schedule in schedules]
+    assert dates == sorted(dates)
+
+
+def test_golden_schedule():
+    schedules = scheduler.build_schedule(GOLDEN_NOTE, "Biology", "2025-01-01", "2025-01-31")
+    check_shape(schedules, "2025-01-01", "2025-01-31")
+    assert schedules == GOLDEN_SCHEDULE
+
+
+@pytest.mark.parametrize("topics", [1, 12, 40])
+def test_blocknote_schedules_keep_the_response_shape(topics):
+    schedules = scheduler.build_schedule(prompts.sample_note(topics), "Biology", "2025-01-01", "2025-03-01")
+    assert len(schedules) == topics
+    check_shape(schedules, "2025-01-01", "2025-03-01")
+
+
+def test_priority_labels_override_the_size_heuristic():
+    labels = {"Cells": "low", "DNA": "high"}
+    schedules = scheduler.build_schedule(GOLDEN_NOTE, "Biology", "2025-01-01", "2025-01-31", labels)
+    assert [schedule["priority"] for schedule in schedules] == ["low", "high", "medium"]
+
+
+def test_end_before_start_is_rejected():
+    with pytest.raises(scheduler.InvalidDateRange):
+        scheduler.build_schedule(GOLDEN_NOTE, "Biology", "2025-02-01", "2025-01-01")
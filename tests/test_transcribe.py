@@ -0,0 +1,36 @@
+import numpy as np
+
+import audioprep
+import transcribe
+from tests.fakes import StubGroq, StubWhisper
+
+
+def speech(seconds: float, rate: int = 48000) -> np.ndarray:
+    return (audioprep.speech_like(seconds, rate=rate, channels=1, lead=0.8) * 32767).astype(np.int16)
+
+
+def test_groq_uploads_speech_and_skips_silence():
+    transcriber = transcribe.GroqTranscriber(StubGroq(round_trip=0, server=0))
+    assert transcriber.transcribe(48000, speech(2.0)) == "..."
+    assert transcriber.transcribe(48000, np.zeros((1, 48000), dtype=np.int16)) == ""
+
+
+def test_incremental_session_transcribes_while_audio_arrives():
+    transcriber = transcribe.LocalTranscriber(model=StubWhisper(rtf=0, overhead=0))
+    audio = speech(6.0)
+    whole = transcriber.transcribe(48000, audio)
+    session = transcriber.session()
+    frame = 48000 // 50
+    for offset in range(0, audio.shape[-1], frame):
+        session.feed(48000, audio[..., offset:offset + frame])
+    text = session.finish((48000, audio))
+    assert whole and text
+    assert session.passes >= 1
+
+
+def test_closed_session_stops_its_worker():
+    session = transcribe.LocalTranscriber(model=StubWhisper(rtf=0, overhead=0)).session()
+    session.feed(48000, speech(1.0))
+    session.close()
+    session._worker.join(timeout=1)
+    assert not session._worker.is_alive()
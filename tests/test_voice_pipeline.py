@@ -0,0 +1,39 @@
+import voice_pipeline
+from tests.fakes import REPLY, stub_deltas, stub_synthesize
+
+
+def test_splitter_cuts_sentences_as_they_end():
+    splitter = voice_pipeline.SentenceSplitter(min_chars=10)
+    sentences = []
+    for delta in ["Mitochondria make ATP", ". They use oxygen, e.g. in", " respiration. Wh", "y?"]:
+        sentences += splitter.feed(delta)
+    assert sentences == ["Mitochondria make ATP.", "They use oxygen, e.g. in respiration."]
+    assert splitter.flush() == "Why?"
+    assert splitter.flush() is None
+
+
+def test_pipelined_reply_starts_sooner_with_the_same_audio():
+    sequential_timings = voice_pipeline.TurnTimings()
+    sequential = list(voice_pipeline.speak_sequential(stub_deltas(token_delay=0.002),
+                                                      stub_synthesize(latency=0.02), sequential_timings))
+    pipelined_timings = voice_pipeline.TurnTimings()
+    pipeline = voice_pipeline.SpeechPipeline(stub_deltas(token_delay=0.002), stub_synthesize(latency=0.02),
+                                             pipelined_timings)
+    pipelined = list(pipeline)
+    assert pipeline.text == REPLY
+    # The stand-in TTS speaks per character; sentences lose the spaces between them
+    assert 0.95 * sum(map(len, sequential)) < sum(map(len, pipelined)) <= sum(map(len, sequential))
+    assert pipelined_timings.report()["first_audio"] < sequential_timings.report()["first_audio"]
+
+
+def test_cancelling_stops_the_reply():
+    timings = voice_pipeline.TurnTimings()
+    pipeline = voice_pipeline.SpeechPipeline(stub_deltas(" ".join([REPLY] * 3), 0.002),
+                                             stub_synthesize(latency=0.02), timings)
+    chunks = 0
+    for _ in pipeline:
+        chunks += 1
+        pipeline.cancel()
+    assert chunks == 1
+    assert "cancelled" in timings.report() and "finished" not in timings.report()
+    assert len(pipeline.text) < 3 * len(REPLY)
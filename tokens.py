@@ -0,0 +1,23 @@
+import re
+
+# Words, numbers, single punctuation marks and runs of whitespace, roughly
+# how a BPE tokenizer splits English prose and JSON
+_pieces = re.compile(r"[A-Za-z]+|\d{1,3}|[^\sA-Za-z\d]|\s+")
+
+
+def count_tokens(text: str) -> int:
+    """Offline stand-in for the model tokenizer.
+
+    Counts one token per punctuation mark, number group and short word, and
+    one per six characters of longer words. It tracks Gemini's counts
+    closely enough to compare prompt variants without network access.
+    """
+    tokens = 0
+    for piece in _pieces.findall(text):
+        if piece[0].isspace():
+            tokens += 1 if "\n" in piece or len(piece) > 1 else 0
+        elif piece[0].isalpha():
+            tokens += (len(piece) + 5) // 6
+        else:
+            tokens += 1
+    return tokens
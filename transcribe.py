@@ -0,0 +1,315 @@
+import os
+import sys
+import threading
+import time
+import wave
+
+import numpy as np
+
+import audioprep
+import bargein
+import metrics
+
+try:
+    from faster_whisper import WhisperModel
+except ImportError:  # the local backend is optional
+    WhisperModel = None
+
+# "groq" uploads each utterance to Groq's Whisper; "local" runs faster-whisper on the CPU
+VOICE_STT = os.environ.get("VOICE_STT", "groq")
+# faster-whisper model size (or path) and CTranslate2 compute type for the local backend
+VOICE_LOCAL_MODEL = os.environ.get("VOICE_LOCAL_MODEL", "small")
+VOICE_LOCAL_COMPUTE = os.environ.get("VOICE_LOCAL_COMPUTE", "int8")
+# Seconds of new audio between incremental passes while the user is speaking
+VOICE_PARTIAL_SECONDS = float(os.environ.get("VOICE_PARTIAL_SECONDS", "1.0"))
+# Segments ending this close to the live edge may still change and are not committed yet
+HOLDBACK_SECONDS = 1.0
+# Audio quieter than this is committed as silence without running the model
+SILENCE_DB = -45.0
+# Silence after speech that starts a pass at once, so it runs during the pause
+# ReplyOnPause waits out before replying
+PAUSE_SECONDS = 0.3
+# A session worker with no audio for this long exits; more audio starts a new one
+IDLE_SECONDS = 10.0
+
+STT_SECONDS = metrics.registry.register(metrics.Histogram(
+    "voice_stt_seconds", "Time from the end of an utterance to its final transcript", ("backend",)
+))
+
+
+class Session:
+    """Transcription of one utterance; backends that can work ahead override ``feed``"""
+
+    def __init__(self, transcriber):
+        self.transcriber = transcriber
+
+    def feed(self, sample_rate: int, samples: np.ndarray):
+        """Audio as it arrives, before the pause that ends the utterance"""
+
+    def finish(self, audio: tuple[int, np.ndarray]) -> str:
+        """Final transcript once the pause is detected; ``audio`` is the whole utterance"""
+        start = time.perf_counter()
+        text = self.transcriber.transcribe(*audio)
+        STT_SECONDS.observe(time.perf_counter() - start, backend=self.transcriber.name)
+        return text
+
+    def close(self):
+        """Give up on the utterance without transcribing it"""
+
+
+class GroqTranscriber:
+    """Whole utterances uploaded to Groq's Whisper once the user pauses"""
+    name = "groq"
+
+    def __init__(self, client, model: str = "whisper-large-v3"):
+        self.client = client
+        self.model = model
+
+    def transcribe(self, sample_rate: int, audio_data: np.ndarray) -> str:
+        # Mono 16 kHz int16 without the silence around the speech, FLAC when available
+        samples = audioprep.prepare(audio_data, sample_rate)
+        if not samples.size:
+            return ""
+        filename, data = audioprep.encode(samples, audioprep.TARGET_RATE)
+        transcription = self.client.audio.translations.create(
+            file=(filename, data),
+            model=self.model,
+        )
+        return transcription.text
+
+    def session(self) -> Session:
+        return Session(self)
+
+
+class LocalTranscriber:
+    """faster-whisper on the CPU, transcribing while the user is still speaking"""
+    name = "local"
+
+    def __init__(self, model_size: str = VOICE_LOCAL_MODEL, compute_type: str = VOICE_LOCAL_COMPUTE,
+                 model=None):
+        self.model_size = model_size
+        self.compute_type = compute_type
+        self._model = model
+        self._lock = threading.Lock()
+
+    @property
+    def model(self):
+        with self._lock:
+            if self._model is None:
+                if WhisperModel is None:
+                    raise RuntimeError("VOICE_STT=local needs the faster-whisper package")
+                self._model = WhisperModel(self.model_size, device="cpu",
+                                           compute_type=self.compute_type)
+            return self._model
+
+    def segments(self, samples: np.ndarray) -> list[tuple[float, float, str]]:
+        """(start, end, text) of float32 16 kHz audio, same task as the Groq endpoint"""
+        segments, _ = self.model.transcribe(samples, task="translate", beam_size=1,
+                                            vad_filter=True, condition_on_previous_text=False)
+        return [(segment.start, segment.end, segment.text) for segment in segments]
+
+    def transcribe(self, sample_rate: int, audio_data: np.ndarray) -> str:
+        samples = audioprep.to_float(audioprep.prepare(audio_data, sample_rate))
+        if not samples.size:
+            return ""
+        return "".join(text for _, _, text in self.segments(samples)).strip()
+
+    def session(self) -> "IncrementalSession":
+        return IncrementalSession(self)
+
+
+class IncrementalSession(Session):
+    """Transcribes an utterance in passes while it is being spoken.
+
+    Every ``partial_seconds`` of new audio, and as soon as the user falls
+    silent, a background pass transcribes everything not yet committed.
+    Segments that end at least ``holdback`` seconds before the live edge
+    are final, so their text is committed and
+    later passes start after them. When the pause is detected only the
+    short uncommitted tail is left to transcribe, and nothing at all when
+    the audio since the last pass is silence.
+
+    The worker thread exits after ``idle`` seconds without audio and on
+    ``close``, so a session that is dropped without ``finish`` does not
+    keep it alive.
+    """
+
+    def __init__(self, transcriber: LocalTranscriber, partial_seconds: float = VOICE_PARTIAL_SECONDS,
+                 holdback: float = HOLDBACK_SECONDS, idle: float = IDLE_SECONDS):
+        super().__init__(transcriber)
+        self.partial_seconds = partial_seconds
+        self.holdback = holdback
+        self.idle = idle
+        self.rate = None
+        self.passes = 0
+        self._chunks = []
+        self._received = 0
+        self._committed = 0
+        self._texts = []
+        # End of the audio the last pass saw, and its segments that were not committed
+        self._seen = 0
+        self._pending = []
+        self._scheduled = 0
+        self._silence = 0
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._finishing = False
+        self._worker = None
+
+    def feed(self, sample_rate: int, samples: np.ndarray):
+        mono = audioprep.downmix(audioprep.to_float(samples))
+        with self._lock:
+            if self._finishing:
+                return
+            self.rate = self.rate or sample_rate
+            self._chunks.append(mono)
+            self._received += len(mono)
+            paused = self._silence < PAUSE_SECONDS * self.rate
+            if bargein.level_db(mono) < SILENCE_DB:
+                self._silence += len(mono)
+            else:
+                self._silence = 0
+            paused = paused and self._silence >= PAUSE_SECONDS * self.rate
+            due = paused or self._received - self._scheduled >= self.partial_seconds * self.rate
+            if due:
+                self._scheduled = self._received
+        if due:
+            self._wake.set()
+        if self._worker is None or not self._worker.is_alive():
+            self._worker = threading.Thread(target=self._run, name="voice-stt", daemon=True)
+            self._worker.start()
+
+    def _audio(self, start: int, end: int) -> np.ndarray:
+        with self._lock:
+            audio = np.concatenate(self._chunks)[start:end] if self._chunks else np.zeros(0, np.float32)
+        return audioprep.resample(audio, self.rate)
+
+    def _pass(self, final: bool = False) -> str:
+        """Transcribe the uncommitted audio; commit stable segments unless ``final``"""
+        with self._lock:
+            start, end = self._committed, self._received
+        audio = self._audio(start, end)
+        duration = len(audio) / audioprep.TARGET_RATE
+        if not audio.size or bargein.level_db(audio) < SILENCE_DB:
+            segments = []
+        else:
+            self.passes += 1
+            segments = self.transcriber.segments(audio)
+        if final:
+            return "".join(text for _, _, text in segments)
+        stable = [segment for segment in segments if segment[1] <= duration - self.holdback]
+        with self._lock:
+            self._seen = end
+            self._pending = [text for _, _, text in segments[len(stable):]]
+            self._texts += [text for _, _, text in stable]
+            if stable:
+                self._committed = start + int(stable[-1][1] * self.rate)
+            elif not segments:
+                # Nothing but silence: no need to look at it again
+                self._committed = max(start, end - int(self.holdback * self.rate))
+            self._drop_committed()
+        return ""
+
+    def _drop_committed(self):
+        """Forget audio that is already transcribed, so long sessions stay small"""
+        drop = self._committed
+        if not drop:
+            return
+        self._chunks = [np.concatenate(self._chunks)[drop:]]
+        self._received -= drop
+        self._seen -= drop
+        self._scheduled = max(0, self._scheduled - drop)
+        self._committed = 0
+
+    def _run(self):
+        while self._wake.wait(self.idle):
+            self._wake.clear()
+            if self._finishing:
+                return
+            self._pass()
+
+    def close(self):
+        with self._lock:
+            self._finishing = True
+        self._wake.set()
+
+    def finish(self, audio: tuple[int, np.ndarray]) -> str:
+        start = time.perf_counter()
+        with self._lock:
+            self._finishing = True
+        self._wake.set()
+        if self._worker is None:
+            # Nothing was fed, e.g. the handler was called directly
+            return super().finish(audio)
+        # A pass already running commits its segments first, so its work is not wasted
+        self._worker.join()
+        rest = self._audio(self._seen, self._received)
+        if self._seen > self._committed and (not rest.size or bargein.level_db(rest) < SILENCE_DB):
+            # Only the pause was added since the last pass: its open segments are final
+            tail = "".join(self._pending)
+        else:
+            tail = self._pass(final=True)
+        text = ("".join(self._texts) + tail).strip()
+        STT_SECONDS.observe(time.perf_counter() - start, backend=self.transcriber.name)
+        return text
+
+
+def create_transcriber(groq_client, backend: str = VOICE_STT):
+    if backend == "local":
+        return LocalTranscriber()
+    return GroqTranscriber(groq_client)
+
+
+def read_clip(path: str) -> tuple[int, np.ndarray]:
+    with wave.open(path, "rb") as wf:
+        data = np.frombuffer(wf.readframes(wf.getnframes()), dtype=np.int16)
+        return wf.getframerate(), data.reshape(-1, wf.getnchannels()).T
+
+
+def _latency(transcriber, clip: tuple[int, np.ndarray], incremental: bool) -> tuple[float, int]:
+    """Seconds from the end of the clip to its transcript, feeding it in real time"""
+    rate, audio = clip
+    session = transcriber.session() if incremental else Session(transcriber)
+    frame = rate // 50
+    for offset in range(0, audio.shape[-1], frame if incremental else audio.shape[-1]):
+        session.feed(rate, audio[..., offset:offset + frame])
+        if incremental:
+            time.sleep(frame / rate)
+    start = time.perf_counter()
+    session.finish(clip)
+    return time.perf_counter() - start, getattr(session, "passes", 0)
+
+
+def benchmark(paths: list[str] | None = None):
+    """End-of-speech to transcript latency per backend on recorded clips.
+
+    Takes WAV files as arguments, or synthetic speech of 3, 6 and 12
+    seconds. Without VOICE_BENCH_LIVE=1 the backends run against local
+    stand-ins (Groq: 250 ms round trip, 2 Mbit/s uplink, 150 ms server
+    time; CPU model: real-time factor 0.25).
+    """
+    if paths:
+        clips = [(os.path.basename(path), read_clip(path)) for path in paths]
+    else:
+        # Speech followed by the pause ReplyOnPause waits for before it replies
+        clips = [(f"{seconds}s synthetic", (48000, (audioprep.speech_like(seconds, channels=1, lead=0.8)
+                                                    * 32767).astype(np.int16)))
+                 for seconds in (3, 6, 12)]
+    if os.environ.get("VOICE_BENCH_LIVE") == "1":
+        from groq import Groq
+        groq, local = GroqTranscriber(Groq()), LocalTranscriber()
+    else:
+        from tests.fakes import StubGroq, StubWhisper
+
+        groq, local = GroqTranscriber(StubGroq()), LocalTranscriber(model=StubWhisper())
+    backends = [("groq", groq, False), ("local, whole", local, False), ("local, incremental", local, True)]
+    for name, clip in clips:
+        results = []
+        for backend, transcriber, incremental in backends:
+            seconds, passes = _latency(transcriber, clip, incremental)
+            results.append(f"{backend} {seconds * 1000:5.0f} ms" + (f" ({passes} passes)" if passes else ""))
+        print(f"{name:<14} | " + " | ".join(results))
+
+
+if __name__ == "__main__":
+    benchmark(sys.argv[1:])
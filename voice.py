@@ -1,15 +1,19 @@
-import io
 import os
 import tempfile
+import threading
 from dotenv import load_dotenv
 from elevenlabs.client import ElevenLabs
 from fastrtc import AdditionalOutputs, Stream, ReplyOnPause
 import numpy as np
-import wave
-import time
 
 from numpy.typing import NDArray
 
+import audioprep
+import bargein
+import memory
+import reframe
+import transcribe
+import voice_pipeline
 
 load_dotenv()
 
@@ -37,69 +41,109 @@ def get_tts_client():
 
 groq_client = get_groq_client()
 tts_client = get_tts_client()
+groq_transcriber = transcribe.GroqTranscriber(groq_client)
+# Groq by default; VOICE_STT=local transcribes on the CPU while the user speaks
+transcriber = transcribe.create_transcriber(groq_client)
+
+# "1" speaks each sentence as soon as the LLM finishes it; "0" waits for the
+# whole reply before starting TTS
+VOICE_PIPELINE = os.environ.get("VOICE_PIPELINE", "1") == "1"
 
 
 def audio_to_wav_file(audio_data: NDArray, sample_rate: int) -> bytes:
-    """Convert audio data to a temporary WAV file for Groq processing"""
-    with io.BytesIO() as wav_file:
-        with wave.open(wav_file, "wb") as wf:
-            wf.setnchannels(1)
-            wf.setsampwidth(2)  # 16-bit audio
-            wf.setframerate(sample_rate)
-            wf.writeframes(audio_data.tobytes())
-        return wav_file.getvalue()
+    """Convert audio data to a mono 16-bit WAV file for Groq processing"""
+    return audioprep.wav_bytes(audioprep.prepare(audio_data, sample_rate, sample_rate, trim=False),
+                               sample_rate)
 
 
 def transcribe_with_groq(audio: tuple[int, NDArray]) -> str:
     """Transcribe audio using Groq's Whisper API"""
-    sample_rate, audio_data = audio
+    return groq_transcriber.transcribe(*audio)
 
-    # Convert audio data to a temporary WAV file
-    wav_bytes = audio_to_wav_file(audio_data, sample_rate)
 
-    transcription = groq_client.audio.translations.create(
-        file=("input.wav", wav_bytes),
-        model="whisper-large-v3",
+# Fixed persona instructions first, note last: every turn of every session
+# on the same note starts with an identical prefix the provider can cache
+TEACHER_INSTRUCTIONS = """
+        You are a helpful and patient teacher. Your goal is to help the user review and learn the following material.
+        Engage them in a conversation, ask them questions about the material to test their knowledge, and clarify concepts they are unsure about.
+        Start by greeting the user and asking them what part of the note they'd like to begin with.
+"""
+
+
+def teacher_system_prompt(note_content: str) -> str:
+    """System prompt for a voice turn, byte-identical for the same material"""
+    return TEACHER_INSTRUCTIONS + f"""
+        --- MATERIAL TO REVIEW ---
+        {note_content}
+        --- END OF MATERIAL ---
+        """
+
+
+def summarize_turns(summary: str, turns: list[dict]) -> str:
+    """Fold older exchanges into the running session summary"""
+    completion = groq_client.chat.completions.create(
+        model="llama-3.1-8b-instant",
+        messages=[
+            {"role": "system", "content": memory.SUMMARY_INSTRUCTIONS},
+            {"role": "user", "content": memory.summary_request(summary, turns)},
+        ],
+        max_tokens=300,
+    )
+    return completion.choices[0].message.content
+
+
+def synthesize(sentence: str, previous: str | None = None):
+    """Stream 24 kHz PCM for one sentence; ``previous`` keeps the intonation continuous"""
+    return tts_client.text_to_speech.stream(
+        text=sentence,
+        voice_id="JBFqnCBsd6RMkjVDRZzb",  # A good, clear voice
+        model_id="eleven_multilingual_v2",
+        output_format="pcm_24000",
+        previous_text=previous,
     )
-    return transcription.text
 
 
 def voice_teacher_handler(
     audio: tuple[int, NDArray[np.int16 | np.float32]],
     note_content: str,
     chatbot: list[dict] | None = None,
+    cancel: threading.Event | None = None,
+    session: memory.SessionMemory | None = None,
+    stt: transcribe.Session | None = None,
 ):
     """
     The main handler for the voice conversation.
     It transcribes user audio, gets a response from the LLM (acting as a teacher),
-    and streams the audio response back.
+    and streams the audio response back. Setting ``cancel`` stops the reply,
+    including the Groq and ElevenLabs streams behind it.
+
+    ``session`` holds what the LLM remembers of the conversation; without
+    one it is rebuilt from ``chatbot``, which keeps the full transcript
+    for the UI.
     """
     chatbot = chatbot or []
 
-    # 1. System Prompt Injection (Teacher Persona)
-    # This runs only on the first turn of the conversation.
-    if not chatbot:
-        system_prompt = f"""
-        You are a helpful and patient teacher. Your goal is to help the user review and learn the following material.
-        Engage them in a conversation, ask them questions about the material to test their knowledge, and clarify concepts they are unsure about.
-        Start by greeting the user and asking them what part of the note they'd like to begin with.
-
-        --- MATERIAL TO REVIEW ---
-        {note_content}
-        --- END OF MATERIAL ---
-        """
-        chatbot.append({"role": "system", "content": system_prompt})
+    # 1. Session memory: recent turns verbatim, older ones summarized
+    if session is None:
+        session = memory.SessionMemory()
+        history = [msg for msg in chatbot if msg["role"] in ("user", "assistant")]
+        for question, reply in zip(history[::2], history[1::2]):
+            session.add(question["content"], reply["content"])
+        session.fold()
+    session.set_note(note_content)
 
     # 2. Transcribe User's Audio
-    start_time = time.time()
+    timings = voice_pipeline.TurnTimings()
     try:
-        user_text = transcribe_with_groq(audio)
+        # A session fed while the user spoke may already have most of the text
+        user_text = stt.finish(audio) if stt else transcriber.transcribe(*audio)
         if not user_text.strip():
             print("No speech detected.")
             # Yield nothing to indicate no response is needed
             return
 
-        print(f"Transcription ({time.time() - start_time:.2f}s): '{user_text}'")
+        timings.mark("transcribed")
+        print(f"Transcription ({timings.report()['transcribed']:.2f}s): '{user_text}'")
     except Exception as e:
         print(f"Error during transcription: {e}")
         return  # Stop processing if transcription fails
@@ -108,49 +152,56 @@ def voice_teacher_handler(
     chatbot.append({"role": "user", "content": user_text})
     yield AdditionalOutputs(chatbot)  # fastrtc feature to update state
 
-    # Prepare messages for the LLM API
-    messages = [{"role": msg["role"], "content": msg["content"]} for msg in chatbot]
+    # Prepare messages for the LLM API: teacher persona with the parts of the
+    # note this question is about, the session summary and the recent turns
+    system_prompt = teacher_system_prompt(session.material(user_text))
+    messages = session.messages(system_prompt, user_text)
+    print(f"Prompt size: ~{memory.prompt_tokens(messages)} tokens in {len(messages)} messages")
 
     # 4. Generate LLM Response
     print("Getting LLM response from Groq...")
-    llm_start_time = time.time()
     response_stream = groq_client.chat.completions.create(
         model="llama-3.1-8b-instant",
         messages=messages,
         stream=True,  # Use streaming for lower first-token latency
     )
 
-    # Stream the response text as it comes in
-    response_text = ""
-    for chunk in response_stream:
-        delta = chunk.choices[0].delta.content
-        if delta:
-            response_text += delta
+    reply = []
 
-    print(f"LLM Response ({time.time() - llm_start_time:.2f}s): '{response_text}'")
-
-    # Update chat history with the full assistant response
-    chatbot.append({"role": "assistant", "content": response_text})
+    def deltas():
+        try:
+            for chunk in response_stream:
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    reply.append(delta)
+                    yield delta
+        finally:
+            # Closing the HTTP response is what stops Groq generating
+            response_stream.close()
 
     # 5. Convert LLM Text to Speech and Stream Audio
-    print("Streaming audio response from ElevenLabs...")
-    tts_start_time = time.time()
-
     # The `output_format` pcm_24000 gives us a raw stream of 16-bit samples at 24000 Hz
     # This is efficient as we can yield chunks directly.
-    audio_stream = tts_client.text_to_speech.stream(
-        text=response_text,
-        voice_id="JBFqnCBsd6RMkjVDRZzb",  # A good, clear voice
-        model_id="eleven_multilingual_v2",
-        output_format="pcm_24000",
-    )
-
-    for chunk in audio_stream:
-        # The chunk is already in bytes, convert to numpy array for fastrtc
-        audio_array = np.frombuffer(chunk, dtype=np.int16)
-        yield (24000, audio_array)  # Yield sample rate and audio chunk
+    if VOICE_PIPELINE:
+        audio_stream = voice_pipeline.SpeechPipeline(deltas(), synthesize, timings,
+                                                     cancelled=cancel)
+    else:
+        audio_stream = voice_pipeline.speak_sequential(deltas(), synthesize, timings)
+
+    # Chunks arrive in whatever sizes the network delivers, odd byte counts
+    # included; fastrtc gets fixed 20 ms int16 frames copied out of a ring buffer
+    for audio_array in reframe.frames(audio_stream, 24000):
+        yield (24000, audio_array)  # Yield sample rate and audio frame
+
+    response_text = "".join(reply)
+    # Update chat history with the full assistant response
+    chatbot.append({"role": "assistant", "content": response_text})
+    session.add(user_text, response_text)
+    session.fold_later()
 
-    print(f"TTS streaming finished in {time.time() - tts_start_time:.2f}s")
+    timings.observe()
+    print(f"LLM Response: '{response_text}'")
+    print(f"Voice turn timings (s): {timings.report()}")
 
 
 # def generate_response(
@@ -200,20 +251,113 @@ def response(
 
     # Fall back to ElevenLabs for reliable TTS
     print("Using ElevenLabs for text-to-speech")
-    for chunk in tts_client.text_to_speech.stream(
+    for frame in reframe.frames(tts_client.text_to_speech.stream(
         text=response_text,
         voice_id="JBFqnCBsd6RMkjVDRZzb",
         model_id="eleven_multilingual_v2",
         output_format="pcm_24000",
-    ):
-        audio_array = np.frombuffer(chunk, dtype=np.int16).reshape(1, -1)
-        yield (24000, audio_array)
+    ), 24000):
+        yield (24000, frame.reshape(1, -1))
+
+
+class InterruptibleReply(ReplyOnPause):
+    """ReplyOnPause that stops the reply as soon as the student talks over it.
+
+    ReplyOnPause only interrupts once the new utterance has ended, and it
+    closes the reply generator without stopping the LLM and TTS threads
+    behind it. Here an energy VAD watches the microphone while a reply is
+    playing and sets the turn's cancel event on speech onset; the new
+    utterance keeps being recorded and is answered on the next pause.
+    fastrtc pulls reply frames into its output queue faster than they are
+    played, so that queue is flushed too, and frames the cancelled reply
+    was still producing are dropped.
+    """
 
+    def __init__(self, reply_fn, *args, **kwargs):
+        super().__init__(self._reply, *args, **kwargs)
+        self.reply_fn = reply_fn
+        self.barge_in = bargein.BargeIn(flush=self._flush_output)
+        self.session = memory.SessionMemory(summarize_turns)
+        self.stt = transcriber.session()
+        self.interrupted = False
+
+    def _reply(self, audio, *args):
+        self.interrupted = False
+        return self.reply_fn(audio, *args, cancel=self.barge_in.start_turn(),
+                             session=self.session, stt=self._next_utterance())
+
+    def _next_utterance(self) -> transcribe.Session:
+        """Hand over the transcription of the utterance just ended and start the next"""
+        stt, self.stt = self.stt, transcriber.session()
+        return stt
+
+    def copy(self):
+        return InterruptibleReply(
+            self.reply_fn,
+            self.startup_fn,
+            self.algo_options,
+            self.model_options,
+            self.can_interrupt,
+            self.expected_layout,
+            self.output_sample_rate,
+            self.output_frame_size,
+            self.input_sample_rate,
+            self.model,
+            self.needs_args,
+        )
+
+    def _flush_output(self):
+        # The output queue is an asyncio.Queue, so it is emptied on its loop
+        loop = getattr(self, "_loop", None)
+        if loop is not None and loop.is_running():
+            loop.call_soon_threadsafe(self.clear_queue)
+        else:
+            self.clear_queue()
+
+    def receive(self, frame: tuple[int, NDArray]) -> None:
+        if self.state.responding and self.barge_in.hear(*frame):
+            # Drop the old reply (hear flushed the audio queued from it), but
+            # keep the state that is recording the new utterance
+            self.interrupted = True
+            self.generator = None
+            self.event.clear()
+            self.state.responding = False
+        super().receive(frame)
+
+    def emit(self):
+        turn = self.barge_in.turn
+        return self.barge_in.admit(turn, super().emit())
+
+    def determine_pause(self, audio: NDArray, sampling_rate: int, state) -> bool:
+        # Feed the transcriber exactly what ReplyOnPause adds to the utterance
+        # it will pass to _reply, not the silence and noise around it
+        before = state.stream.size if state.stream is not None else 0
+        pause = super().determine_pause(audio, sampling_rate, state)
+        if state.stream is not None and state.stream.size > before:
+            self.stt.feed(sampling_rate, state.stream[before:])
+        return pause
+
+    def reset(self):
+        if self.interrupted:
+            # The cancelled reply finished; a full reset would discard the
+            # utterance that interrupted it
+            self.interrupted = False
+            self.generator = None
+            return
+        super().reset()
+        # The recorded utterance was just discarded, so its transcription goes too
+        self.stt.close()
+        self.stt = transcriber.session()
 
-def create_stream(title: str):
+
+def create_stream(title: str, note_content: str = ""):
     """Create a stream with the specified title"""
+
+    def handler(audio, chatbot=None, cancel=None, session=None, stt=None):
+        return voice_teacher_handler(audio, note_content, chatbot, cancel, session, stt)
+
     return Stream(
-        handler=ReplyOnPause(response, input_sample_rate=16000),
+        handler=InterruptibleReply(handler, input_sample_rate=16000),
         modality="audio",
         mode="send-receive",
         ui_args={"title": title},
@@ -0,0 +1,239 @@
+import os
+import queue
+import re
+import threading
+import time
+from dataclasses import dataclass, field
+
+import metrics
+
+# Sentences shorter than this are joined with the next one before TTS, so
+# the voice does not stop and start on every "Yes." or "Great!"
+SENTENCE_MIN_CHARS = int(os.environ.get("VOICE_SENTENCE_MIN_CHARS", "24"))
+# Synthesized audio chunks buffered ahead of playback
+AUDIO_QUEUE_CHUNKS = int(os.environ.get("VOICE_AUDIO_QUEUE", "64"))
+
+_boundary = re.compile(r"(?<=[.!?…])[\"')\]]*\s+|\n+")
+_last_word = re.compile(r"(\S+)\.[\"')\]]*\s*$")
+ABBREVIATIONS = {"e.g", "i.e", "etc", "vs", "dr", "mr", "mrs", "ms", "prof", "st", "fig", "eg", "ie"}
+
+VOICE_LATENCY = metrics.registry.register(metrics.Histogram(
+    "voice_turn_seconds", "Time from end of user speech to each stage of a voice turn", ("stage",)
+))
+VOICE_CANCELLED = metrics.registry.register(metrics.Counter(
+    "voice_turns_cancelled_total", "Voice replies cut short because the user spoke over them"
+))
+
+
+class SentenceSplitter:
+    """Cuts a stream of text deltas into sentences as soon as each one ends"""
+
+    def __init__(self, min_chars: int = SENTENCE_MIN_CHARS):
+        self.min_chars = min_chars
+        self.buffer = ""
+
+    def _is_abbreviation(self, text: str) -> bool:
+        match = _last_word.search(text)
+        return bool(match) and match.group(1).lower() in ABBREVIATIONS
+
+    def feed(self, text: str) -> list[str]:
+        self.buffer += text
+        sentences = []
+        start = 0
+        for match in _boundary.finditer(self.buffer):
+            candidate = self.buffer[start:match.end()]
+            if len(candidate.strip()) < self.min_chars or self._is_abbreviation(candidate):
+                continue
+            sentences.append(candidate.strip())
+            start = match.end()
+        self.buffer = self.buffer[start:]
+        return sentences
+
+    def flush(self) -> str | None:
+        rest, self.buffer = self.buffer.strip(), ""
+        return rest or None
+
+
+@dataclass
+class TurnTimings:
+    """Stage timestamps of one voice turn, measured from the end of user speech"""
+    start: float = field(default_factory=time.perf_counter)
+    marks: dict = field(default_factory=dict)
+
+    def mark(self, stage: str):
+        """Record the first time ``stage`` is reached"""
+        if stage not in self.marks:
+            self.marks[stage] = time.perf_counter()
+
+    def report(self) -> dict:
+        return {stage: round(at - self.start, 3) for stage, at in self.marks.items()}
+
+    def observe(self):
+        for stage, seconds in self.report().items():
+            VOICE_LATENCY.observe(seconds, stage=stage)
+
+
+class _Failed:
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+_DONE = object()
+
+
+def _close(iterator):
+    """Stop an upstream stream early; generators and HTTP streams both have close()"""
+    close = getattr(iterator, "close", None)
+    if close is not None:
+        close()
+
+
+class SpeechPipeline:
+    """Speaks an LLM reply sentence by sentence while it is still being generated.
+
+    One thread reads text deltas and queues complete sentences; another
+    synthesizes them in order and queues the audio. Iterating yields the
+    audio chunks in order, so sentence N plays while N+1 is generated and
+    synthesized. ``text`` holds the whole reply once iteration ends.
+
+    Setting ``cancelled`` (or closing the iterator) stops both threads at
+    their next token or audio chunk, closes the LLM and TTS streams and
+    drops audio that was queued but not yet played.
+    """
+
+    def __init__(self, deltas, synthesize, timings: TurnTimings | None = None,
+                 min_chars: int = SENTENCE_MIN_CHARS, cancelled: threading.Event | None = None):
+        self.deltas = deltas
+        self.synthesize = synthesize
+        self.timings = timings or TurnTimings()
+        self.splitter = SentenceSplitter(min_chars)
+        self.text = ""
+        self.cancelled = cancelled or threading.Event()
+        self._sentences = queue.Queue()
+        self._audio = queue.Queue(maxsize=AUDIO_QUEUE_CHUNKS)
+
+    def cancel(self):
+        """Cut the reply short because the user started speaking over it"""
+        self.cancelled.set()
+
+    def _interrupted(self):
+        self.timings.mark("cancelled")
+        VOICE_CANCELLED.inc()
+
+    def _stop(self):
+        self.cancelled.set()
+        try:
+            while True:
+                self._audio.get_nowait()
+        except queue.Empty:
+            pass
+
+    def _put_audio(self, item) -> bool:
+        """Queue ``item`` unless the turn is cancelled while the queue is full"""
+        while not self.cancelled.is_set():
+            try:
+                self._audio.put(item, timeout=0.05)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def _produce_text(self):
+        try:
+            for delta in self.deltas:
+                if self.cancelled.is_set():
+                    break
+                self.timings.mark("first_token")
+                self.text += delta
+                for sentence in self.splitter.feed(delta):
+                    self.timings.mark("first_sentence")
+                    self._sentences.put(sentence)
+            else:
+                rest = self.splitter.flush()
+                if rest:
+                    self._sentences.put(rest)
+        except BaseException as e:
+            self._sentences.put(_Failed(e))
+        finally:
+            _close(self.deltas)
+            self._sentences.put(_DONE)
+
+    def _produce_audio(self):
+        previous = None
+        try:
+            while not self.cancelled.is_set():
+                sentence = self._sentences.get()
+                if sentence is _DONE:
+                    break
+                if isinstance(sentence, _Failed):
+                    self._put_audio(sentence)
+                    break
+                stream = self.synthesize(sentence, previous)
+                try:
+                    for chunk in stream:
+                        if not self._put_audio(chunk):
+                            break
+                finally:
+                    _close(stream)
+                previous = sentence
+        except BaseException as e:
+            self._put_audio(_Failed(e))
+        finally:
+            self._put_audio(_DONE)
+
+    def __iter__(self):
+        threading.Thread(target=self._produce_text, name="voice-llm", daemon=True).start()
+        threading.Thread(target=self._produce_audio, name="voice-tts", daemon=True).start()
+        try:
+            while not self.cancelled.is_set():
+                try:
+                    chunk = self._audio.get(timeout=0.05)
+                except queue.Empty:
+                    continue
+                if chunk is _DONE:
+                    self.timings.mark("finished")
+                    return
+                if isinstance(chunk, _Failed):
+                    raise chunk.error
+                if self.cancelled.is_set():
+                    break
+                self.timings.mark("first_audio")
+                yield chunk
+            self._interrupted()
+        except GeneratorExit:
+            # Closed before the reply ended, e.g. by fastrtc on an interruption
+            self._interrupted()
+            raise
+        finally:
+            self._stop()
+
+
+def speak_sequential(deltas, synthesize, timings: TurnTimings):
+    """The pre-pipeline behaviour: wait for the whole reply, then synthesize it"""
+    text = ""
+    for delta in deltas:
+        timings.mark("first_token")
+        text += delta
+    for chunk in synthesize(text, None):
+        timings.mark("first_audio")
+        yield chunk
+    timings.mark("finished")
+
+
+def benchmark():
+    """Time to first audio for one reply, sequential against pipelined"""
+    from tests.fakes import stub_deltas, stub_synthesize
+
+    for name, speak in (("sequential", speak_sequential), ("pipelined", None)):
+        timings = TurnTimings()
+        if speak is None:
+            chunks = list(SpeechPipeline(stub_deltas(), stub_synthesize(), timings))
+        else:
+            chunks = list(speak(stub_deltas(), stub_synthesize(), timings))
+        report = timings.report()
+        print(f"{name:<10} | first audio {report['first_audio']:.3f}s | "
+              f"finished {report['finished']:.3f}s | {sum(map(len, chunks))} bytes")
+
+
+if __name__ == "__main__":
+    benchmark()